@@ -10,6 +10,9 @@ from lib.binary_logic.NOT import NOT
 
 def AND(computer: NPComputer, x_id: int, y_id: int) -> int:
     
+    # Every node from here to the output belongs to this gate (see CONE.py)
+    first = computer.next_node_id
+
     ### There are three restrictions for the AND functionality followed by a filter
 
     ## These are the three restrictions:
@@ -47,6 +50,9 @@ def AND(computer: NPComputer, x_id: int, y_id: int) -> int:
     computer.add_edge(temp_flipper, output)
     computer.add_edge(filter_input, output)
 
+    computer.netlist.append(("AND", output, (x_id, y_id)))
+    computer.gate_starts[output] = first
+
     return output
 
 def test_AND_00():
@@ -21,6 +21,11 @@ def NOT(computer: NPComputer, node_id: int, between={TriBit.ZERO, TriBit.ONE}) -
     # Connect the input node to the result node so they can't be the same value
     computer.add_edge(node_id, result_node)
 
+    # Only a NOT between 0 and 1 is a logic gate, the others swap logic levels
+    if between == {TriBit.ZERO, TriBit.ONE}:
+        computer.netlist.append(("NOT", result_node, (node_id,)))
+        computer.gate_starts[result_node] = result_node
+
     return result_node
 
 def test_NOT_ZERO_to_ONE():
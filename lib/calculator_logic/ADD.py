@@ -12,6 +12,41 @@ from lib.run.CONST import CONST
 from lib.run.VAR import VAR
 from lib.run.MEM import MEM
 
+def HALF_ADD(computer: NPComputer, a_bit: int, b_bit: int) -> tuple[int, int]:
+    """ Adds two bits together
+
+    Args:
+        computer (NPComputer): The computer that the bits belong to
+        a_bit (int): The node id of the first bit
+        b_bit (int): The node id of the second bit
+
+    Returns:
+        int, int: The sum bit node and the carry bit node
+    """
+
+    return XOR(computer, a_bit, b_bit), AND(computer, a_bit, b_bit)
+
+def FULL_ADD(computer: NPComputer, a_bit: int, b_bit: int, c_bit: int) -> tuple[int, int]:
+    """ Adds three bits together
+
+    This is fused so the XOR of the first two bits is shared between the sum and the carry
+    carry = (a AND b) OR ((a XOR b) AND c), which saves an AND and an OR over the textbook majority
+
+    Args:
+        computer (NPComputer): The computer that the bits belong to
+        a_bit (int): The node id of the first bit
+        b_bit (int): The node id of the second bit
+        c_bit (int): The node id of the carry in bit
+
+    Returns:
+        int, int: The sum bit node and the carry bit node
+    """
+
+    a_xor_b = XOR(computer, a_bit, b_bit)
+    sum_bit = XOR(computer, a_xor_b, c_bit)
+    carry_bit = OR(computer, AND(computer, a_bit, b_bit), AND(computer, a_xor_b, c_bit))
+    return sum_bit, carry_bit
+
 def ADD(computer: NPComputer, a: MEM, b: MEM, carry: int = -1) -> tuple[MEM, int]:
     """ Adds two n bit variables together
 
@@ -19,6 +54,7 @@ def ADD(computer: NPComputer, a: MEM, b: MEM, carry: int = -1) -> tuple[MEM, int
         computer (NPComputer): The computer that this variable belongs to
         a (MEM): The first variable to add
         b (MEM): The second variable to add
+        carry (int, optional): The node id of a carry in bit, -1 means there is no carry in. Defaults to -1.
 
     Returns:
         MEM, int: The result of the addition in the MEM and the carry bit node int
@@ -34,23 +70,24 @@ def ADD(computer: NPComputer, a: MEM, b: MEM, carry: int = -1) -> tuple[MEM, int
     # Check if it is a base case
     if n == 1:
         # Check if we have a carry bit to add in
+        a_bit, b_bit = a.bits[0], b.bits[0]
         if carry == -1:
-            a_bit, b_bit = a.bits[0], b.bits[0]
-            return MEM(computer, bits=[XOR(computer, a_bit, b_bit)], n=1), AND(computer, a_bit, b_bit)
+            sum_bit, new_carry = HALF_ADD(computer, a_bit, b_bit)
         else:
-            a_bit, b_bit = a.bits[0], b.bits[0]
-            new_carry: int = OR(computer, OR(computer, AND(computer, a_bit, b_bit), AND(computer, a_bit, carry)), AND(computer, carry, b_bit))
-            return MEM(computer, bits=[XOR(computer, XOR(computer, a_bit, b_bit), carry)], n=1), new_carry
+            sum_bit, new_carry = FULL_ADD(computer, a_bit, b_bit, carry)
+        return MEM(computer, bits=[sum_bit], n=1), new_carry
     
-    # IMPORTANT NOTE: The 2 bit addition is untested due to the increase in complexity of the graph coloring algorithm
+    # NOTE: Additions of more than 1 bit are checked by test_ADD_big, now that the solver has no recursion limit
     # We need to use recursion to add the two MEMs together
+    # The carry in goes to the lower half and the lower carry out goes to the upper half
     a_upper, a_lower = a.get_upper_half(), a.get_lower_half()
     b_upper, b_lower = b.get_upper_half(), b.get_lower_half()
 
-    add_lower, carry_lower = ADD(computer, a_lower, b_lower, carry=-1)
+    add_lower, carry_lower = ADD(computer, a_lower, b_lower, carry=carry)
     add_upper, carry_upper = ADD(computer, a_upper, b_upper, carry_lower)
 
-    sum_result = add_upper.merge(add_lower)
+    # Bits are stored least significant first so the lower half goes first
+    sum_result = add_lower.merge(add_upper)
     return sum_result, carry_upper
 
 def test_ADD00():
@@ -154,7 +191,7 @@ def test_all():
     test_ADD10()
     test_ADD11()
     test_ADD_small()
-    # test_ADD_big()
+    test_ADD_big()
 
 if __name__ == "__main__":
     test_all()
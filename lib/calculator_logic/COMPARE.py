@@ -0,0 +1,245 @@
+# This compares two n bit variables, giving a single bit that is 1 when the comparison holds
+# The bits are combined as a tree so the depth is log(n) instead of a chain of n gates
+# If either side has constant bits (a CONST, or a plain int) those bits are folded away in python
+#   so comparing against a constant costs no XNOR gadgets at all, only the NOT of the bits that must be 0
+# NOTE: Inside this file a term is either a node id or a python bool for a bit that is already known
+
+from lib.run.INIT import NPComputer
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+from lib.binary_logic.NOT import NOT
+from lib.binary_logic.AND import AND
+from lib.binary_logic.OR import OR
+from lib.binary_logic.XNOR import XNOR
+from lib.run.CONST import CONST, get_const_bit
+from lib.run.VAR import VAR
+
+def get_terms(computer: NPComputer, a, n: int) -> list:
+    """ Turns an operand into terms, constant bits become bools
+
+    Args:
+        computer (NPComputer): The computer that the operand belongs to
+        a (MEM | int): The operand, an int is treated as an n bit constant
+        n (int): The number of bits the operand should have
+
+    Returns:
+        list: One term per bit, least significant first
+    """
+
+    if isinstance(a, int):
+        assert 0 <= a < 2 ** n, f"Value {a} is out of range for {n} bits"
+        return [bool((a >> i) & 1) for i in range(n)]
+
+    assert len(a) == n, "Both operands must have the same number of bits"
+    terms = []
+    for bit in a.bits:
+        value = get_const_bit(computer, bit)
+        terms.append(bit if value is None else bool(value))
+    return terms
+
+def term_to_node(computer: NPComputer, term) -> int:
+    """ Turns a term back into a node, a known 0 is the shared 0 node and a known 1 becomes a new constant node """
+
+    if term is False:
+        return computer.zero_node
+    if term is True:
+        return computer.generate_node(allow={TriBit.ONE})
+    return term
+
+def _NOT(computer: NPComputer, x):
+    if isinstance(x, bool):
+        return not x
+    return NOT(computer, x)
+
+def _AND(computer: NPComputer, x, y):
+    if isinstance(x, bool):
+        return y if x else False
+    if isinstance(y, bool):
+        return x if y else False
+    return AND(computer, x, y)
+
+def _OR(computer: NPComputer, x, y):
+    if isinstance(x, bool):
+        return True if x else y
+    if isinstance(y, bool):
+        return True if y else x
+    return OR(computer, x, y)
+
+def _bit_eq(computer: NPComputer, x, y):
+    """ The term for x == y on a single bit """
+
+    if isinstance(x, bool) and isinstance(y, bool):
+        return x == y
+    if isinstance(x, bool):
+        return y if x else NOT(computer, y)
+    if isinstance(y, bool):
+        return x if y else NOT(computer, x)
+    return XNOR(computer, x, y)
+
+def _bit_lt(computer: NPComputer, x, y):
+    """ The term for x < y on a single bit, which is NOT(x) AND y """
+
+    return _AND(computer, _NOT(computer, x), y)
+
+def _tree_and(computer: NPComputer, terms: list):
+    """ ANDs all the terms together as a balanced tree """
+
+    # Known 1s do nothing and a known 0 makes the whole thing 0
+    if any(term is False for term in terms):
+        return False
+    terms = [term for term in terms if term is not True]
+    if not terms:
+        return True
+
+    while len(terms) > 1:
+        paired = [AND(computer, terms[i], terms[i + 1]) for i in range(0, len(terms) - 1, 2)]
+        if len(terms) % 2 == 1:
+            paired.append(terms[-1])
+        terms = paired
+    return terms[0]
+
+def _compare(computer: NPComputer, a_terms: list, b_terms: list, need_eq: bool):
+    """ Compares the terms as a tree, the upper half decides unless it is equal, then the lower half decides
+
+    Returns:
+        lt, eq: The terms for a < b and for a == b (eq is None when need_eq is False)
+    """
+
+    if len(a_terms) == 1:
+        return _bit_lt(computer, a_terms[0], b_terms[0]), _bit_eq(computer, a_terms[0], b_terms[0]) if need_eq else None
+
+    half = len(a_terms) // 2
+    lower_lt, lower_eq = _compare(computer, a_terms[:half], b_terms[:half], need_eq)
+    upper_lt, upper_eq = _compare(computer, a_terms[half:], b_terms[half:], True)
+
+    lt = _OR(computer, upper_lt, _AND(computer, upper_eq, lower_lt))
+    eq = _AND(computer, upper_eq, lower_eq) if need_eq else None
+    return lt, eq
+
+def eq_term(computer: NPComputer, a, b):
+    """ The term for a == b, see EQ """
+
+    n = len(a) if not isinstance(a, int) else len(b)
+    a_terms, b_terms = get_terms(computer, a, n), get_terms(computer, b, n)
+    return _tree_and(computer, [_bit_eq(computer, x, y) for x, y in zip(a_terms, b_terms)])
+
+def lt_term(computer: NPComputer, a, b):
+    """ The term for a < b, see LT """
+
+    n = len(a) if not isinstance(a, int) else len(b)
+    if n == 0:
+        return False
+    lt, _ = _compare(computer, get_terms(computer, a, n), get_terms(computer, b, n), need_eq=False)
+    return lt
+
+def EQ(computer: NPComputer, a, b) -> int:
+    """ Checks if two n bit variables are equal
+
+    Args:
+        computer (NPComputer): The computer that this variable belongs to
+        a (MEM | int): The first variable, or a constant
+        b (MEM | int): The second variable, or a constant
+
+    Returns:
+        int: The node id of a bit that is 1 when a == b
+    """
+
+    return term_to_node(computer, eq_term(computer, a, b))
+
+def LT(computer: NPComputer, a, b) -> int:
+    """ Checks if one n bit variable is less than another (unsigned)
+
+    Args:
+        computer (NPComputer): The computer that this variable belongs to
+        a (MEM | int): The first variable, or a constant
+        b (MEM | int): The second variable, or a constant
+
+    Returns:
+        int: The node id of a bit that is 1 when a < b
+    """
+
+    return term_to_node(computer, lt_term(computer, a, b))
+
+def LE(computer: NPComputer, a, b) -> int:
+    """ Checks if one n bit variable is less than or equal to another (unsigned)
+
+    Args:
+        computer (NPComputer): The computer that this variable belongs to
+        a (MEM | int): The first variable, or a constant
+        b (MEM | int): The second variable, or a constant
+
+    Returns:
+        int: The node id of a bit that is 1 when a <= b
+    """
+
+    return term_to_node(computer, _NOT(computer, lt_term(computer, b, a)))
+
+# Test functions
+def _is_one(computer: NPComputer, mapping: dict, node: int) -> bool:
+    return mapping[node] == mapping[TRI_BIT_TO_NODE[TriBit.ONE]]
+
+def test_COMPARE_constants_fold():
+    """ Test every 3 bit constant comparison, which folds away to a constant without any gadgets """
+    for a_val in range(8):
+        for b_val in range(8):
+            computer = NPComputer()
+            a = CONST(computer, value=a_val, n=3)
+            nodes = computer.store.number_of_nodes()
+
+            assert eq_term(computer, a, b_val) == (a_val == b_val), f"EQ({a_val}, {b_val}) is wrong"
+            assert lt_term(computer, a, b_val) == (a_val < b_val), f"LT({a_val}, {b_val}) is wrong"
+            assert lt_term(computer, b_val, a) == (b_val < a_val), f"LT({b_val}, {a_val}) is wrong"
+            assert computer.store.number_of_nodes() == nodes, "Comparing constants should not add any nodes"
+
+def test_COMPARE_1bit():
+    """ Test EQ, LT and LE on 1 bit variables for every input """
+    for a_val in range(2):
+        for b_val in range(2):
+            computer = NPComputer()
+            a = VAR(computer, n=1)
+            b = VAR(computer, n=1)
+            eq, lt, le = EQ(computer, a, b), LT(computer, a, b), LE(computer, a, b)
+
+            # Pin the inputs after building so the gadgets are made for variables
+            for bit, value in [(a.bits[0], a_val), (b.bits[0], b_val)]:
+                computer.add_edge(bit, TRI_BIT_TO_NODE[TriBit.ZERO if value else TriBit.ONE])
+
+            is_solvable, mapping = computer.get_result_mapping()
+            assert is_solvable is True
+            assert _is_one(computer, mapping, eq) == (a_val == b_val), f"EQ({a_val}, {b_val}) is wrong"
+            assert _is_one(computer, mapping, lt) == (a_val < b_val), f"LT({a_val}, {b_val}) is wrong"
+            assert _is_one(computer, mapping, le) == (a_val <= b_val), f"LE({a_val}, {b_val}) is wrong"
+
+def test_COMPARE_against_const_is_cheap():
+    """ Test that comparing against a constant only uses NOT and the AND tree """
+    computer = NPComputer()
+    a = VAR(computer, n=8)
+    nodes = computer.store.number_of_nodes()
+    EQ(computer, a, 0b10110010)
+    added = computer.store.number_of_nodes() - nodes
+
+    # 4 NOTs for the 0 bits and 7 ANDs to combine 8 bits
+    assert added == 4 + 7 * 27, f"EQ against a constant should only use NOTs and ANDs, added {added} nodes"
+
+def test_COMPARE_var_against_const():
+    """ Test LT against a constant on a 2 bit variable """
+    for a_val in range(4):
+        computer = NPComputer()
+        a = VAR(computer, n=2)
+        lt = LT(computer, a, 2)
+        for i, bit in enumerate(a.bits):
+            computer.add_edge(bit, TRI_BIT_TO_NODE[TriBit.ZERO if (a_val >> i) & 1 else TriBit.ONE])
+
+        is_solvable, mapping = computer.get_result_mapping()
+        assert is_solvable is True
+        assert _is_one(computer, mapping, lt) == (a_val < 2), f"LT({a_val}, 2) is wrong"
+
+def test_all():
+    """ Run all tests for the comparators """
+    test_COMPARE_constants_fold()
+    test_COMPARE_1bit()
+    test_COMPARE_against_const_is_cheap()
+    test_COMPARE_var_against_const()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -1 +1,199 @@
-# This performs division of two n bit variables
\ No newline at end of file
+# This performs division of two n bit variables, giving the quotient and the remainder
+# There are two ways to build it:
+#   restoring - long division, each stage subtracts the divisor and keeps the difference only if it did not borrow
+#   find      - make the quotient and remainder VARs and BREAK unless q * b + r == a and r < b
+#               this uses the FIND paradigm so the coloring does the searching, and the graph is usually much smaller
+# The "auto" method builds whichever of the two makes the smaller graph
+# NOTE: Dividing by 0 gives a quotient of all 1s and a remainder of a with restoring, and is not 3 colorable with find
+
+from functools import lru_cache
+
+from lib.run.INIT import NPComputer
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+from lib.binary_logic.NOT import NOT
+from lib.binary_logic.AND import AND
+from lib.binary_logic.OR import OR
+from lib.calculator_logic.ADD import ADD
+from lib.calculator_logic.SUB import SUB
+from lib.calculator_logic.MUL import MUL
+from lib.execution_control.ASSERT import ASSERT_EQ, ASSERT_LT
+from lib.execution_control.MUX import MUX
+from lib.run.CONST import CONST
+from lib.run.VAR import VAR
+from lib.run.MEM import MEM
+
+DIV_METHODS = ["restoring", "find"]
+
+def _DIV_restoring(computer: NPComputer, a: MEM, b: MEM) -> tuple[MEM, MEM]:
+    """ Long division, one conditional subtract stage per bit of a """
+
+    n = len(a)
+
+    # any_high[w] is 1 when b has a 1 at bit w or above
+    # The remainder at a stage only has as many bits as the stage number, so the bits of b above that must be 0 to subtract
+    any_high = [None] * n
+    for w in reversed(range(1, n)):
+        any_high[w] = b.bits[w] if w == n - 1 else OR(computer, b.bits[w], any_high[w + 1])
+
+    remainder = []
+    quotient_bits = [None] * n
+    for i in reversed(range(n)):
+        # Bring down the next bit of a
+        shifted = [a.bits[i]] + remainder
+        w = len(shifted)
+
+        diff, borrow = SUB(computer, MEM(computer, bits=shifted, n=w), MEM(computer, bits=b.bits[:w], n=w))
+        fits = NOT(computer, borrow)
+        if w < n:
+            fits = AND(computer, fits, NOT(computer, any_high[w]))
+
+        # Keep the difference only if b fit into the remainder
+        quotient_bits[i] = fits
+        remainder = MUX(computer, fits, diff, MEM(computer, bits=shifted, n=w)).bits
+
+    return MEM(computer, bits=quotient_bits, n=n), MEM(computer, bits=remainder, n=n)
+
+def _DIV_find(computer: NPComputer, a: MEM, b: MEM) -> tuple[MEM, MEM]:
+    """ Searches for the quotient and remainder with q * b + r == a and r < b """
+
+    n = len(a)
+    quotient = VAR(computer, n=n)
+    remainder = VAR(computer, n=n)
+
+    # q * b can have 2n bits, the upper n must be 0 for it to equal a
+    product, _ = MUL(computer, quotient, b)
+    total, carry = ADD(computer, product.get_lower_half(), remainder)
+    overflow = product.get_upper_half().bits + [carry]
+    ASSERT_EQ(computer, MEM(computer, bits=overflow, n=len(overflow)), 0)
+
+    ASSERT_EQ(computer, total, a)
+    ASSERT_LT(computer, remainder, b)
+
+    return quotient, remainder
+
+@lru_cache(maxsize=None)
+def estimate_DIV_size(n: int, method: str) -> tuple[int, int]:
+    """ Counts the nodes and edges that DIV will add by building it on a scratch computer
+
+    Args:
+        n (int): The number of bits in the operands
+        method (str): One of DIV_METHODS
+
+    Returns:
+        int, int: The number of nodes and edges that will be added
+    """
+
+    computer = NPComputer()
+    _, _, report = DIV(computer, VAR(computer, n=n), VAR(computer, n=n), method=method)
+    return report["nodes"], report["edges"]
+
+def DIV(computer: NPComputer, a: MEM, b: MEM, method: str = "auto") -> tuple[MEM, MEM, dict]:
+    """ Divides one n bit variable by another
+
+    Args:
+        computer (NPComputer): The computer that this variable belongs to
+        a (MEM): The dividend
+        b (MEM): The divisor
+        method (str, optional): One of DIV_METHODS, or "auto" to build whichever makes the smallest graph. Defaults to "auto".
+
+    Returns:
+        MEM, MEM, dict: The quotient, the remainder and a report with the "method" used and the "nodes" and "edges" added
+    """
+
+    # Make sure the MEM has the same number of bits
+    assert len(a) == len(b), "Both MEMs must have the same number of bits"
+    assert len(a) > 0, "Can not divide 0 bit MEMs"
+
+    if method == "auto":
+        # Pick the fewest nodes, then the fewest edges
+        method = min(DIV_METHODS, key=lambda name: estimate_DIV_size(len(a), name))
+    assert method in DIV_METHODS, f"Unknown DIV method {method}, must be one of {DIV_METHODS}"
+
+    nodes, edges = computer.store.number_of_nodes(), computer.store.number_of_edges()
+
+    if method == "restoring":
+        quotient, remainder = _DIV_restoring(computer, a, b)
+    else:
+        quotient, remainder = _DIV_find(computer, a, b)
+
+    report = {
+        "method": method,
+        "nodes": computer.store.number_of_nodes() - nodes,
+        "edges": computer.store.number_of_edges() - edges,
+    }
+    return quotient, remainder, report
+
+# Test functions
+def test_DIV_restoring_1bit():
+    """ Test restoring division with 1 bit inputs """
+    for a_val, b_val in [(0, 1), (1, 1)]:
+        computer = NPComputer()
+        a = CONST(computer, value=a_val, n=1)
+        b = CONST(computer, value=b_val, n=1)
+
+        quotient, remainder, report = DIV(computer, a, b, method="restoring")
+
+        is_solvable, mapping = computer.get_result_mapping()
+        assert is_solvable is True, f"DIV({a_val}, {b_val}) should be colorable"
+        assert mapping[quotient.bits[0]] == mapping[TRI_BIT_TO_NODE[TriBit.ONE if a_val // b_val else TriBit.ZERO]], f"DIV({a_val}, {b_val}) has the wrong quotient"
+        assert mapping[remainder.bits[0]] == mapping[TRI_BIT_TO_NODE[TriBit.ONE if a_val % b_val else TriBit.ZERO]], f"DIV({a_val}, {b_val}) has the wrong remainder"
+
+def test_DIV_exhaustive():
+    """ Test the quotient and remainder of every pair of operands with both methods, dividing by 0 included """
+    from lib.run.SIMULATE import simulate
+
+    # Restoring is only gates, so every 3 bit pair is solved and simulated, dividing by 0 gives all 1s and a
+    computer = NPComputer()
+    a, b = VAR(computer, n=3), VAR(computer, n=3)
+    quotient, remainder, _ = DIV(computer, a, b, method="restoring")
+    pairs = [(a_val, b_val) for a_val in range(8) for b_val in range(8)]
+    expected = [(a_val // b_val, a_val % b_val) if b_val else (7, a_val) for a_val, b_val in pairs]
+    for (a_val, b_val), values in zip(pairs, expected):
+        is_solvable, mapping = computer.solve({a: a_val, b: b_val})
+        assert is_solvable is True and tuple(computer.read_values(mapping, quotient, remainder)) == values, f"DIV({a_val}, {b_val}) is wrong"
+    quotient_values, remainder_values = simulate(computer, {a: [p[0] for p in pairs], b: [p[1] for p in pairs]}, [quotient, remainder])
+    assert list(zip(quotient_values, remainder_values)) == expected
+
+    # Find searches for the answer so every 2 bit pair is solved, dividing by 0 has no answer
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    quotient, remainder, _ = DIV(computer, a, b, method="find")
+    for a_val in range(4):
+        for b_val in range(4):
+            is_solvable, mapping = computer.solve({a: a_val, b: b_val})
+            if b_val == 0:
+                assert is_solvable is False, f"DIV({a_val}, 0) should not be colorable with find"
+            else:
+                assert is_solvable is True and computer.read_values(mapping, quotient, remainder) == [a_val // b_val, a_val % b_val], f"DIV({a_val}, {b_val}) is wrong"
+
+def test_DIV_report():
+    """ Test that DIV reports the method it chose and the size of the graph it added """
+    for n in [1, 2, 4]:
+        for method in DIV_METHODS:
+            computer = NPComputer()
+            a, b = VAR(computer, n=n), VAR(computer, n=n)
+            nodes = computer.store.number_of_nodes()
+            quotient, remainder, report = DIV(computer, a, b, method=method)
+
+            assert report["method"] == method
+            assert report["nodes"] == computer.store.number_of_nodes() - nodes, "Report should count the added nodes"
+            assert len(quotient) == n and len(remainder) == n, "Quotient and remainder should have n bits"
+
+def test_DIV_auto_picks_smallest():
+    """ Test that the auto method builds the smallest graph """
+    for n in [2, 4, 6]:
+        computer = NPComputer()
+        quotient, remainder, report = DIV(computer, VAR(computer, n=n), VAR(computer, n=n))
+        sizes = {method: estimate_DIV_size(n, method) for method in DIV_METHODS}
+        assert (report["nodes"], report["edges"]) == min(sizes.values()), f"auto did not pick the smallest method for {n} bits"
+
+def test_all():
+    """ Run all tests for the DIV function """
+    test_DIV_restoring_1bit()
+    test_DIV_exhaustive()
+    test_DIV_report()
+    test_DIV_auto_picks_smallest()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -1 +1,389 @@
-# This performs multiplication of two n bit variables
\ No newline at end of file
+# This performs multiplication of an n bit variable by an m bit variable
+# Every partial product a_i AND b_j is generated and then summed column by column with half and full adders
+# There are three ways to sum the columns, they give the same answer but the graphs are different sizes:
+#   array   - add one row of partial products at a time with a ripple of adders (simple, but the most adders)
+#   wallace - reduce every column as much as possible each stage until there are two rows, then ripple
+#   dadda   - only reduce a column as much as needed to reach the next dadda height, then ripple
+# The "auto" method counts the nodes and edges each method will generate and builds the smallest one
+
+from functools import lru_cache
+
+from lib.run.INIT import NPComputer
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+from lib.binary_logic.AND import AND
+from lib.calculator_logic.ADD import HALF_ADD, FULL_ADD
+from lib.run.CONST import CONST
+from lib.run.VAR import VAR
+from lib.run.MEM import MEM
+
+MUL_METHODS = ["array", "wallace", "dadda"]
+
+def _reduce_array(products: dict, n: int, m: int, limit: int, half_add, full_add) -> list[list]:
+    """ Adds the partial product rows together one at a time with a ripple of adders
+
+    Args:
+        products (dict): The partial products, products[(i, j)] is the bit for a_i AND b_j
+        n (int): The number of bits in the first operand (the length of a row)
+        m (int): The number of bits in the second operand (the number of rows)
+        limit (int): The number of product bits being computed
+        half_add (callable): Makes a half adder from two bits and returns (sum, carry)
+        full_add (callable): Makes a full adder from three bits and returns (sum, carry)
+
+    Returns:
+        list[list]: The columns, each with at most one bit left in it
+    """
+
+    accumulator = [[] for _ in range(limit)]
+
+    # The first row does not need adding to anything
+    for w in range(min(n, limit)):
+        accumulator[w] = [products[(w, 0)]]
+
+    for j in range(1, m):
+        carry = []
+        for w in range(j, min(j + n, limit)):
+            bits = accumulator[w] + [products[(w - j, j)]] + carry
+            accumulator[w], carry = _add_bits(bits, half_add, full_add)
+
+        # The final carry of the row becomes the next column of the accumulator
+        if carry and j + n < limit:
+            accumulator[j + n] = carry
+
+    return accumulator
+
+def _reduce_wallace(columns: list[list], half_add, full_add) -> list[list]:
+    """ Reduces every column as much as possible each stage until no column has more than two bits
+
+    Args:
+        columns (list[list]): The bits in each column
+        half_add (callable): Makes a half adder from two bits and returns (sum, carry)
+        full_add (callable): Makes a full adder from three bits and returns (sum, carry)
+
+    Returns:
+        list[list]: The columns, each with at most two bits left in it
+    """
+
+    limit = len(columns)
+    while max(len(column) for column in columns) > 2:
+        next_columns = [[] for _ in range(limit)]
+        for w, column in enumerate(columns):
+            i = 0
+            while len(column) - i >= 2:
+                if len(column) - i >= 3:
+                    sum_bit, carry_bit = full_add(column[i], column[i + 1], column[i + 2])
+                    i += 3
+                else:
+                    sum_bit, carry_bit = half_add(column[i], column[i + 1])
+                    i += 2
+                next_columns[w].append(sum_bit)
+
+                # Carries past the top column are dropped (only happens when truncated)
+                if w + 1 < limit:
+                    next_columns[w + 1].append(carry_bit)
+            next_columns[w].extend(column[i:])
+        columns = next_columns
+
+    return columns
+
+def _reduce_dadda(columns: list[list], half_add, full_add) -> list[list]:
+    """ Reduces each column only as much as needed to reach the next dadda height until no column has more than two bits
+
+    Args:
+        columns (list[list]): The bits in each column
+        half_add (callable): Makes a half adder from two bits and returns (sum, carry)
+        full_add (callable): Makes a full adder from three bits and returns (sum, carry)
+
+    Returns:
+        list[list]: The columns, each with at most two bits left in it
+    """
+
+    limit = len(columns)
+
+    # The dadda heights are 2, 3, 4, 6, 9, 13, ... and we reduce to each one below the tallest column in turn
+    heights = [2]
+    while heights[-1] < max(len(column) for column in columns):
+        heights.append(heights[-1] * 3 // 2)
+
+    for height in reversed(heights[:-1]):
+        next_columns = [[] for _ in range(limit)]
+        for w, column in enumerate(columns):
+            column = column[:]
+
+            # The carries made in the column below during this stage count towards the height
+            while len(column) + len(next_columns[w]) > height and len(column) >= 2:
+                if len(column) + len(next_columns[w]) - height == 1 or len(column) == 2:
+                    sum_bit, carry_bit = half_add(column.pop(), column.pop())
+                else:
+                    sum_bit, carry_bit = full_add(column.pop(), column.pop(), column.pop())
+                next_columns[w].append(sum_bit)
+                if w + 1 < limit:
+                    next_columns[w + 1].append(carry_bit)
+            next_columns[w].extend(column)
+        columns = next_columns
+
+    return columns
+
+def _add_bits(bits: list, half_add, full_add) -> tuple[list, list]:
+    """ Adds up to three bits of the same column
+
+    Returns:
+        list, list: The bit left in this column and the carry for the next column (both empty or single item lists)
+    """
+
+    if len(bits) == 3:
+        sum_bit, carry_bit = full_add(*bits)
+        return [sum_bit], [carry_bit]
+    if len(bits) == 2:
+        sum_bit, carry_bit = half_add(*bits)
+        return [sum_bit], [carry_bit]
+    return bits, []
+
+def _ripple_columns(columns: list[list], half_add, full_add) -> list[list]:
+    """ Adds the final two rows together with a ripple of adders
+
+    Args:
+        columns (list[list]): The bits in each column, no column can have more than two bits
+        half_add (callable): Makes a half adder from two bits and returns (sum, carry)
+        full_add (callable): Makes a full adder from three bits and returns (sum, carry)
+
+    Returns:
+        list[list]: The columns, each with at most one bit left in it
+    """
+
+    result = []
+    carry = []
+    for column in columns:
+        bits, carry = _add_bits(column + carry, half_add, full_add)
+        result.append(bits)
+
+    return result
+
+def _multiply_columns(n: int, m: int, method: str, truncated: bool, partial_product, half_add, full_add) -> list[list]:
+    """ Runs a multiplication method over abstract bits so that it can either build the graph or count the cost
+
+    Args:
+        n (int): The number of bits in the first operand
+        m (int): The number of bits in the second operand
+        method (str): One of MUL_METHODS
+        truncated (bool): If True only the low n bits are computed
+        partial_product (callable): Makes the bit for a_i AND b_j
+        half_add (callable): Makes a half adder from two bits and returns (sum, carry)
+        full_add (callable): Makes a full adder from three bits and returns (sum, carry)
+
+    Returns:
+        list[list]: The product columns, each with at most one bit in it (an empty column is a 0)
+    """
+
+    assert method in MUL_METHODS, f"Unknown MUL method {method}, must be one of {MUL_METHODS}"
+
+    limit = n if truncated else n + m
+    products = {}
+    columns = [[] for _ in range(limit)]
+    for j in range(m):
+        for i in range(n):
+            if i + j < limit:
+                products[(i, j)] = partial_product(i, j)
+                columns[i + j].append(products[(i, j)])
+
+    if method == "array":
+        return _reduce_array(products, n, m, limit, half_add, full_add)
+    if method == "wallace":
+        return _ripple_columns(_reduce_wallace(columns, half_add, full_add), half_add, full_add)
+    return _ripple_columns(_reduce_dadda(columns, half_add, full_add), half_add, full_add)
+
+@lru_cache(maxsize=None)
+def _gadget_size(name: str) -> tuple[int, int]:
+    """ Measures how many nodes and edges one of the gadgets used by MUL adds to a graph """
+
+    computer = NPComputer()
+    x, y, z = VAR(computer, n=3).bits
+    nodes, edges = computer.store.number_of_nodes(), computer.store.number_of_edges()
+
+    if name == "AND":
+        AND(computer, x, y)
+    elif name == "HALF_ADD":
+        HALF_ADD(computer, x, y)
+    elif name == "FULL_ADD":
+        FULL_ADD(computer, x, y, z)
+    else:
+        computer.generate_node(allow={TriBit.ZERO})
+
+    return computer.store.number_of_nodes() - nodes, computer.store.number_of_edges() - edges
+
+def estimate_MUL_size(n: int, m: int, method: str, truncated: bool = False) -> tuple[int, int]:
+    """ Counts the nodes and edges that MUL will add without building anything
+
+    Args:
+        n (int): The number of bits in the first operand
+        m (int): The number of bits in the second operand
+        method (str): One of MUL_METHODS
+        truncated (bool, optional): If True only the low n bits are computed. Defaults to False.
+
+    Returns:
+        int, int: The number of nodes and edges that will be added (on a computer that has no shared 0 node yet)
+    """
+
+    counts = {"AND": 0, "HALF_ADD": 0, "FULL_ADD": 0, "ZERO": 0}
+
+    def count(name):
+        counts[name] += 1
+        return None, None
+
+    columns = _multiply_columns(n, m, method, truncated,
+                                lambda i, j: count("AND")[0],
+                                lambda x, y: count("HALF_ADD"),
+                                lambda x, y, z: count("FULL_ADD"))
+
+    # The computer's shared 0 node is used for all the empty columns (it may already exist, so this is an upper bound)
+    counts["ZERO"] = 1 if any(len(column) == 0 for column in columns) else 0
+
+    nodes, edges = 0, 0
+    for name, amount in counts.items():
+        gadget_nodes, gadget_edges = _gadget_size(name)
+        nodes += amount * gadget_nodes
+        edges += amount * gadget_edges
+    return nodes, edges
+
+def MUL(computer: NPComputer, a: MEM, b: MEM, method: str = "auto", truncated: bool = False) -> tuple[MEM, dict]:
+    """ Multiplies an n bit variable by an m bit variable
+
+    Args:
+        computer (NPComputer): The computer that this variable belongs to
+        a (MEM): The first variable to multiply (n bits)
+        b (MEM): The second variable to multiply (m bits)
+        method (str, optional): One of MUL_METHODS, or "auto" to build whichever makes the smallest graph. Defaults to "auto".
+        truncated (bool, optional): If True only the low n bits of the product are returned, which saves nodes when overflow is irrelevant. Defaults to False.
+
+    Returns:
+        MEM, dict: The product (n + m bits, or n bits if truncated) and a report with the "method" used and the "nodes" and "edges" added
+    """
+
+    n, m = len(a), len(b)
+
+    if method == "auto":
+        # Pick the fewest nodes, then the fewest edges
+        method = min(MUL_METHODS, key=lambda name: estimate_MUL_size(n, m, name, truncated))
+
+    nodes, edges = computer.store.number_of_nodes(), computer.store.number_of_edges()
+
+    columns = _multiply_columns(n, m, method, truncated,
+                                lambda i, j: AND(computer, a.bits[i], b.bits[j]),
+                                lambda x, y: HALF_ADD(computer, x, y),
+                                lambda x, y, z: FULL_ADD(computer, x, y, z))
+
+    # Columns that nothing reaches (like the top bit of an n x 1 product) are always 0
+    product_bits = [column[0] if column else computer.zero_node for column in columns]
+
+    report = {
+        "method": method,
+        "nodes": computer.store.number_of_nodes() - nodes,
+        "edges": computer.store.number_of_edges() - edges,
+    }
+    return MEM(computer, bits=product_bits, n=len(product_bits)), report
+
+# Test functions
+def read_MEM(computer: NPComputer, mapping: dict, mem: MEM) -> int:
+    """ Reads the value of a MEM out of a coloring """
+
+    value = 0
+    for i, bit in enumerate(mem.bits):
+        if mapping[bit] == mapping[TRI_BIT_TO_NODE[TriBit.ONE]]:
+            value |= 1 << i
+    return value
+
+def test_MUL_1x1():
+    """ Test that a 1 bit by 1 bit multiply acts like an AND """
+    for a_val in range(2):
+        for b_val in range(2):
+            computer = NPComputer()
+            a = CONST(computer, value=a_val, n=1)
+            b = CONST(computer, value=b_val, n=1)
+
+            product, report = MUL(computer, a, b)
+
+            is_solvable, mapping = computer.get_result_mapping()
+            assert is_solvable is True, f"MUL({a_val}, {b_val}) should be colorable"
+            assert len(product) == 2, "A 1x1 product should have 2 bits"
+            assert read_MEM(computer, mapping, product) == a_val * b_val, f"MUL({a_val}, {b_val}) should return {a_val * b_val}"
+
+def test_MUL_2x1():
+    """ Test a 2 bit by 1 bit multiply for every input """
+    for a_val in range(4):
+        for b_val in range(2):
+            computer = NPComputer()
+            a = CONST(computer, value=a_val, n=2)
+            b = CONST(computer, value=b_val, n=1)
+
+            product, report = MUL(computer, a, b)
+
+            is_solvable, mapping = computer.get_result_mapping()
+            assert is_solvable is True, f"MUL({a_val}, {b_val}) should be colorable"
+            assert read_MEM(computer, mapping, product) == a_val * b_val, f"MUL({a_val}, {b_val}) should return {a_val * b_val}"
+
+def test_MUL_truncated():
+    """ Test that truncated mode only returns the low n bits and uses fewer nodes """
+    computer = NPComputer()
+    a = VAR(computer, n=4)
+    b = VAR(computer, n=4)
+    full, full_report = MUL(computer, a, b)
+    low, low_report = MUL(computer, a, b, truncated=True)
+
+    assert len(full) == 8, "A 4x4 product should have 8 bits"
+    assert len(low) == 4, "A truncated 4x4 product should have 4 bits"
+    assert low_report["nodes"] < full_report["nodes"], "Truncating should save nodes"
+
+    # The lowest bit is a single partial product either way
+    computer = NPComputer()
+    a = CONST(computer, value=3, n=2)
+    b = CONST(computer, value=1, n=1)
+    low, low_report = MUL(computer, a, b, truncated=True)
+    is_solvable, mapping = computer.get_result_mapping()
+    assert is_solvable is True, "Truncated MUL should be colorable"
+    assert read_MEM(computer, mapping, low) == 3, "Truncated MUL(3, 1) should return 3"
+
+def test_MUL_report_matches_estimate():
+    """ Test that the report from MUL matches the estimate for every method """
+    for n, m in [(1, 1), (3, 2), (4, 4), (5, 3)]:
+        for truncated in [False, True]:
+            for method in MUL_METHODS:
+                computer = NPComputer()
+                product, report = MUL(computer, VAR(computer, n=n), VAR(computer, n=m), method=method, truncated=truncated)
+                assert report["method"] == method
+                assert (report["nodes"], report["edges"]) == estimate_MUL_size(n, m, method, truncated), f"Estimate is wrong for {method} {n}x{m}"
+
+def test_MUL_methods_wiring():
+    """ Test the adder wiring of every method by running it with integer bits instead of graph nodes """
+    for n, m in [(1, 1), (2, 3), (3, 3), (4, 4), (5, 3)]:
+        for truncated in [False, True]:
+            for method in MUL_METHODS:
+                for a_val in range(2 ** n):
+                    for b_val in range(2 ** m):
+                        columns = _multiply_columns(n, m, method, truncated,
+                                                    lambda i, j: (a_val >> i) & (b_val >> j) & 1,
+                                                    lambda x, y: ((x + y) & 1, (x + y) >> 1),
+                                                    lambda x, y, z: ((x + y + z) & 1, (x + y + z) >> 1))
+                        assert all(len(column) <= 1 for column in columns), f"{method} left more than one bit in a column"
+                        product = sum(column[0] << w for w, column in enumerate(columns) if column)
+                        expected = a_val * b_val % (2 ** len(columns))
+                        assert product == expected, f"{method} got {product} for {a_val} * {b_val}"
+
+def test_MUL_auto_picks_smallest():
+    """ Test that the auto method builds the smallest graph """
+    for n, m in [(2, 2), (4, 4), (6, 6), (8, 4)]:
+        computer = NPComputer()
+        product, report = MUL(computer, VAR(computer, n=n), VAR(computer, n=m))
+        sizes = [estimate_MUL_size(n, m, method) for method in MUL_METHODS]
+        assert (report["nodes"], report["edges"]) == min(sizes), f"auto did not pick the smallest method for {n}x{m}"
+
+def test_all():
+    """ Run all tests for the MUL function """
+    test_MUL_1x1()
+    test_MUL_2x1()
+    test_MUL_truncated()
+    test_MUL_report_matches_estimate()
+    test_MUL_methods_wiring()
+    test_MUL_auto_picks_smallest()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
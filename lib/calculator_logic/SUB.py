@@ -1 +1,151 @@
-# This performs subtraction of two n bit variables
\ No newline at end of file
+# This performs subtraction of two n bit variables
+# It is done with two's complement so a - b = a + NOT(b) + 1
+# The +1 is the carry in of the lowest bit, and since it is always 1 the lowest full adder simplifies to
+#   sum = a XOR NOT(b) XOR 1 = a XOR b
+#   carry = a OR NOT(b)
+# so there is no constant node and no second adder pass for the +1
+
+from lib.run.INIT import NPComputer
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+from lib.binary_logic.NOT import NOT
+from lib.binary_logic.OR import OR
+from lib.binary_logic.XOR import XOR
+from lib.calculator_logic.ADD import FULL_ADD
+from lib.execution_control.BREAK import BREAK
+from lib.run.CONST import CONST
+from lib.run.VAR import VAR
+from lib.run.MEM import MEM
+
+def NEGATE(computer: NPComputer, a: MEM) -> MEM:
+    """ Flips every bit of a MEM, reusing the NOT of any bit that has already been flipped
+
+    Args:
+        computer (NPComputer): The computer that this variable belongs to
+        a (MEM): The variable to flip
+
+    Returns:
+        MEM: The bitwise NOT of the variable
+    """
+
+    bits = []
+    for bit in a.bits:
+        if bit not in computer.negated_bits:
+            computer.negated_bits[bit] = NOT(computer, bit)
+        bits.append(computer.negated_bits[bit])
+
+    return MEM(computer, bits=bits, n=len(bits))
+
+def SUB(computer: NPComputer, a: MEM, b: MEM) -> tuple[MEM, int]:
+    """ Subtracts one n bit variable from another
+
+    Args:
+        computer (NPComputer): The computer that this variable belongs to
+        a (MEM): The variable to subtract from
+        b (MEM): The variable to subtract
+
+    Returns:
+        MEM, int: The difference (wrapped around to n bits) and the borrow bit node, which is 1 when a < b
+            The borrow can be given straight to BREAK to stop any solution where the subtraction underflows
+    """
+
+    # Make sure the MEM has the same number of bits
+    assert len(a) == len(b), "Both MEMs must have the same number of bits"
+    assert len(a) > 0, "Can not subtract 0 bit MEMs"
+
+    not_b = NEGATE(computer, b)
+
+    # The lowest bit has the constant +1 carry in folded into it
+    diff_bits = [XOR(computer, a.bits[0], b.bits[0])]
+    carry = OR(computer, a.bits[0], not_b.bits[0])
+
+    for a_bit, not_b_bit in zip(a.bits[1:], not_b.bits[1:]):
+        diff_bit, carry = FULL_ADD(computer, a_bit, not_b_bit, carry)
+        diff_bits.append(diff_bit)
+
+    # With two's complement the carry out is 1 when there is no borrow
+    borrow = NOT(computer, carry)
+
+    return MEM(computer, bits=diff_bits, n=len(diff_bits)), borrow
+
+# Test functions
+def test_SUB_1bit():
+    """ Test the SUB function with every 1 bit input """
+    for a_val in range(2):
+        for b_val in range(2):
+            computer = NPComputer()
+            a = CONST(computer, value=a_val, n=1)
+            b = CONST(computer, value=b_val, n=1)
+
+            diff, borrow = SUB(computer, a, b)
+
+            is_solvable, mapping = computer.get_result_mapping()
+            expected_diff = (a_val - b_val) % 2
+            expected_borrow = 1 if a_val < b_val else 0
+
+            assert is_solvable is True, f"SUB({a_val}, {b_val}) should be colorable"
+            assert mapping[diff.bits[0]] == mapping[TRI_BIT_TO_NODE[TriBit.ONE if expected_diff else TriBit.ZERO]], f"SUB({a_val}, {b_val}) should return {expected_diff}"
+            assert mapping[borrow] == mapping[TRI_BIT_TO_NODE[TriBit.ONE if expected_borrow else TriBit.ZERO]], f"SUB({a_val}, {b_val}) should return borrow {expected_borrow}"
+
+def test_SUB_borrow_BREAK():
+    """ Test that the borrow can be used directly by BREAK """
+    computer = NPComputer()
+    a = CONST(computer, value=0, n=1)
+    b = CONST(computer, value=1, n=1)
+    diff, borrow = SUB(computer, a, b)
+    BREAK(computer, borrow)
+    assert computer() is False, "0 - 1 underflows so BREAK on the borrow should break the computer"
+
+    computer = NPComputer()
+    a = CONST(computer, value=1, n=1)
+    b = CONST(computer, value=1, n=1)
+    diff, borrow = SUB(computer, a, b)
+    BREAK(computer, borrow)
+    assert computer() is True, "1 - 1 does not underflow so BREAK on the borrow should do nothing"
+
+def test_SUB_3bit():
+    """ Test every pair of 3 bit operands, with the borrow and the wraparound, by solving and by simulating the gates """
+    from lib.run.SIMULATE import simulate
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=3), VAR(computer, n=3)
+    diff, borrow = SUB(computer, a, b)
+    borrow_mem = MEM(computer, bits=[borrow], n=1)
+
+    pairs = [(a_val, b_val) for a_val in range(8) for b_val in range(8)]
+    for a_val, b_val in pairs:
+        is_solvable, mapping = computer.solve({a: a_val, b: b_val})
+        assert is_solvable is True, f"SUB({a_val}, {b_val}) should be colorable"
+        assert computer.read_values(mapping, diff, borrow_mem) == [(a_val - b_val) % 8, int(a_val < b_val)], f"SUB({a_val}, {b_val}) is wrong"
+
+    diff_values, borrow_values = simulate(computer, {a: [p[0] for p in pairs], b: [p[1] for p in pairs]}, [diff, borrow_mem])
+    assert list(diff_values) == [(a_val - b_val) % 8 for a_val, b_val in pairs]
+    assert list(borrow_values) == [int(a_val < b_val) for a_val, b_val in pairs]
+
+def test_SUB_shares_NOT_layer():
+    """ Test that subtracting the same variable twice only builds one NOT layer """
+    computer = NPComputer()
+    x = VAR(computer, n=4)
+    y = VAR(computer, n=4)
+    b = VAR(computer, n=4)
+
+    nodes = computer.store.number_of_nodes()
+    SUB(computer, x, b)
+    first = computer.store.number_of_nodes() - nodes
+
+    nodes = computer.store.number_of_nodes()
+    SUB(computer, y, b)
+    second = computer.store.number_of_nodes() - nodes
+
+    assert first - second == len(b), "The second SUB should reuse the NOT of every bit of b"
+    assert NEGATE(computer, b).bits == NEGATE(computer, b).bits, "NEGATE should give the same bits for the same MEM"
+
+def test_all():
+    """ Run all tests for the SUB function """
+    test_SUB_1bit()
+    test_SUB_borrow_BREAK()
+    test_SUB_3bit()
+    test_SUB_shares_NOT_layer()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
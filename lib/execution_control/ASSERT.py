@@ -0,0 +1,149 @@
+# These are helpers for the FIND paradigm that BREAK the computer unless a comparison holds
+# They are cheaper than building the comparison and giving NOT of it to BREAK:
+#   - A bit that must be a constant is restricted by connecting it to the tri-bit node it can not be (one edge, no nodes)
+#   - Two bits that must be equal are both connected to one shared node, which can only be the NOT of both (one node)
+#   - A comparison bit that must be 1 is connected to the ZERO tri-bit node, which is the same as BREAK(NOT(bit))
+
+from lib.run.INIT import NPComputer
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+from lib.execution_control.BREAK import BREAK
+from lib.calculator_logic.COMPARE import get_terms, lt_term
+from lib.run.CONST import CONST
+from lib.run.VAR import VAR
+from lib.run.MEM import MEM
+
+def ASSERT(computer: NPComputer, x_id) -> None:
+    """ BREAK the computer unless the input is 1
+
+    Args:
+        computer (NPComputer): This is the computer that is being built
+        x_id (int | bool): The node that must be 1 (or an already known bit)
+    """
+
+    if isinstance(x_id, bool):
+        # A known 0 can never be 1 so this always breaks
+        if not x_id:
+            BREAK(computer, computer.generate_node(allow={TriBit.ONE}))
+        return
+
+    computer.add_edge(x_id, TRI_BIT_TO_NODE[TriBit.ZERO])
+
+def ASSERT_EQ(computer: NPComputer, a, b) -> None:
+    """ BREAK the computer unless two n bit variables are equal
+
+    Args:
+        computer (NPComputer): This is the computer that is being built
+        a (MEM | int): The first variable, or a constant
+        b (MEM | int): The second variable, or a constant
+    """
+
+    n = len(a) if not isinstance(a, int) else len(b)
+    for x, y in zip(get_terms(computer, a, n), get_terms(computer, b, n)):
+        if isinstance(x, bool) and isinstance(y, bool):
+            ASSERT(computer, x == y)
+        elif isinstance(x, bool) or isinstance(y, bool):
+            # Restrict the variable bit so it can not be the opposite of the constant
+            bit, value = (y, x) if isinstance(x, bool) else (x, y)
+            computer.add_edge(bit, TRI_BIT_TO_NODE[TriBit.ZERO if value else TriBit.ONE])
+        else:
+            # Both bits have to be the NOT of the same 0 or 1 node, so they are the same
+            tie = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+            computer.add_edge(tie, x)
+            computer.add_edge(tie, y)
+
+def ASSERT_LT(computer: NPComputer, a, b) -> None:
+    """ BREAK the computer unless a < b (unsigned)
+
+    Args:
+        computer (NPComputer): This is the computer that is being built
+        a (MEM | int): The first variable, or a constant
+        b (MEM | int): The second variable, or a constant
+    """
+
+    ASSERT(computer, lt_term(computer, a, b))
+
+def ASSERT_LE(computer: NPComputer, a, b) -> None:
+    """ BREAK the computer unless a <= b (unsigned)
+
+    Args:
+        computer (NPComputer): This is the computer that is being built
+        a (MEM | int): The first variable, or a constant
+        b (MEM | int): The second variable, or a constant
+    """
+
+    # a <= b is the same as NOT(b < a), so BREAK directly on b < a
+    lt = lt_term(computer, b, a)
+    if isinstance(lt, bool):
+        ASSERT(computer, not lt)
+    else:
+        BREAK(computer, lt)
+
+# Test functions
+def _read(computer: NPComputer, mapping: dict, mem: MEM) -> int:
+    return sum(1 << i for i, bit in enumerate(mem.bits) if mapping[bit] == mapping[TRI_BIT_TO_NODE[TriBit.ONE]])
+
+def test_ASSERT_EQ_const():
+    """ Test that asserting a variable equals a constant costs one edge per bit and no nodes """
+    computer = NPComputer()
+    var = VAR(computer, n=4)
+    nodes, edges = computer.store.number_of_nodes(), computer.store.number_of_edges()
+    ASSERT_EQ(computer, var, 9)
+
+    assert computer.store.number_of_nodes() == nodes, "Asserting against a constant should not add nodes"
+    assert computer.store.number_of_edges() == edges + 4, "Asserting against a constant should add one edge per bit"
+
+    is_solvable, mapping = computer.get_result_mapping()
+    assert is_solvable is True
+    assert _read(computer, mapping, var) == 9, "The variable should be found to be 9"
+
+def test_ASSERT_EQ_vars():
+    """ Test that asserting two variables are equal ties every bit together """
+    computer = NPComputer()
+    a = CONST(computer, value=5, n=3)
+    b = VAR(computer, n=3)
+    c = VAR(computer, n=3)
+    ASSERT_EQ(computer, b, c)
+    ASSERT_EQ(computer, a, c)
+
+    is_solvable, mapping = computer.get_result_mapping()
+    assert is_solvable is True
+    assert _read(computer, mapping, b) == 5, "b is tied to c which is tied to 5"
+
+    computer = NPComputer()
+    ASSERT_EQ(computer, CONST(computer, value=1, n=2), CONST(computer, value=2, n=2))
+    assert computer() is False, "Asserting two different constants are equal should break the computer"
+
+def test_ASSERT_LT():
+    """ Test that asserting a variable is less than a constant only allows smaller values """
+    computer = NPComputer()
+    var = VAR(computer, n=2)
+    ASSERT_LT(computer, var, 1)
+
+    is_solvable, mapping = computer.get_result_mapping()
+    assert is_solvable is True
+    assert _read(computer, mapping, var) == 0, "The only 2 bit value less than 1 is 0"
+
+    computer = NPComputer()
+    ASSERT_LT(computer, VAR(computer, n=2), 0)
+    assert computer() is False, "Nothing is less than 0"
+
+def test_ASSERT_LE():
+    """ Test that asserting a variable is at most a constant gives BREAK the right bit """
+    computer = NPComputer()
+    var = VAR(computer, n=1)
+    ASSERT_LE(computer, 1, var)
+
+    is_solvable, mapping = computer.get_result_mapping()
+    assert is_solvable is True
+    assert _read(computer, mapping, var) == 1, "The only 1 bit value at least 1 is 1"
+
+def test_all():
+    """ Run all tests for the ASSERT helpers """
+    test_ASSERT_EQ_const()
+    test_ASSERT_EQ_vars()
+    test_ASSERT_LT()
+    test_ASSERT_LE()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -18,6 +18,27 @@ from lib.run.CONST import CONST
 from lib.run.VAR import VAR
 from lib.run.MEM import MEM
 
+def get_toggle_branches(computer: NPComputer, toggle_node: int) -> tuple[int, int]:
+    """ Gets the two branches that decode a toggle node, they are only built the first time a toggle is used
+
+    Args:
+        computer (NPComputer): The NP computer to generate the branches for
+        toggle_node (int): The node that toggles the IF layer
+
+    Returns:
+        int, int: branch1 (1 when the toggle is 0, X when it is 1) and branch2 (0 when the toggle is 0, X when it is 1)
+    """
+
+    if toggle_node not in computer.toggle_branches:
+        # These branches control the main logic
+        branch1 = NOT(computer, SWAP(computer, NOT(computer, toggle_node), from_poss=[TriBit.ZERO, TriBit.ONE], to_poss=[TriBit.ONE, TriBit.X]), between={TriBit.ONE, TriBit.X})
+        branch2 = NOT(computer, SWAP(computer, toggle_node, from_poss=[TriBit.ONE, TriBit.ZERO], to_poss=[TriBit.ZERO, TriBit.X]), between={TriBit.ZERO, TriBit.X})
+        # branch1 = NOT(computer, SWAP(computer, toggle_node), between={TriBit.ONE, TriBit.X})
+        # branch2 = NOT(computer, SWAP(computer, NOT(computer, toggle_node), from_poss=[TriBit.ONE, TriBit.ZERO], to_poss=[TriBit.ZERO, TriBit.X]), between={TriBit.ZERO, TriBit.X})
+        computer.toggle_branches[toggle_node] = (branch1, branch2)
+
+    return computer.toggle_branches[toggle_node]
+
 def generate_IF_layer(computer: NPComputer, nodes: list[int], toggle_node: int) -> list[int]:
     """ Generate the IF layer for the NP computer
 
@@ -35,11 +56,8 @@ def generate_IF_layer(computer: NPComputer, nodes: list[int], toggle_node: int)
     # 1. To have the open as cant be 2 so that it must be 0 or 1, be the negation of the input, to then negate the output
     # 2. To have the closed as cant be 0 or 1 so that it must be 2, that way the input doesnt effect the output and vice versa
 
-    # These branches control the main logic
-    branch1 = NOT(computer, SWAP(computer, NOT(computer, toggle_node), from_poss=[TriBit.ZERO, TriBit.ONE], to_poss=[TriBit.ONE, TriBit.X]), between={TriBit.ONE, TriBit.X})
-    branch2 = NOT(computer, SWAP(computer, toggle_node, from_poss=[TriBit.ONE, TriBit.ZERO], to_poss=[TriBit.ZERO, TriBit.X]), between={TriBit.ZERO, TriBit.X})
-    # branch1 = NOT(computer, SWAP(computer, toggle_node), between={TriBit.ONE, TriBit.X})
-    # branch2 = NOT(computer, SWAP(computer, NOT(computer, toggle_node), from_poss=[TriBit.ONE, TriBit.ZERO], to_poss=[TriBit.ZERO, TriBit.X]), between={TriBit.ZERO, TriBit.X})
+    # These branches control the main logic, they are shared by every layer with the same toggle
+    branch1, branch2 = get_toggle_branches(computer, toggle_node)
 
     # Apply them to the layered output
     output_nodes = []
@@ -51,6 +69,24 @@ def generate_IF_layer(computer: NPComputer, nodes: list[int], toggle_node: int)
     
     return output_nodes
 
+def generate_IF_layers(computer: NPComputer, mems: list[MEM], toggle_node: int) -> list[MEM]:
+    """ Generate IF layers for many MEMs under the same toggle in one call, the toggle is only decoded once
+
+    Args:
+        computer (NPComputer): The NP computer to generate the IF layers for
+        mems (list[MEM]): The MEMs to connect to the IF layers
+        toggle_node (int): The node that will toggle the IF layers to allow output (1 allows output, 0 blocks output)
+
+    Returns:
+        list[MEM]: The corresponding MEM for the output layer of each input MEM
+    """
+
+    outputs = []
+    for mem in mems:
+        output_nodes = generate_IF_layer(computer, list(mem.bits), toggle_node)
+        outputs.append(MEM(computer, bits=output_nodes, n=len(output_nodes)))
+    return outputs
+
 def IF_toggle0():
     computer = NPComputer()
 
@@ -220,18 +256,18 @@ def test_IF_layer_branch_creation():
     """Test that IF layer creates the expected branch nodes"""
     computer = NPComputer()
     
-    initial_node_count = len(computer.graph.nodes())
+    initial_node_count = computer.store.number_of_nodes()
     
     # Create input
     input_nodes = [computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})]
     toggle_node = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
     
-    intermediate_count = len(computer.graph.nodes())
+    intermediate_count = computer.store.number_of_nodes()
     
     # Generate IF layer
     output_nodes = generate_IF_layer(computer, input_nodes, toggle_node)
     
-    final_count = len(computer.graph.nodes())
+    final_count = computer.store.number_of_nodes()
     
     # Should create: branch1, branch2, and output nodes
     # branch1 = NOT(SWAP(NOT(toggle)))
@@ -323,18 +359,52 @@ def test_IF_layer_edge_connections():
     input_node = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
     toggle_node = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
     
-    initial_edges = len(computer.graph.edges())
+    initial_edges = computer.store.number_of_edges()
     
     # Generate IF layer
     output_nodes = generate_IF_layer(computer, [input_node], toggle_node)
     
-    final_edges = len(computer.graph.edges())
+    final_edges = computer.store.number_of_edges()
     
     # Should have added edges for branch logic and connections
     assert final_edges > initial_edges, "Should add edges for IF layer logic"
     
     print(f"Edges added by IF layer: {final_edges - initial_edges}")
 
+def test_IF_layer_shares_branches():
+    """Test that layers with the same toggle reuse the decoded branches"""
+    computer = NPComputer()
+    toggle_node = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    input_nodes = [computer.generate_node(allow={TriBit.ZERO, TriBit.ONE}) for _ in range(3)]
+
+    # The first layer decodes the toggle, the chained layer only adds its output nodes
+    intermediate_output = generate_IF_layer(computer, input_nodes, toggle_node)
+    nodes = computer.store.number_of_nodes()
+    generate_IF_layer(computer, intermediate_output, toggle_node)
+
+    assert computer.store.number_of_nodes() - nodes == len(input_nodes), "A second layer with the same toggle should only add output nodes"
+    assert get_toggle_branches(computer, toggle_node) == computer.toggle_branches[toggle_node]
+
+    # A different toggle still gets its own branches
+    other_toggle = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    assert get_toggle_branches(computer, other_toggle) != get_toggle_branches(computer, toggle_node)
+
+def test_IF_layers_bulk():
+    """Test gating many MEMs under one toggle in a single call"""
+    computer = NPComputer()
+    toggle_node = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    mems = [VAR(computer, n=2), CONST(computer, value=5, n=3), VAR(computer, n=1)]
+
+    nodes = computer.store.number_of_nodes()
+    outputs = generate_IF_layers(computer, mems, toggle_node)
+    added = computer.store.number_of_nodes() - nodes
+
+    assert [len(output) for output in outputs] == [2, 3, 1], "Each output MEM should match its input MEM"
+    assert added == 11 + 6, f"The toggle should be decoded once (11 nodes) plus one node per bit, added {added}"
+
+    is_valid, mapping = computer.get_result_mapping()
+    assert is_valid, "Graph should remain valid with bulk IF layers"
+
 def test_all():
     """Run all IF layer tests"""
     IF_toggle0()
@@ -350,6 +420,8 @@ def test_all():
     test_IF_layer_chaining()
     test_IF_layer_large_input()
     test_IF_layer_edge_connections()
+    test_IF_layer_shares_branches()
+    test_IF_layers_bulk()
 
 if __name__ == "__main__":
     test_all()
@@ -0,0 +1,152 @@
+# This is a native 2:1 multiplexer (MUX) for the NP computer, it picks a when sel is 1 and b when sel is 0
+# Unlike the IF layer the output is really connected to the input that was picked, so a true if/else is one MUX
+# The select is decoded once into 4 nodes that are shared by every bit of the word:
+#   branch1 = 1 when sel is 0 and X when sel is 1 (same as the IF layer)
+#   branch2 = 0 when sel is 0 and X when sel is 1 (same as the IF layer)
+#   close_a = NOT(branch1) between 1 and X, so X when sel is 0 and 1 when sel is 1
+#   close_b = NOT(branch2) between 0 and X, so X when sel is 0 and 0 when sel is 1
+# Each bit then only needs 3 nodes:
+#   gate_a is connected to branch1, branch2 and a, when sel is 1 it can not be X so it is forced to NOT(a), otherwise it is X
+#   gate_b is connected to close_a, close_b and b, when sel is 0 it can not be X so it is forced to NOT(b), otherwise it is X
+#   out (0 or 1) is connected to gate_a and gate_b, exactly one of them is X so out is the NOT of the other one
+
+from lib.run.INIT import NPComputer
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+from lib.binary_logic.NOT import NOT
+from lib.execution_control.IF import get_toggle_branches
+from lib.run.CONST import CONST
+from lib.run.VAR import VAR
+from lib.run.MEM import MEM
+
+def decode_select(computer: NPComputer, sel: int) -> tuple[int, int, int, int]:
+    """ Decodes a select bit into the 4 nodes that every bit of a MUX uses (see the top of the file)
+
+    Args:
+        computer (NPComputer): The computer that is being built
+        sel (int): The select bit node, it has to be 0 or 1
+
+    Returns:
+        int, int, int, int: branch1, branch2, close_a, close_b
+    """
+
+    # The branches are the same ones the IF layer uses, so they are shared with any IF layer on the same select
+    branch1, branch2 = get_toggle_branches(computer, sel)
+    close_a = NOT(computer, branch1, between={TriBit.ONE, TriBit.X})
+    close_b = NOT(computer, branch2, between={TriBit.ZERO, TriBit.X})
+    return branch1, branch2, close_a, close_b
+
+def MUX(computer: NPComputer, sel: int, a: MEM, b: MEM) -> MEM:
+    """ Picks between two n bit variables, a when sel is 1 and b when sel is 0
+
+    Args:
+        computer (NPComputer): The computer that is being built
+        sel (int): The select bit node, it has to be 0 or 1
+        a (MEM): The variable picked when sel is 1
+        b (MEM): The variable picked when sel is 0
+
+    Returns:
+        MEM: The picked variable, 13 nodes for the select (2 if the select already has IF branches) plus 3 nodes per bit
+    """
+
+    # Make sure the MEM has the same number of bits
+    assert len(a) == len(b), "Both MEMs must have the same number of bits"
+
+    branch1, branch2, close_a, close_b = decode_select(computer, sel)
+
+    out_bits = []
+    for a_bit, b_bit in zip(a.bits, b.bits):
+        gate_a = computer.generate_node()
+        for node in (branch1, branch2, a_bit):
+            computer.add_edge(gate_a, node)
+
+        gate_b = computer.generate_node()
+        for node in (close_a, close_b, b_bit):
+            computer.add_edge(gate_b, node)
+
+        out = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+        computer.add_edge(out, gate_a)
+        computer.add_edge(out, gate_b)
+        computer.netlist.append(("MUX", out, (sel, a_bit, b_bit)))
+        computer.gate_starts[out] = gate_a
+        out_bits.append(out)
+
+    return MEM(computer, bits=out_bits, n=len(out_bits))
+
+# Test functions
+def _read(computer: NPComputer, mapping: dict, mem: MEM) -> int:
+    return sum(1 << i for i, bit in enumerate(mem.bits) if mapping[bit] == mapping[TRI_BIT_TO_NODE[TriBit.ONE]])
+
+def test_MUX_1bit():
+    """ Test the MUX with every 1 bit input and select """
+    for sel_val in range(2):
+        for a_val in range(2):
+            for b_val in range(2):
+                computer = NPComputer()
+                sel = CONST(computer, value=sel_val, n=1).bits[0]
+                a = CONST(computer, value=a_val, n=1)
+                b = CONST(computer, value=b_val, n=1)
+
+                out = MUX(computer, sel, a, b)
+
+                is_solvable, mapping = computer.get_result_mapping()
+                assert is_solvable is True, f"MUX({sel_val}, {a_val}, {b_val}) should be colorable"
+                assert _read(computer, mapping, out) == (a_val if sel_val else b_val), f"MUX({sel_val}, {a_val}, {b_val}) picked the wrong input"
+
+def test_MUX_word():
+    """ Test the MUX on 4 bit words """
+    for sel_val in range(2):
+        computer = NPComputer()
+        sel = CONST(computer, value=sel_val, n=1).bits[0]
+        out = MUX(computer, sel, CONST(computer, value=0b1010, n=4), CONST(computer, value=0b0110, n=4))
+
+        is_solvable, mapping = computer.get_result_mapping()
+        assert is_solvable is True
+        assert _read(computer, mapping, out) == (0b1010 if sel_val else 0b0110), f"MUX with select {sel_val} picked the wrong word"
+
+def test_MUX_forced_by_output():
+    """ Test that pinning the output pins the inputs, so the MUX works both ways for FIND """
+    computer = NPComputer()
+    sel = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    a = CONST(computer, value=1, n=1)
+    b = CONST(computer, value=0, n=1)
+    out = MUX(computer, sel, a, b)
+    computer.add_edge(out.bits[0], TRI_BIT_TO_NODE[TriBit.ONE])
+
+    is_solvable, mapping = computer.get_result_mapping()
+    assert is_solvable is True
+    assert mapping[sel] == mapping[TRI_BIT_TO_NODE[TriBit.ZERO]], "Only a select of 0 gives an output of 0"
+
+def test_MUX_size():
+    """ Test that the select is decoded once and each bit only adds 3 nodes """
+    for n in [1, 8, 64]:
+        computer = NPComputer()
+        sel = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+        a, b = VAR(computer, n=n), VAR(computer, n=n)
+        nodes, edges = computer.store.number_of_nodes(), computer.store.number_of_edges()
+        MUX(computer, sel, a, b)
+
+        assert computer.store.number_of_nodes() - nodes == 13 + 3 * n, f"MUX on {n} bits should add {13 + 3 * n} nodes"
+        assert computer.store.number_of_edges() - edges == 28 + 9 * n, f"MUX on {n} bits should add {28 + 9 * n} edges"
+
+def test_MUX_shares_branches():
+    """ Test that MUXes and IF layers on the same select share the decoded branches """
+    computer = NPComputer()
+    sel = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    a, b = VAR(computer, n=4), VAR(computer, n=4)
+    MUX(computer, sel, a, b)
+
+    nodes = computer.store.number_of_nodes()
+    MUX(computer, sel, b, a)
+    assert computer.store.number_of_nodes() - nodes == 2 + 3 * 4, "A second MUX on the same select should only add the 2 close nodes and the bits"
+
+def test_all():
+    """ Run all tests for the MUX """
+    test_MUX_1bit()
+    test_MUX_word()
+    test_MUX_forced_by_output()
+    test_MUX_size()
+    test_MUX_shares_branches()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -0,0 +1,256 @@
+# This solves many instances of the same graph at once, where each instance only has different domains
+# (like all 256 4 bit adders from main.py, which are the same circuit with different CONST inputs)
+# The graph is stored once as CSR arrays (indptr, indices) and the domains of every instance as one
+#   (batch, nodes, 3) bool tensor, so propagation and decisions are done for every instance in the same NumPy operations
+# Each instance keeps its own decision stack, instances that are finished (colored, or known not colorable) are masked out
+# Backtracking uses a trail of the depth each color was removed at instead of a copy of the domains for every level,
+#   so the memory stays (batch, nodes, 3) however deep the search goes
+# Nodes are decided in the same order as is_colorable (sorted node ids) taking the lowest color first
+
+import numpy as np
+import networkx as nx
+
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+
+class BatchSolver:
+    def __init__(self, graph: nx.Graph):
+        """ Stores the graph as CSR arrays
+
+        Args:
+            graph (nx.Graph): The graph that every instance shares
+        """
+
+        self.nodes = sorted(graph.nodes())
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+        neighbors = [sorted(self.index[other] for other in graph.neighbors(node) if other != node) for node in self.nodes]
+        self.degree = np.array([len(row) for row in neighbors], dtype=np.int64)
+        self.indptr = np.concatenate([[0], np.cumsum(self.degree)]).astype(np.int64)
+        self.indices = np.array([i for row in neighbors for i in row], dtype=np.int64)
+
+    def domains_from_masks(self, masks: list[dict]) -> np.ndarray:
+        """ Makes the domain tensor from a bitmask of colors per node for each instance (bit c for color c)
+
+        Args:
+            masks (list[dict]): One {node: bitmask} per instance, missing nodes can be any color
+
+        Returns:
+            np.ndarray: The (batch, nodes, 3) bool domain tensor
+        """
+
+        domains = np.ones((len(masks), len(self.nodes), 3), dtype=bool)
+        for b, instance in enumerate(masks):
+            for node, mask in instance.items():
+                domains[b, self.index[node]] = [(mask >> color) & 1 for color in range(3)]
+        return domains
+
+    def _propagate(self, domains: np.ndarray):
+        """ Removes the color of every decided node from its neighbors in every instance, until nothing changes """
+
+        has_neighbors = self.degree > 0
+        starts = np.minimum(self.indptr[:-1], len(self.indices))
+        while True:
+            decided = domains & (domains.sum(axis=2) == 1)[:, :, None]
+
+            # For each node, OR the decided colors of its neighbors (a zero row at the end covers the nodes with no neighbors)
+            gathered = np.concatenate([decided[:, self.indices, :], np.zeros((len(domains), 1, 3), dtype=bool)], axis=1)
+            taken = np.logical_or.reduceat(gathered, starts, axis=1) & has_neighbors[None, :, None]
+
+            narrowed = domains & ~taken
+            if np.array_equal(narrowed, domains):
+                return
+            domains[...] = narrowed
+
+    def solve(self, domains: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """ Solves every instance
+
+        Args:
+            domains (np.ndarray): The (batch, nodes, 3) bool domain tensor, it is not changed
+
+        Returns:
+            np.ndarray, np.ndarray: If each instance is colorable (batch,) and the coloring (batch, nodes), -1 where not colorable
+        """
+
+        domains = domains.copy()
+        batch, n = domains.shape[:2]
+
+        result = np.zeros(batch, dtype=bool)
+        finished = np.zeros(batch, dtype=bool)
+        depth = np.zeros(batch, dtype=np.int64)
+
+        # The trail: the depth at which each color was taken out of each domain (-1 while it is still in), so going back to
+        #   a depth puts back every color taken out below it, this is one int per entry however deep the search goes
+        removed = np.full((batch, n, 3), -1, dtype=np.int32)
+
+        # The node and color decided at each level, one entry per level and each instance uses the levels up to its own depth
+        decided_node, decided_color = [], []
+
+        while not finished.all():
+            active = np.flatnonzero(~finished)
+
+            sub = domains[active]
+            before = sub.copy()
+            self._propagate(sub)
+            domains[active] = sub
+            removed[active] = np.where(before & ~sub, depth[active, None, None], removed[active])
+
+            sizes = sub.sum(axis=2)
+            conflict = (sizes == 0).any(axis=1)
+            colored = ~conflict & (sizes == 1).all(axis=1)
+
+            # Finished instances
+            done = active[colored]
+            result[done] = True
+            finished[done] = True
+
+            # Instances with a conflict go back to their last decision and rule out the color that was tried
+            failed = active[conflict]
+            lost = failed[depth[failed] == 0]
+            finished[lost] = True
+            back = failed[depth[failed] > 0]
+            if len(back):
+                depth[back] -= 1
+                restore = removed[back] > depth[back, None, None]
+                domains[back] |= restore
+                removed[back] = np.where(restore, -1, removed[back])
+                for level in np.unique(depth[back]):
+                    at_level = back[depth[back] == level]
+                    domains[at_level, decided_node[level][at_level], decided_color[level][at_level]] = False
+                    removed[at_level, decided_node[level][at_level], decided_color[level][at_level]] = level
+
+            # The rest pick the first node that is not decided and try its lowest color
+            deciding = active[~conflict & ~colored]
+            if len(deciding):
+                open_nodes = domains[deciding].sum(axis=2) > 1
+                nodes = open_nodes.argmax(axis=1)
+                colors = domains[deciding, nodes].argmax(axis=1)
+
+                for level in np.unique(depth[deciding]):
+                    if level == len(decided_node):
+                        decided_node.append(np.zeros(batch, dtype=np.int64))
+                        decided_color.append(np.zeros(batch, dtype=np.int64))
+                    at_level = depth[deciding] == level
+                    instances = deciding[at_level]
+                    decided_node[level][instances] = nodes[at_level]
+                    decided_color[level][instances] = colors[at_level]
+
+                depth[deciding] += 1
+                others = domains[deciding, nodes]
+                others[np.arange(len(deciding)), colors] = False
+                domains[deciding, nodes] = False
+                domains[deciding, nodes, colors] = True
+                removed[deciding, nodes] = np.where(others, depth[deciding, None], removed[deciding, nodes])
+
+        coloring = np.where(result[:, None], domains.argmax(axis=2), -1).astype(np.int8)
+        return result, coloring
+
+    def to_mapping(self, coloring: np.ndarray) -> dict:
+        """ Turns one row of a coloring into a {node: color} mapping like is_colorable gives """
+
+        return {node: int(color) for node, color in zip(self.nodes, coloring)}
+
+def solve_assumptions_batch(computer, assumption_sets: list[dict]) -> list:
+    """ Solves a computer under each set of assumptions all at once, like NPComputer.solve_batch
+
+    Args:
+        computer (NPComputer): The computer to solve, its propagated domains are the start of every instance
+        assumption_sets (list[dict]): {VAR/MEM or bit node: value} for each instance
+
+    Returns:
+        list: (result, mapping) for each set of assumptions
+    """
+
+    solver = BatchSolver(computer.store.to_networkx())
+    one, zero = TRI_BIT_TO_NODE[TriBit.ONE], TRI_BIT_TO_NODE[TriBit.ZERO]
+
+    # Every instance starts from the propagated domains, then only the assumed bits are changed
+    domains = np.repeat(solver.domains_from_masks([computer.domains]), len(assumption_sets), axis=0)
+    for b, assumptions in enumerate(assumption_sets):
+        for key, value in assumptions.items():
+            bits = [key] if isinstance(key, int) else list(key.bits)
+            for i, bit in enumerate(bits):
+                domains[b, solver.index[bit], zero if (value >> i) & 1 else one] = False
+                domains[b, solver.index[bit], TRI_BIT_TO_NODE[TriBit.X]] = False
+
+    results, coloring = solver.solve(domains)
+    return [(bool(result), solver.to_mapping(row) if result else {}) for result, row in zip(results, coloring)]
+
+# Test functions
+def test_batch_small_graphs():
+    """ Test the batch against is_colorable on graphs with different domains """
+    from lib.run.IS_COLORABLE import is_colorable
+
+    graph = nx.cycle_graph(5)
+    solver = BatchSolver(graph)
+    masks = [{}, {0: 0b001, 1: 0b010}, {0: 0b001, 1: 0b001}, {0: 0b011, 1: 0b011, 2: 0b011, 3: 0b011, 4: 0b011}, {2: 0b100}]
+    results, coloring = solver.solve(solver.domains_from_masks(masks))
+
+    for instance, result, row in zip(masks, results, coloring):
+        assert result == is_colorable(graph, domains=instance)[0], f"Batch result is wrong for {instance}"
+        if result:
+            mapping = solver.to_mapping(row)
+            assert all(mapping[u] != mapping[v] for u, v in graph.edges()), "The coloring should be proper"
+            assert all((instance.get(node, 0b111) >> mapping[node]) & 1 for node in graph.nodes()), "The coloring should keep to the domains"
+
+    # A graph that needs backtracking (an odd wheel is not 3 colorable) and a node with no neighbors
+    graph = nx.wheel_graph(6)
+    graph.add_node(99)
+    results, _ = BatchSolver(graph).solve(np.ones((3, 7, 3), dtype=bool))
+    assert not results.any(), "A wheel with an odd rim is not 3 colorable"
+
+def test_batch_trail():
+    """ Test that backtracking with the trail matches is_colorable, and that a deep search does not keep a copy of the domains per level """
+    import random
+    import tracemalloc
+    from lib.run.IS_COLORABLE import is_colorable
+
+    # Instances that backtrack to different depths at the same time
+    rng = random.Random(0)
+    graph = nx.gnp_random_graph(14, 0.4, seed=3)
+    masks = [{node: rng.choice([0b011, 0b101, 0b110, 0b111]) for node in graph.nodes()} for _ in range(40)]
+    solver = BatchSolver(graph)
+    results, coloring = solver.solve(solver.domains_from_masks(masks))
+    assert results.any() and not results.all()
+    for instance, result, row in zip(masks, results, coloring):
+        assert result == is_colorable(graph, domains=instance)[0], f"Batch result is wrong for {instance}"
+        if result:
+            mapping = solver.to_mapping(row)
+            assert all(mapping[u] != mapping[v] for u, v in graph.edges()) and all((instance[node] >> mapping[node]) & 1 for node in graph.nodes())
+
+    # Every node of a path is a decision, so the search goes 300 levels deep
+    domains = np.ones((2, 300, 3), dtype=bool)
+    solver = BatchSolver(nx.path_graph(300))
+    tracemalloc.start()
+    results, _ = solver.solve(domains)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert results.all() and peak < 150 * domains.nbytes, "The memory should not grow with the depth of the search"
+
+def test_batch_adders():
+    """ Test solving every 2 bit addition at once against the simulator """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.ADD import ADD
+    from lib.execution_control.BREAK import BREAK
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    total, carry = ADD(computer, a, b)
+    BREAK(computer, carry)
+
+    assumption_sets = [{a: a_val, b: b_val} for a_val in range(4) for b_val in range(4)]
+    for assumptions, (result, mapping) in zip(assumption_sets, solve_assumptions_batch(computer, assumption_sets)):
+        expected = assumptions[a] + assumptions[b]
+        assert result == (expected < 4), f"ADD({assumptions[a]}, {assumptions[b]}) with a BREAK on the carry is wrong"
+        if result:
+            assert computer.read_values(mapping, total)[0] == expected
+
+def test_all():
+    """ Run all tests for the batch solver """
+    test_batch_small_graphs()
+    test_batch_trail()
+    test_batch_adders()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -0,0 +1,351 @@
+# This remembers the answers of solves so the same graph is never solved twice
+# The tests and pipelines build the same small graphs over and over (every truth table test rebuilds the same AND on the same inputs),
+#   and a computer is split into components that are often the same gadget on different bits
+# A graph is keyed by a hash of its sorted nodes with their domains and its sorted edges, so the same graph with the same node ids is a hit
+# With wl=True it is keyed by a Weisfeiler-Lehman hash instead, so the same gadget on other node ids is a hit too,
+#   the hash can be the same for graphs that are not the same so a hit is checked with an isomorphism (with the same domains)
+#   and the stored coloring is moved over to the new node ids
+# Answers are kept in a LRU in memory, and optionally in a sqlite file so other processes (and later runs) can use them,
+#   the file drops the least recently used answers when it gets bigger than max_bytes
+# The file keeps its total size in a table that triggers keep up to date, and an index on when each answer was last used,
+#   so a put only reads the total and walks the oldest answers until it fits instead of reading the whole table
+# The file can be shared so answers are kept in it as JSON (never pickle, which could run code from the file), node ids have to be ints
+# Only definite answers are kept, a solve that was stopped by a limit is not
+
+import time
+import json
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import networkx as nx
+
+from lib.run.IS_COLORABLE import is_colorable
+from lib.run.FINALS import TriBit, UNKNOWN
+
+class SolveCache:
+    def __init__(self, max_entries: int = 4096, path: str = None, max_bytes: int = 64 * 2 ** 20, wl: bool = False):
+        """ A cache of (result, mapping) for graphs that were solved
+
+        Args:
+            max_entries (int, optional): The most answers to keep in memory. Defaults to 4096.
+            path (str, optional): A sqlite file to also keep the answers in. Defaults to None.
+            max_bytes (int, optional): The most bytes of answers to keep in the file. Defaults to 64 MiB.
+            wl (bool, optional): Key by a Weisfeiler-Lehman hash, so the same graph on other node ids is a hit. Defaults to False.
+        """
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.wl = wl
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=30)
+            self._db.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, value TEXT, size INTEGER, used REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_used ON answers (used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS total (bytes INTEGER)")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS answers_insert AFTER INSERT ON answers BEGIN UPDATE total SET bytes = bytes + NEW.size; END")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS answers_delete AFTER DELETE ON answers BEGIN UPDATE total SET bytes = bytes - OLD.size; END")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS answers_update AFTER UPDATE OF size ON answers BEGIN UPDATE total SET bytes = bytes - OLD.size + NEW.size; END")
+
+            # A file from before the total was kept is added up once
+            self._db.execute("INSERT INTO total SELECT COALESCE(SUM(size), 0) FROM answers WHERE NOT EXISTS (SELECT 1 FROM total)")
+            self._db.commit()
+
+    def key(self, nodes: list, edges: list, domains: dict) -> str:
+        """ The key of a graph given as sorted nodes, edges and domains (like the arguments of a component) """
+
+        if self.wl:
+            graph = _build(nodes, edges, domains)
+            return f"wl:{len(nodes)}:{len(edges)}:" + nx.weisfeiler_lehman_graph_hash(graph, node_attr="domain")
+
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(np.array([(node, domains.get(node, 0b111)) for node in sorted(nodes)], dtype=np.int64).tobytes())
+        digest.update(np.array(sorted(tuple(sorted(edge)) for edge in edges), dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    def get(self, nodes: list, edges: list, domains: dict) -> tuple[bool, dict]:
+        """ Looks up the answer for a graph
+
+        Returns:
+            (bool, dict): (result, mapping) if it was solved before, otherwise None
+        """
+
+        key = self.key(nodes, edges, domains)
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        elif self._db is not None:
+            row = self._db.execute("SELECT value FROM answers WHERE key = ?", (key,)).fetchone()
+            value = _loads(row[0]) if row is not None else None
+            if value is not None:
+                self._db.execute("UPDATE answers SET used = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+                self._remember(key, value)
+
+        answer = None if value is None else self._answer(value, nodes, edges, domains)
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+    def put(self, nodes: list, edges: list, domains: dict, result: bool, mapping: dict):
+        """ Remembers the answer for a graph, an UNKNOWN answer is ignored """
+
+        if result is UNKNOWN:
+            return
+        key = self.key(nodes, edges, domains)
+
+        # A WL hit has to be checked against the graph it was stored for
+        value = (result, dict(mapping), (list(nodes), list(edges), dict(domains)) if self.wl else None)
+        self._remember(key, value)
+        if self._db is not None:
+            text = _dumps(value)
+            self._db.execute("INSERT INTO answers VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, used = excluded.used",
+                             (key, text, len(text), time.time()))
+            self._evict()
+            self._db.commit()
+
+    def _remember(self, key: str, value: tuple):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """ Drops the least recently used answers from the file until it is small enough """
+
+        total = self._db.execute("SELECT bytes FROM total").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # The index gives the oldest answers first, only as many are read as have to go
+        keys = []
+        for key, size in self._db.execute("SELECT key, size FROM answers ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            keys.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM answers WHERE key = ?", keys)
+
+    def _answer(self, value: tuple, nodes: list, edges: list, domains: dict) -> tuple[bool, dict]:
+        """ The stored answer, moved over to the node ids of this graph when the key is a WL hash """
+
+        result, mapping, stored = value
+        if stored is None:
+            return result, dict(mapping)
+
+        matcher = nx.algorithms.isomorphism.GraphMatcher(_build(*stored), _build(nodes, edges, domains),
+                                                         node_match=lambda a, b: a["domain"] == b["domain"])
+        if not matcher.is_isomorphic():
+            return None
+        return result, {matcher.mapping[node]: color for node, color in mapping.items()}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+def _dumps(value: tuple) -> str:
+    """ Writes a (result, mapping, stored graph) answer as JSON """
+
+    result, mapping, stored = value
+    if stored is not None:
+        nodes, edges, domains = stored
+        stored = [list(nodes), [list(edge) for edge in edges], list(domains.items())]
+    return json.dumps([result, list(mapping.items()), stored])
+
+def _loads(text: str) -> tuple:
+    """ Reads an answer written by _dumps, or None if it is not one (like a row from an older file) """
+
+    try:
+        result, mapping, stored = json.loads(text)
+    except (ValueError, TypeError):
+        return None
+    if stored is not None:
+        nodes, edges, domains = stored
+        stored = (nodes, [tuple(edge) for edge in edges], dict(domains))
+    return result, dict(mapping), stored
+
+def _build(nodes: list, edges: list, domains: dict) -> nx.Graph:
+    graph = nx.Graph()
+    graph.add_nodes_from((node, {"domain": domains.get(node, 0b111)}) for node in nodes)
+    graph.add_edges_from(edges)
+    return graph
+
+def cached_is_colorable(graph: nx.Graph, domains: dict = None, cache: SolveCache = None, **kwargs) -> tuple[bool, dict]:
+    """ is_colorable, but a graph that was solved before is only looked up
+
+    Args:
+        graph (nx.Graph): The graph to solve
+        domains (dict, optional): Bitmask of the colors each node can be. Defaults to None.
+        cache (SolveCache, optional): The cache to use. Defaults to a cache shared by this process.
+        **kwargs: Passed to is_colorable (like timeout and max_decisions)
+
+    Returns:
+        (bool, dict): (result, mapping), like is_colorable
+    """
+
+    cache = cache if cache is not None else default_cache
+    nodes, edges = sorted(graph.nodes()), list(graph.edges())
+    domains = {node: (domains or {}).get(node, 0b111) for node in nodes}
+    answer = cache.get(nodes, edges, domains)
+    if answer is not None:
+        return answer
+    result, mapping = is_colorable(graph, domains=domains, **kwargs)
+    cache.put(nodes, edges, domains, result, mapping)
+    return result, mapping
+
+# The cache cached_is_colorable uses when it is not given one
+default_cache = SolveCache()
+
+# Test functions
+def test_solve_cache():
+    """ Test that a graph is only solved once, and that answers are kept in order of use """
+    cache = SolveCache(max_entries=2)
+    wheel, petersen = nx.wheel_graph(6), nx.petersen_graph()
+    assert cached_is_colorable(wheel, cache=cache)[0] is False
+    assert cached_is_colorable(wheel, cache=cache)[0] is False
+    result, mapping = cached_is_colorable(petersen, cache=cache)
+    assert result is True and cached_is_colorable(petersen, cache=cache) == (result, mapping)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # The domains are part of the key
+    assert cached_is_colorable(petersen, {0: 0b001, 2: 0b001}, cache=cache)[0] is True
+    assert cache.misses == 3
+
+    # The wheel was used least recently, so it was dropped
+    assert cache.get(sorted(wheel.nodes()), list(wheel.edges()), {node: 0b111 for node in wheel.nodes()}) is None
+
+    # A stopped solve is not kept
+    cached_is_colorable(nx.wheel_graph(8), max_decisions=1, cache=cache)
+    assert cached_is_colorable(nx.wheel_graph(8), cache=cache)[0] is False and cache.misses == 6
+
+def test_solve_cache_wl():
+    """ Test that a WL key finds the same graph on other node ids and moves the coloring over """
+    cache = SolveCache(wl=True)
+    path = nx.path_graph(7)
+    cached_is_colorable(path, {0: 0b001}, cache=cache)
+
+    shifted = nx.relabel_nodes(path, {node: node + 100 for node in path.nodes()})
+    result, mapping = cached_is_colorable(shifted, {100: 0b001}, cache=cache)
+    assert result is True and cache.hits == 1 and mapping[100] == 0
+    assert all(mapping[u] != mapping[v] for u, v in shifted.edges())
+
+    # The same domain on a node that is not on the end is another graph
+    cached_is_colorable(shifted, {101: 0b001}, cache=cache)
+    assert cache.hits == 1
+
+def test_solve_cache_file():
+    """ Test that answers are kept in the file for another cache, and the file drops the oldest when it is full """
+    import os
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "answers.sqlite")
+        first = SolveCache(path=path)
+        result, mapping = cached_is_colorable(nx.petersen_graph(), cache=first)
+        first.close()
+
+        second = SolveCache(path=path)
+        assert cached_is_colorable(nx.petersen_graph(), cache=second) == (result, mapping) and second.hits == 1
+        second.close()
+
+        # WL answers keep the graph they were stored for, and it comes back from the file the same
+        wl = SolveCache(path=path, wl=True)
+        path_graph = nx.path_graph(7)
+        cached_is_colorable(path_graph, {0: 0b001}, cache=wl)
+        wl.close()
+        wl = SolveCache(path=path, wl=True)
+        shifted = nx.relabel_nodes(path_graph, {node: node + 100 for node in path_graph.nodes()})
+        result, mapping = cached_is_colorable(shifted, {100: 0b001}, cache=wl)
+        assert result is True and wl.hits == 1 and mapping[100] == 0
+        assert wl._db.execute("SELECT value FROM answers").fetchone()[0].startswith("["), "Answers are kept as JSON"
+
+        # A row that is not JSON (like a pickle from an older file) is a miss, not an error
+        wl._db.execute("UPDATE answers SET value = ?", (b"\x80\x04junk",))
+        wl._memory.clear()
+        cached_is_colorable(shifted, {100: 0b001}, cache=wl)
+        assert wl.hits == 1
+        wl.close()
+
+        small = SolveCache(path=path, max_bytes=1)
+        cached_is_colorable(nx.cycle_graph(5), cache=small)
+        assert small._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 0, "Nothing fits in 1 byte"
+        small.close()
+
+        # The total kept by the triggers matches the rows, and only the oldest answers are dropped to make room
+        cache = SolveCache(path=path)
+        for n in range(5, 12):
+            cached_is_colorable(nx.cycle_graph(n), cache=cache)
+        cache._memory.clear()
+        cached_is_colorable(nx.cycle_graph(5), cache=cache)
+        cache.put([0], [], {0: 0b111}, True, {0: 0})
+        sizes = dict(cache._db.execute("SELECT key, size FROM answers").fetchall())
+        assert cache._db.execute("SELECT bytes FROM total").fetchone()[0] == sum(sizes.values())
+        cache.max_bytes = sum(sizes.values()) - 1
+        cached_is_colorable(nx.cycle_graph(12), cache=cache)
+        kept = {key for key, in cache._db.execute("SELECT key FROM answers")}
+        assert cache.key(*_cycle_args(6)) not in kept and cache.key(*_cycle_args(5)) in kept, "The least recently used answer should go first"
+        assert cache._db.execute("SELECT bytes FROM total").fetchone()[0] <= cache.max_bytes
+        plan = cache._db.execute("EXPLAIN QUERY PLAN SELECT key, size FROM answers ORDER BY used").fetchall()
+        assert "USING INDEX answers_used" in plan[0][-1], "The oldest answers should come from the index instead of a sort"
+        cache.close()
+
+        # A file from before the total was kept gets it added up when it is opened
+        old_path = os.path.join(directory, "old.sqlite")
+        db = sqlite3.connect(old_path)
+        db.execute("CREATE TABLE answers (key TEXT PRIMARY KEY, value TEXT, size INTEGER, used REAL)")
+        db.execute("INSERT INTO answers VALUES ('a', '[]', 40, 0), ('b', '[]', 2, 0)")
+        db.commit()
+        db.close()
+        old = SolveCache(path=old_path)
+        assert old._db.execute("SELECT bytes FROM total").fetchone()[0] == 42
+        old.close()
+
+def _cycle_args(n: int):
+    """ The key arguments cached_is_colorable uses for a cycle """
+    graph = nx.cycle_graph(n)
+    return sorted(graph.nodes()), list(graph.edges()), {node: 0b111 for node in graph.nodes()}
+
+def test_solve_cache_components():
+    """ Test that a computer with a cache only solves each gadget once """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.binary_logic.AND import AND
+
+    cache = SolveCache()
+    for _ in range(2):
+        computer = NPComputer(cache=cache)
+        a, b = VAR(computer, n=4), VAR(computer, n=4)
+        for i in range(4):
+            computer.add_edge(AND(computer, a.bits[i], b.bits[i]), computer.generate_node(allow={TriBit.ONE}))
+        assert computer.get_result_mapping()[0] is True
+    assert cache.hits == 4 and computer.last_stats["cached"] == 4, "The second computer is the same as the first one"
+
+    # With WL keys the same gadget on other bits is the same too
+    cache = SolveCache(wl=True)
+    computer = NPComputer(cache=cache)
+    a, b = VAR(computer, n=4), VAR(computer, n=4)
+    for i in range(4):
+        computer.add_edge(AND(computer, a.bits[i], b.bits[i]), computer.generate_node(allow={TriBit.ONE}))
+    result, mapping = computer.get_result_mapping()
+    assert result is True and cache.hits == 3 and all(mapping[u] != mapping[v] for u, v in computer.graph.edges())
+    a_value, b_value = computer.read_values(mapping, a, b)
+    assert a_value & b_value == 0, "Every AND has to be 0"
+
+def test_all():
+    """ Run all tests for the solve cache """
+    test_solve_cache()
+    test_solve_cache_wl()
+    test_solve_cache_file()
+    test_solve_cache_components()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
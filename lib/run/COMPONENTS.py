@@ -0,0 +1,302 @@
+# This splits the graph into parts that can be solved on their own
+# Everything in a computer is connected to the tri-bit nodes, so the whole graph is one big connected component,
+#   but the tri-bit nodes always have the same color so they (and any other node that can only be one color) are cut out
+#   and their color is just taken out of their neighbors' domains
+# What is left falls apart into independent sub computations (like 4 ANDs on different bits, or unrelated VARs)
+#   which are solved one at a time, or in a process pool when they are big, and stop as soon as one can not be colored
+# The limits (timeout, decisions, cancel) are shared by all the components, and the first one to run out stops with UNKNOWN
+# With a SolveCache (see CACHE.py) a component that was solved before is only looked up
+# Before the components are found the nodes with fewer neighbors than colors are peeled off (see KERNEL.py),
+#   so only the kernel is searched and the peeled nodes are colored greedily afterwards
+
+import os
+import time
+import multiprocessing
+
+import networkx as nx
+
+from lib.run.IS_COLORABLE import is_colorable, propagate_domains
+from lib.run.SEARCH import CancelToken
+from lib.run.KERNEL import peel as peel_nodes, color_peeled
+from lib.run.CACHE import SolveCache
+from lib.run.POOL import as_completed
+from lib.run.FINALS import SAT, UNSAT, UNKNOWN
+
+# Components with at least this many nodes are sent to the process pool (when there are at least 2 of them)
+PARALLEL_COMPONENT_SIZE = 2000
+
+def find_components(graph: nx.Graph, domains: dict, peeled: list = None) -> tuple[list[list], dict]:
+    """ Cuts out the nodes that can only be one color and finds the connected components of what is left
+
+    Args:
+        graph (nx.Graph): The graph to split
+        domains (dict): Bitmask of the colors each node can be (bit c for color c), missing nodes can be any color
+        peeled (list, optional): If given the low degree nodes are peeled off first and added to it in the order they were peeled,
+            so the components only cover the kernel. Defaults to None.
+
+    Returns:
+        list[list], dict: The nodes of each component (largest last), and the narrowed domains (None if some node has no colors left)
+    """
+
+    domains = {node: domains.get(node, 0b111) for node in graph.nodes()}
+    if 0 in domains.values() or not propagate_domains(graph, domains, [node for node, domain in domains.items() if domain & (domain - 1) == 0]):
+        return [], None
+
+    undecided = [node for node, domain in domains.items() if domain & (domain - 1)]
+    if peeled is not None:
+        kernel, order = peel_nodes(graph, domains, undecided)
+        peeled.extend(order)
+    else:
+        kernel = set(undecided)
+
+    seen = set()
+    components = []
+    for start in graph.nodes():
+        if start in seen or start not in kernel:
+            continue
+
+        # Walk over the nodes that are not decided (or peeled) yet
+        seen.add(start)
+        component, stack = [], [start]
+        while stack:
+            node = stack.pop()
+            component.append(node)
+            for neighbor in graph[node]:
+                if neighbor not in seen and neighbor in kernel:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        components.append(component)
+
+    components.sort(key=len)
+    return components, domains
+
+def _solve_component(nodes: list, edges: list, domains: dict, timeout: float = None, max_decisions: int = None,
+                     cancel: CancelToken = None) -> tuple[bool, dict, dict]:
+    """ Solves one component, it only takes plain lists and dicts so it can be sent to another process
+        (a CancelToken can not be sent, the pool is terminated instead when it is cancelled)
+
+    Returns:
+        (bool, dict, dict): result, mapping and the stats of the search
+    """
+
+    graph = nx.Graph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(edges)
+    stats = {}
+    result, mapping = is_colorable(graph, domains=domains, timeout=timeout, max_decisions=max_decisions, cancel=cancel, stats=stats)
+    return result, mapping, stats
+
+def _solve_pooled(index: int, nodes: list, edges: list, domains: dict, **limits) -> tuple[int, bool, dict, dict]:
+    """ _solve_component for the process pool, with the index of the component so the results can come back in any order """
+
+    return (index, *_solve_component(nodes, edges, domains, **limits))
+
+def _component_args(graph: nx.Graph, nodes: list, domains: dict) -> tuple:
+    in_component = set(nodes)
+    edges = [(u, v) for u in nodes for v in graph[u] if v in in_component and u < v]
+    return sorted(nodes), edges, {node: domains[node] for node in nodes}
+
+def solve_components(graph: nx.Graph, domains: dict = None, workers: int = None, parallel_size: int = PARALLEL_COMPONENT_SIZE,
+                     timeout: float = None, max_decisions: int = None, cancel: CancelToken = None, stats: dict = None,
+                     peel: bool = True, cache: SolveCache = None) -> tuple[bool, dict]:
+    """ Checks if a graph is 3 colorable by solving each independent component on its own
+
+    Args:
+        graph (nx.Graph): The graph to solve
+        domains (dict, optional): Bitmask of the colors each node can be, like computer.domains. Defaults to None.
+        workers (int, optional): The most processes to use for the big components, 1 solves everything here. Defaults to the number of CPUs.
+        parallel_size (int, optional): Components with at least this many nodes go to the process pool. Defaults to PARALLEL_COMPONENT_SIZE.
+        timeout (float, optional): Stop after this many seconds over all the components. Defaults to None.
+        max_decisions (int, optional): Stop after this many decisions over all the components (each big component gets what is left when it starts). Defaults to None.
+        cancel (CancelToken, optional): Stop when this is cancelled. Defaults to None.
+        stats (dict, optional): Filled in like is_colorable, with the decisions and backtracks added up over the components,
+            the number of "components" (and how many were "cached"), "kernel" nodes that were searched and "peeled" nodes,
+            and how many components in the process pool were "terminated" before they finished. Defaults to None.
+        peel (bool, optional): Peel off the low degree nodes before solving. Defaults to True.
+        cache (SolveCache, optional): Look up components that were solved before, and remember the new ones. Defaults to None.
+
+    Returns:
+        (bool, dict): (result, mapping), like is_colorable (UNKNOWN with the colors found so far if a limit stopped it)
+    """
+
+    start = time.perf_counter()
+    stats = stats if stats is not None else {}
+    stats.update(status=None, decisions=0, backtracks=0, depth=0, stopped=None, seconds=0.0, components=0, cached=0, kernel=0, peeled=0, terminated=0)
+
+    def finish(result, mapping):
+        stats.update(status={SAT: "SAT", UNSAT: "UNSAT", UNKNOWN: "UNKNOWN"}[result], seconds=time.perf_counter() - start)
+        return result, mapping
+
+    def add(component_stats):
+        stats["decisions"] += component_stats["decisions"]
+        stats["backtracks"] += component_stats["backtracks"]
+        stats["depth"] += component_stats["depth"]
+        stats["stopped"] = stats["stopped"] or component_stats["stopped"]
+
+    def limits():
+        """ What is left of the limits for the next component, or None if one of them has run out """
+        left = {"timeout": None, "max_decisions": None}
+        if timeout is not None:
+            left["timeout"] = timeout - (time.perf_counter() - start)
+        if max_decisions is not None:
+            left["max_decisions"] = max_decisions - stats["decisions"]
+        if cancel is not None and cancel.cancelled:
+            stats["stopped"] = "cancelled"
+        elif left["timeout"] is not None and left["timeout"] <= 0:
+            stats["stopped"] = "timeout"
+        elif left["max_decisions"] is not None and left["max_decisions"] <= 0:
+            stats["stopped"] = "max_decisions"
+        return None if stats["stopped"] else left
+
+    peeled = [] if peel else None
+    components, domains = find_components(graph, domains or {}, peeled=peeled)
+    stats.update(components=len(components), kernel=sum(len(component) for component in components), peeled=len(peeled or []))
+    if domains is None:
+        return finish(UNSAT, {})
+
+    # The decided nodes already have their color
+    mapping = {node: domain.bit_length() - 1 for node, domain in domains.items() if domain & (domain - 1) == 0}
+
+    def lookup(args):
+        """ The cached (result, mapping) of a component, or None if it has to be solved """
+        answer = cache.get(*args) if cache is not None else None
+        if answer is not None:
+            stats["cached"] += 1
+        return answer
+
+    workers = workers or os.cpu_count() or 1
+    big = [component for component in components if len(component) >= parallel_size]
+    if workers == 1 or len(big) < 2:
+        big = []
+    small = components[:len(components) - len(big)]
+
+    # The small components are quick, so any that can not be colored is found before starting the pool
+    for component in small:
+        left = limits()
+        if left is None:
+            return finish(UNKNOWN, mapping)
+        args = _component_args(graph, component, domains)
+        answer = lookup(args)
+        if answer is not None:
+            result, coloring = answer
+        else:
+            result, coloring, component_stats = _solve_component(*args, **left, cancel=cancel)
+            add(component_stats)
+            if cache is not None:
+                cache.put(*args, result, coloring)
+        mapping.update(coloring)
+        if result is UNKNOWN:
+            return finish(UNKNOWN, mapping)
+        if not result:
+            return finish(UNSAT, {})
+
+    if big:
+        left = limits()
+        if left is None:
+            return finish(UNKNOWN, mapping)
+
+        # Leaving the pool terminates it, so returning early (an UNSAT component, a limit or a cancel) stops the components that are still running
+        with multiprocessing.Pool(min(workers, len(big))) as pool:
+            submitted, jobs = [], []
+            for component in big:
+                args = _component_args(graph, component, domains)
+                answer = lookup(args)
+                if answer is None:
+                    jobs.append(pool.apply_async(_solve_pooled, (len(submitted), *args), left))
+                    submitted.append(args)
+                elif answer[0]:
+                    mapping.update(answer[1])
+                else:
+                    return finish(UNSAT, {})
+
+            finished = 0
+            for index, result, coloring, component_stats in as_completed(jobs, stop=lambda: limits() is None):
+                finished += 1
+                if cache is not None:
+                    cache.put(*submitted[index], result, coloring)
+                add(component_stats)
+                mapping.update(coloring)
+                if not result:
+                    # Stop at the first component that can not be colored (or that ran out of time)
+                    stats["terminated"] = len(jobs) - finished
+                    return finish(result, mapping if result is UNKNOWN else {})
+            if finished < len(jobs):
+                stats["terminated"] = len(jobs) - finished
+                return finish(UNKNOWN, mapping)
+
+    color_peeled(graph, domains, mapping, peeled or [])
+    return finish(SAT, mapping)
+
+# Test functions
+def test_find_components():
+    """ Test that the 4 ANDs on different bits (like test_dimacs_export) are solved as 4 parts """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.binary_logic.AND import AND
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=4), VAR(computer, n=4)
+    outputs = [AND(computer, a.bits[i], b.bits[i]) for i in range(4)]
+
+    components, _ = find_components(computer.graph, computer.domains)
+    assert len(components) == 4, f"Each AND should be its own component, found {len(components)}"
+    assert all(any(output in component for component in components) for output in outputs)
+
+    result, mapping = solve_components(computer.graph, computer.domains, workers=1)
+    assert result is True
+    assert set(mapping) == set(computer.graph.nodes()), "Every node should be in the mapping"
+    assert all(mapping[u] != mapping[v] for u, v in computer.graph.edges()), "The merged coloring should be proper"
+
+def test_solve_components_unsat():
+    """ Test that one component that can not be colored makes the whole graph not colorable """
+    graph = nx.Graph()
+    graph.add_edges_from([(0, 1), (1, 2), (2, 0)])
+    graph.add_edges_from([(10, 11), (11, 12)])
+    graph.add_edges_from((u, v) for u in range(20, 24) for v in range(u + 1, 24))
+    result, mapping = solve_components(graph, {0: 0b001, 1: 0b010, 2: 0b100}, workers=1)
+    assert result is False and mapping == {}
+
+    graph.remove_edge(20, 21)
+    result, mapping = solve_components(graph, {0: 0b001, 1: 0b010, 2: 0b100}, workers=1)
+    assert result is True and mapping[0] == 0 and mapping[2] == 2
+
+def test_solve_components_pool():
+    """ Test that big components are solved in the process pool and merged """
+    graph = nx.disjoint_union_all([nx.cycle_graph(5), nx.cycle_graph(7), nx.path_graph(3)])
+    # Cycles and paths would peel away completely
+    result, mapping = solve_components(graph, workers=2, parallel_size=4, peel=False)
+    assert result is True
+    assert all(mapping[u] != mapping[v] for u, v in graph.edges())
+
+    graph = nx.disjoint_union_all([nx.cycle_graph(5), nx.wheel_graph(6)])
+    assert solve_components(graph, workers=2, parallel_size=4)[0] is False, "A wheel with an odd rim is not 3 colorable"
+
+    # A component that can not be colored stops the hard one that is still running, instead of waiting out the timeout
+    graph = nx.disjoint_union_all([nx.wheel_graph(6), nx.gnm_random_graph(104, 240, seed=0)])
+    stats = {}
+    assert solve_components(graph, workers=2, parallel_size=6, timeout=20, stats=stats)[0] is False
+    assert stats["terminated"] == 1 and stats["stopped"] is None, "The hard component should be stopped as soon as the wheel is done"
+
+def test_solve_components_cancel():
+    """ Test that cancelling stops the components that are solved here and the ones in the pool """
+    import threading
+
+    hard = nx.gnm_random_graph(104, 240, seed=0)
+    for graph, workers, terminated in [(hard, 1, 0), (nx.disjoint_union(hard, hard), 2, 2)]:
+        cancel = CancelToken()
+        threading.Timer(0.2, cancel.cancel).start()
+        stats = {}
+        result, _ = solve_components(graph, workers=workers, parallel_size=6, timeout=20, cancel=cancel, stats=stats)
+        assert result is UNKNOWN and stats["stopped"] == "cancelled", "Cancelling should stop the solve instead of waiting out the timeout"
+        assert stats["terminated"] == terminated, "The components in the pool should be stopped when the solve is cancelled"
+
+def test_all():
+    """ Run all tests for the component solver """
+    test_find_components()
+    test_solve_components_unsat()
+    test_solve_components_pool()
+    test_solve_components_cancel()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -0,0 +1,170 @@
+# This cuts the gates that can not change the answer out of the graph before it is solved
+# Every gate in the netlist can be colored for any 0/1 inputs, so a gate only matters if something after it is constrained:
+#   a BREAK, an ASSERT, a tie between two bits, or any other node that is not part of a gate (see below)
+# A gate is dead when every node it owns only touches its own nodes, its inputs, the palette and other dead gates,
+#   so walking the netlist backwards (consumers before the gates they use) finds every dead gate in one pass
+# Only the rest (the cone of influence of the constraints) is searched, then the dead gates are colored forward from their inputs
+# A gate owns every node from the first one it made up to its output (computer.gate_starts), gates inside it (like the NOTs inside an AND) belong to it
+# Nodes that are not owned by any gate (VAR and CONST bits, BREAK nodes, ASSERT ties, the IF layer, ...) are always kept
+# fan_in walks the other way, from some bits back through the gates that drive them (the simulator only runs those, see SIMULATE.py)
+
+import networkx as nx
+
+from lib.run.IS_COLORABLE import extend_coloring
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+
+def slice_cone(computer, keep=(), domains=None) -> tuple[set, list]:
+    """ Finds the gates of a computer that nothing constrains
+
+    Args:
+        computer (NPComputer): The computer to slice
+        keep (iterable, optional): MEMs or bit nodes whose gates should be solved even if nothing constrains them (like bits that are assumed). Defaults to ().
+        domains (dict, optional): The domains to slice with instead of computer.domains (like the ones of a solve with assumptions). Defaults to None.
+
+    Returns:
+        set, list: The nodes to solve, and the dead gates in the order they were built as (first node, output node)
+    """
+
+    domains = computer.domains if domains is None else domains
+    zero, one, x = TRI_BIT_TO_NODE[TriBit.ZERO], TRI_BIT_TO_NODE[TriBit.ONE], TRI_BIT_TO_NODE[TriBit.X]
+    logic = (1 << zero) | (1 << one)
+    kept_bits = {bit for key in keep for bit in ([key] if isinstance(key, int) else key.bits)}
+
+    # The outermost gate that owns each node, found from the last gate back so a gate inside another one is skipped
+    owner = {}
+    gates = []
+    for index in reversed(range(len(computer.netlist))):
+        _, out, ins = computer.netlist[index]
+        first = computer.gate_starts.get(out)
+        if out in owner or first is None:
+            continue
+        for node in range(first, out + 1):
+            owner[node] = index
+        gates.append((index, first, out, ins))
+
+    dead = set()
+    for index, first, out, ins in gates:
+        # A gate is only sure to color for 0/1 inputs, and an output tied to the 0 or 1 node is asserted
+        alive = any(domains[node] & ~logic for node in ins) or any(computer.store.has_edge(out, node) for node in (zero, one))
+        for node in range(first, out + 1):
+            if alive or node in kept_bits:
+                alive = True
+                break
+            for neighbor in computer.store[node]:
+                if owner.get(neighbor) == index or neighbor in ins or neighbor in (zero, one, x):
+                    continue
+                if owner.get(neighbor) not in dead:
+                    alive = True
+                    break
+        if not alive:
+            dead.add(index)
+
+    dead_gates = [(first, out) for index, first, out, _ in reversed(gates) if index in dead]
+    nodes = set(computer.store.nodes())
+    nodes.difference_update(node for first, out in dead_gates for node in range(first, out + 1))
+    return nodes, dead_gates
+
+def fan_in(computer, bits, stop=()) -> list[int]:
+    """ Finds the gates of the netlist that some bits depend on
+
+    Args:
+        computer (NPComputer): The computer
+        bits (iterable): The bit nodes to start from
+        stop (container, optional): Nodes to not walk back through (like inputs that are given). Defaults to ().
+
+    Returns:
+        list[int]: The indexes of the gates in the netlist, in the order they were built (so every gate comes after the gates it uses)
+    """
+
+    # The first gate in the netlist that drives each node
+    driver = {}
+    for index, (_, out, _) in enumerate(computer.netlist):
+        driver.setdefault(out, index)
+
+    gates = set()
+    seen, stack = set(bits), list(bits)
+    while stack:
+        node = stack.pop()
+        index = driver.get(node)
+        if index is None or node in stop:
+            continue
+        gates.add(index)
+        for node in computer.netlist[index][2]:
+            if node not in seen:
+                seen.add(node)
+                stack.append(node)
+    return sorted(gates)
+
+def fill_gates(computer, mapping: dict, dead_gates: list, domains=None) -> bool:
+    """ Colors the dead gates forward from their inputs, in the order they were built
+
+    Args:
+        computer (NPComputer): The computer that was sliced
+        mapping (dict): A coloring of the nodes that were solved, the dead gates are added to it
+        dead_gates (list): The dead gates from slice_cone
+        domains (dict, optional): The domains that were sliced with, computer.domains if not given. Defaults to None.
+
+    Returns:
+        bool: True if every gate could be colored (which should always be the case)
+    """
+
+    domains = computer.domains if domains is None else domains
+    for first, out in dead_gates:
+        # Only the edges to the gate itself and to what is already colored, the later dead gates are colored after it
+        gate = range(first, out + 1)
+        local = nx.Graph()
+        local.add_nodes_from(gate)
+        local.add_edges_from((node, neighbor) for node in gate for neighbor in computer.store[node] if neighbor in mapping or first <= neighbor <= out)
+        if not extend_coloring(local, mapping, gate, domains):
+            return False
+    return True
+
+# Test functions
+def test_slice_cone():
+    """ Test that only the logic before a constraint is solved and the rest is filled in with the right values """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.ADD import ADD
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+    from lib.execution_control.BREAK import BREAK
+    from lib.run.MEM import MEM
+
+    # Nothing is constrained, so every gate is dead
+    computer = NPComputer()
+    a, b = VAR(computer, n=3), VAR(computer, n=3)
+    total, carry = ADD(computer, a, b)
+    nodes, dead_gates = slice_cone(computer)
+    assert nodes == {0, 1, 2} | set(a.bits) | set(b.bits), "Only the palette and the VARs should be left"
+
+    # The carry is kept when asked for
+    nodes, _ = slice_cone(computer, keep=[carry])
+    assert carry in nodes and not set(total.bits) <= nodes
+
+    # Only the MUL is before the ASSERT, the ADD is filled in from the values the solve found
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 6)
+    total, carry = ADD(computer, a, b)
+    nodes, dead_gates = slice_cone(computer)
+    assert set(total.bits).isdisjoint(nodes) and set(product.bits) <= nodes
+
+    result, mapping = computer.get_result_mapping()
+    assert result is True and computer.last_stats["cone"] == len(nodes) and computer.last_stats["sliced"] > 0
+    assert set(mapping) == set(computer.graph.nodes()) and all(mapping[u] != mapping[v] for u, v in computer.graph.edges())
+    a_value, b_value, total_value, carry_value = computer.read_values(mapping, a, b, total, MEM(computer, bits=[carry], n=1))
+    assert sorted([a_value, b_value]) == [2, 3] and total_value + 4 * carry_value == 5
+
+    # A BREAK on the carry brings the carry chain into the cone
+    BREAK(computer, carry)
+    assert carry in slice_cone(computer)[0]
+    assert computer.get_result_mapping()[0] is False
+
+def test_all():
+    """ Run all tests for the cone of influence """
+    test_slice_cone()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
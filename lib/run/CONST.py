@@ -34,6 +34,24 @@ class CONST(MEM):
             # Use the provided bits
             self.bits = bits
 
+def get_const_bit(computer: NPComputer, node_id: int) -> int:
+    """ Checks if a node is forced to be 0 or 1, like the bits of a CONST or a gate whose value follows from constants
+
+    Args:
+        computer (NPComputer): The computer that the node belongs to
+        node_id (int): The node to check
+
+    Returns:
+        int: 0 or 1 if the node can only be that value, otherwise None
+    """
+
+    domain = computer.domains[node_id]
+    if domain == 1 << TRI_BIT_TO_NODE[TriBit.ZERO]:
+        return 0
+    if domain == 1 << TRI_BIT_TO_NODE[TriBit.ONE]:
+        return 1
+    return None
+
 # Test functions
 def test_CONST_basic_initialization():
     """Test basic initialization of CONST with valid inputs"""
@@ -268,6 +286,20 @@ def test_CONST_reconstruction():
         
         assert reconstructed_value == original_value, f"Reconstructed value {reconstructed_value} != original {original_value}"
 
+def test_CONST_get_const_bit():
+    """Test that the bits of a CONST are detected as constants and other bits are not"""
+    computer = NPComputer()
+    con = CONST(computer, 6, n=3)
+    assert [get_const_bit(computer, bit) for bit in con.bits] == [0, 1, 1]
+
+    free = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    assert get_const_bit(computer, free) is None, "A bit that can be 0 or 1 is not a constant"
+
+    # A bit that follows from constants (like the NOT of a constant) is also a constant
+    negated = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    computer.add_edge(con.bits[0], negated)
+    assert get_const_bit(computer, negated) == 1
+
 def test_all():
     test_CONST_basic_initialization()
     test_CONST_value_range_validation()
@@ -279,6 +311,7 @@ def test_all():
     test_CONST_large_constants()
     test_CONST_zero_bits()
     test_CONST_reconstruction()
+    test_CONST_get_const_bit()
     
 if __name__ == "__main__":
     test_all()
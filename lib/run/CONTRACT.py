@@ -0,0 +1,164 @@
+# This makes the graph smaller by merging nodes that always have the same color
+# Two kinds of nodes are merged:
+#   A node that can only be one color (a CONST bit, a NOT of a CONST, a SWAP of a decided input, ...) is merged into the tri-bit node of that color
+#   Two nodes that can be the same 2 colors and are connected always have opposite colors, so along a path of them every other node
+#     has the same color (like x and NOT(NOT(x)), or the two bits an ASSERT_EQ ties together), these are merged with a union-find
+#     that keeps the parity of each node to its root
+# The solver sees one node for each class with the edges of all of its nodes, and the coloring is expanded back to every node after
+
+import networkx as nx
+
+from lib.run.IS_COLORABLE import propagate_domains
+
+def _find(parent: dict, parity: dict, node) -> tuple:
+    """ Finds the root of a node and whether it has the opposite color of the root, compressing the path """
+
+    path = []
+    while parent[node] != node:
+        path.append(node)
+        node = parent[node]
+    root, flip = node, 0
+    for node in reversed(path):
+        flip ^= parity[node]
+        parent[node], parity[node] = root, flip
+    return (root, parity[path[0]]) if path else (root, 0)
+
+def contract(graph: nx.Graph, domains: dict = None) -> tuple[nx.Graph, dict, dict]:
+    """ Merges the nodes that always have the same color
+
+    Args:
+        graph (nx.Graph): The graph to contract
+        domains (dict, optional): Bitmask of the colors each node can be (bit c for color c), missing nodes can be any color. Defaults to None.
+
+    Returns:
+        nx.Graph, dict, dict: The contracted graph, the domains of its nodes (None if the graph can not be colored),
+            and the node of the contracted graph that each node was merged into
+    """
+
+    domains = {node: (domains or {}).get(node, 0b111) for node in graph.nodes()}
+    if 0 in domains.values() or not propagate_domains(graph, domains, [node for node, domain in domains.items() if domain & (domain - 1) == 0]):
+        return graph, None, {}
+
+    # Connected nodes with the same 2 colors have opposite colors
+    parent = {node: node for node in graph.nodes()}
+    parity = {node: 0 for node in graph.nodes()}
+    for u, v in graph.edges():
+        domain = domains[u]
+        if u == v or domain != domains[v] or domain & (domain - 1) == 0 or domain == 0b111:
+            continue
+        (root_u, flip_u), (root_v, flip_v) = _find(parent, parity, u), _find(parent, parity, v)
+        if root_u == root_v:
+            if flip_u == flip_v:
+                # An odd cycle of 2 color nodes
+                return graph, None, {}
+            continue
+        parent[root_v], parity[root_v] = root_u, flip_u ^ flip_v ^ 1
+
+    # Each class (root and parity) is merged into its smallest node, and decided nodes into the tri-bit node of their color
+    classes = {}
+    representative = {}
+    for node in graph.nodes():
+        domain = domains[node]
+        color = domain.bit_length() - 1
+        if domain & (domain - 1) == 0 and domains.get(color) == domain:
+            representative[node] = color
+        else:
+            key = _find(parent, parity, node)
+            classes[key] = min(classes.get(key, node), node)
+    for node in graph.nodes():
+        if node not in representative:
+            representative[node] = classes[_find(parent, parity, node)]
+
+    contracted = nx.Graph()
+    contracted.add_nodes_from(set(representative.values()))
+    for u, v in graph.edges():
+        ru, rv = representative[u], representative[v]
+        if ru == rv:
+            # Two nodes that have to be the same color are connected
+            return graph, None, {}
+        contracted.add_edge(ru, rv)
+    return contracted, {node: domains[node] for node in contracted.nodes()}, representative
+
+def expand_mapping(mapping: dict, representative: dict) -> dict:
+    """ Gives every node the color of the node it was merged into
+
+    Args:
+        mapping (dict): A coloring of the contracted graph (it can be partial)
+        representative (dict): The node each node was merged into, from contract
+
+    Returns:
+        dict: The coloring of the original graph
+    """
+
+    return {node: mapping[merged] for node, merged in representative.items() if merged in mapping}
+
+# Test functions
+def test_contract():
+    """ Test merging decided nodes into the palette and chains of opposite nodes into 2 nodes """
+    from lib.run.IS_COLORABLE import is_colorable
+
+    # A chain of 0/1 nodes hanging off the palette (0, 1, 2), every other node is the same
+    graph = nx.Graph([(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 6), (3, 2), (4, 2), (5, 2), (6, 2)])
+    domains = {0: 0b001, 1: 0b010, 2: 0b100, 3: 0b011, 4: 0b011, 5: 0b011, 6: 0b011}
+    contracted, narrowed, representative = contract(graph, domains)
+    assert representative[3] == representative[5] and representative[4] == representative[6] and representative[3] != representative[4]
+    assert len(contracted) == 5
+
+    result, mapping = is_colorable(contracted, domains=narrowed)
+    mapping = expand_mapping(mapping, representative)
+    assert result is True and all(mapping[u] != mapping[v] for u, v in graph.edges())
+
+    # A decided node is merged into the tri-bit node of its color
+    graph.add_edge(7, 1)
+    graph.add_edge(7, 2)
+    domains[7] = 0b111
+    contracted, narrowed, representative = contract(graph, domains)
+    assert representative[7] == 0 and 7 not in contracted
+
+    # An odd cycle of 0/1 nodes, and a 0/1 node tied to a node that has to be its same color, can not be colored
+    graph.add_edge(3, 5)
+    assert contract(graph, domains)[1] is None
+    assert contract(nx.path_graph(3), {0: 0b011, 1: 0b011, 2: 0b011})[1] is not None
+    assert contract(nx.cycle_graph(3), {0: 0b011, 1: 0b011, 2: 0b011})[1] is None
+
+def test_contract_circuit():
+    """ Test that a solve of a computer is done on the contracted graph and expanded back """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+    from lib.binary_logic.NOT import NOT
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 6)
+    ASSERT_EQ(computer, a, b)
+    assert computer.get_result_mapping()[0] is False
+
+    # A bit tied to its NOT(NOT()) is found by the contraction alone, and the stats still say so
+    computer = NPComputer()
+    x = VAR(computer, n=1).bits[0]
+    same = NOT(computer, NOT(computer, x))
+    assert computer.get_result_mapping()[0] is True
+    computer.add_edge(x, same)
+    assert computer.get_result_mapping()[0] is False and computer.last_solve == "solved"
+    assert computer.last_stats["status"] == "UNSAT" and computer.last_stats["decisions"] == 0 and computer.last_stats["cone"] > 0
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 6)
+    result, mapping = computer.get_result_mapping()
+    assert result is True and set(mapping) == set(computer.graph.nodes()) and computer.last_stats["contracted"] > 0
+    assert all(mapping[u] != mapping[v] for u, v in computer.graph.edges())
+    assert sorted(computer.read_values(mapping, a, b)) == [2, 3]
+
+def test_all():
+    """ Run all tests for the contraction """
+    test_contract()
+    test_contract_circuit()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -0,0 +1,161 @@
+# This solves a FIND in parallel by cube-and-conquer
+# The search is driven by the free VAR bits, so k of them are picked to branch on (the ones connected to the most nodes,
+#   since fixing them decides the most of the circuit) and every one of the 2^k ways to set them is a cube
+# Each cube is the propagated domains of the computer with those k bits fixed, and is solved on its own in a process pool
+# The graph and domains are sent to each process once when the pool starts (a read-only snapshot), so a cube is only its k bits
+# As soon as one cube is colorable the rest are cancelled, and the time of every cube that finished is reported so k can be tuned
+
+import os
+import time
+
+from lib.run.INIT import NPComputer
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+from lib.run.COMPONENTS import solve_components
+from lib.run.POOL import snapshot_pool, get_snapshot, as_completed
+
+def _solve_cube(index: int, cube: tuple) -> tuple[int, bool, dict, float]:
+    """ Solves the snapshot with the bits of one cube fixed
+
+    Args:
+        index (int): Which cube this is, so the results can be matched up when they finish out of order
+        cube (tuple): (bit, value) for each branching bit
+
+    Returns:
+        int, bool, dict, float: index, result, mapping, and how many seconds it took
+    """
+
+    start = time.perf_counter()
+    graph, domains = get_snapshot()
+    domains = dict(domains)
+
+    one, zero = 1 << TRI_BIT_TO_NODE[TriBit.ONE], 1 << TRI_BIT_TO_NODE[TriBit.ZERO]
+    for bit, value in cube:
+        domains[bit] &= one if value else zero
+
+    # The fixed bits are propagated first and only what is left undecided is searched (most cubes that can not be colored never get there)
+    result, mapping = solve_components(graph, domains, workers=1)
+    return index, result, mapping, time.perf_counter() - start
+
+def branching_bits(computer: NPComputer, mems: tuple, k: int) -> list[int]:
+    """ Picks the k bits to branch on, the undecided bits of the MEMs with the largest fan-out
+
+    Args:
+        computer (NPComputer): The computer being solved
+        mems (tuple): The VARs (or any MEMs) that the FIND is over
+        k (int): How many bits to pick
+
+    Returns:
+        list[int]: The bit nodes, at most k (fewer if there are not enough undecided bits)
+    """
+
+    bits = [bit for mem in mems for bit in mem.bits if computer.domains[bit] & (computer.domains[bit] - 1)]
+    bits = list(dict.fromkeys(bits))
+    bits.sort(key=lambda bit: len(computer.store[bit]), reverse=True)
+    return bits[:k]
+
+def cube_and_conquer(computer: NPComputer, *mems, k: int = None, workers: int = None) -> tuple[bool, dict, list[dict]]:
+    """ Solves the computer by splitting the search over 2^k cubes of the MEM bits and solving them in parallel
+
+    Args:
+        computer (NPComputer): The computer to solve
+        *mems (MEM): The VARs that the FIND is over, the bits to branch on are picked from them
+        k (int, optional): How many bits to branch on. Defaults to enough for 4 cubes per process.
+        workers (int, optional): How many processes to use. Defaults to the number of CPUs.
+
+    Returns:
+        (bool, dict, list[dict]): (result, mapping, timings) where timings has {"cube", "result", "seconds"}
+            for every cube that finished, in the order they finished
+    """
+
+    if computer.is_known_unsat:
+        return False, {}, []
+
+    workers = workers or os.cpu_count() or 1
+    if k is None:
+        k = max(workers * 4 - 1, 1).bit_length()
+
+    bits = branching_bits(computer, mems, k)
+    cubes = [tuple((bit, (i >> j) & 1) for j, bit in enumerate(bits)) for i in range(1 << len(bits))]
+
+    timings = []
+    with snapshot_pool(computer.graph, computer.domains, min(workers, len(cubes))) as pool:
+        jobs = [pool.apply_async(_solve_cube, (i, cube)) for i, cube in enumerate(cubes)]
+        for index, result, mapping, seconds in as_completed(jobs):
+            timings.append({"cube": dict(cubes[index]), "result": result, "seconds": seconds})
+            if result:
+                # Leaving the pool terminates it, which cancels the cubes that are still running
+                return True, mapping, timings
+
+    return False, {}, timings
+
+def find_parallel(computer: NPComputer, *mems, k: int = None, workers: int = None):
+    """ Like computer.find, but solved by cube_and_conquer
+
+    Args:
+        computer (NPComputer): The computer to solve
+        *mems (MEM): The VARs (or any MEMs) to get the value of
+        k (int, optional): How many bits to branch on, see cube_and_conquer
+        workers (int, optional): How many processes to use, see cube_and_conquer
+
+    Returns:
+        (int | tuple[int] | None, list[dict]): The value like computer.find gives, and the timing of each cube
+    """
+
+    result, mapping, timings = cube_and_conquer(computer, *mems, k=k, workers=workers)
+    if not result:
+        return None, timings
+
+    values = computer.read_values(mapping, *mems)
+    return (values[0] if len(values) == 1 else tuple(values)), timings
+
+# Test functions
+def test_branching_bits():
+    """ Test that the bits with the most fan-out are picked and decided bits are skipped """
+    from lib.run.VAR import VAR
+    from lib.run.CONST import CONST
+    from lib.binary_logic.AND import AND
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=3), VAR(computer, n=3)
+    for bit in b.bits:
+        AND(computer, a.bits[2], bit)
+    AND(computer, a.bits[0], b.bits[0])
+
+    assert branching_bits(computer, (a,), 2) == [a.bits[2], a.bits[0]], "The bits in the most ANDs should be picked first"
+    assert branching_bits(computer, (CONST(computer, value=3, n=2),), 2) == [], "Constant bits can not be branched on"
+
+def test_cube_and_conquer():
+    """ Test a FIND for the factors of 6 and one with no solution """
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 6)
+
+    values, timings = find_parallel(computer, a, b, k=2, workers=2)
+    assert values in [(2, 3), (3, 2)], f"{values} are not factors of 6"
+    assert 1 <= len(timings) <= 4 and all(timing["seconds"] >= 0 for timing in timings)
+    assert timings[-1]["result"] is True, "The last cube to finish should be the one that was colorable"
+
+    # 5 has no factors less than 4, so every cube is tried and timed
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 5)
+
+    values, timings = find_parallel(computer, a, b, k=2, workers=2)
+    assert values is None
+    assert len(timings) == 4 and not any(timing["result"] for timing in timings)
+    assert sorted(tuple(sorted(timing["cube"].values())) for timing in timings) == [(0, 0), (0, 1), (0, 1), (1, 1)], "Each setting of the 2 bits is one cube"
+
+def test_all():
+    """ Run all tests for cube-and-conquer """
+    test_branching_bits()
+    test_cube_and_conquer()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
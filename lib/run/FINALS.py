@@ -16,4 +16,7 @@ TRI_BIT_TO_NODE = {
 }
 
 # This is the default length of bit ints
-DEFAULT_INT_BIT_LENGTH = 8
\ No newline at end of file
+DEFAULT_INT_BIT_LENGTH = 8
+
+# The results of a solve, UNKNOWN is when a limit (timeout, decisions or cancel) stopped it before it knew
+SAT, UNSAT, UNKNOWN = True, False, None
\ No newline at end of file
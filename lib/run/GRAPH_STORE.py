@@ -0,0 +1,252 @@
+# This is how a computer keeps its graph while it is being built
+# A networkx graph is a dict of dicts with a dict for every edge, so every node costs hundreds of bytes,
+#   and a computer only ever adds nodes and edges and asks for neighbors while it is built
+# So the graph is kept in flat arrays instead:
+#   masks           - array('B') of the domain bitmask of each node id (MISSING for ids that are not nodes)
+#   edges           - two array('i') with the ends of every edge in the order they were added
+#   adjacency       - an array('i') of neighbors for each node, so building can check for an edge and propagate colors
+# On the first solve the adjacency is frozen into CSR (indptr and indices NumPy arrays, neighbors of node n are indices[indptr[n]:indptr[n + 1]])
+#   which drops the array for each node, adding to the graph after that thaws it back
+# The solvers still take networkx graphs, to_networkx builds one with the same nodes and edges added in the same order
+
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+import networkx as nx
+
+# The mask of a node id that is not a node
+MISSING = 0xFF
+
+class GraphStore:
+    def __init__(self):
+        """ An empty graph, node ids do not have to be contiguous but have to be added in increasing order """
+
+        self.masks = array("B")
+        self._adjacency = []
+        self._edge_u = array("i")
+        self._edge_v = array("i")
+        self._nodes = 0
+        self._csr = None
+
+        # Counts every change, so anything built from the graph (like the networkx graph) knows when it is out of date
+        self.version = 0
+
+    def add_node(self, node: int, domain: int):
+        """ Adds a node with a domain bitmask, it has to be a bigger id than every node before it """
+
+        assert node >= len(self.masks), "Nodes have to be added in increasing order"
+        self._thaw()
+        missing = node - len(self.masks)
+        self.masks.extend([MISSING] * missing)
+        self._adjacency.extend([None] * missing)
+        self.masks.append(domain)
+        self._adjacency.append(array("i"))
+        self._nodes += 1
+        self.version += 1
+
+    def add_edge(self, u: int, v: int) -> bool:
+        """ Adds an edge, returning False if it was already there """
+
+        if self.has_edge(u, v):
+            return False
+        self._thaw()
+        self._adjacency[u].append(v)
+        if u != v:
+            self._adjacency[v].append(u)
+        self._edge_u.append(u)
+        self._edge_v.append(v)
+        self.version += 1
+        return True
+
+    def neighbors(self, node: int):
+        """ The neighbors of a node, in the order their edges were added """
+
+        if self._csr is not None:
+            indptr, indices = self._csr
+            return indices[indptr[node]:indptr[node + 1]].tolist()
+        return self._adjacency[node]
+
+    __getitem__ = neighbors
+
+    def has_edge(self, u: int, v: int) -> bool:
+        # The tri-bit nodes are next to almost everything, so look in the smaller list
+        u_neighbors, v_neighbors = self.neighbors(u), self.neighbors(v)
+        return v in u_neighbors if len(u_neighbors) <= len(v_neighbors) else u in v_neighbors
+
+    def __contains__(self, node: int) -> bool:
+        return 0 <= node < len(self.masks) and self.masks[node] != MISSING
+
+    def number_of_nodes(self) -> int:
+        return self._nodes
+
+    def number_of_edges(self) -> int:
+        return len(self._edge_u)
+
+    def nodes(self) -> list[int]:
+        """ The node ids in increasing order """
+
+        return [node for node, mask in enumerate(self.masks) if mask != MISSING]
+
+    def edges(self):
+        """ The edges in the order they were added """
+
+        return zip(self._edge_u, self._edge_v)
+
+    def freeze(self) -> tuple[np.ndarray, np.ndarray]:
+        """ Compacts the adjacency into CSR, it stays frozen until something is added
+
+        Returns:
+            (np.ndarray, np.ndarray): indptr and indices, the neighbors of node n are indices[indptr[n]:indptr[n + 1]]
+        """
+
+        if self._csr is None:
+            u, v = np.frombuffer(self._edge_u, dtype=np.int32), np.frombuffer(self._edge_v, dtype=np.int32)
+            loops = u == v
+            rows = np.concatenate([u, v[~loops]])
+            columns = np.concatenate([v, u[~loops]])
+
+            # Each row keeps its neighbors in the order their edges were added, like the adjacency
+            added = np.concatenate([np.arange(len(u)), np.flatnonzero(~loops)])
+            order = np.lexsort((added, rows))
+            indptr = np.zeros(len(self.masks) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=len(self.masks)), out=indptr[1:])
+            self._csr = (indptr, columns[order].astype(np.int32))
+            self._adjacency = None
+        return self._csr
+
+    def _thaw(self):
+        """ Goes back to an array of neighbors for each node so more can be added """
+
+        if self._csr is None:
+            return
+        indptr, indices = self._csr
+        self._adjacency = [array("i", indices[indptr[node]:indptr[node + 1]].tolist()) if mask != MISSING else None
+                           for node, mask in enumerate(self.masks)]
+        self._csr = None
+
+    def to_networkx(self, nodes=None) -> nx.Graph:
+        """ Builds a networkx graph with the same nodes and edges, added in the same order
+
+        Args:
+            nodes (iterable, optional): Only build the subgraph of these nodes. Defaults to every node.
+
+        Returns:
+            nx.Graph: The graph
+        """
+
+        u, v = np.frombuffer(self._edge_u, dtype=np.int32), np.frombuffer(self._edge_v, dtype=np.int32)
+        if nodes is None:
+            nodes = self.nodes()
+        else:
+            keep = np.zeros(len(self.masks), dtype=bool)
+            keep[np.fromiter(nodes, dtype=np.int64)] = True
+            nodes = np.flatnonzero(keep).tolist()
+            inside = keep[u] & keep[v]
+            u, v = u[inside], v[inside]
+
+        graph = nx.Graph()
+        graph.add_nodes_from(nodes)
+        graph.add_edges_from(zip(u.tolist(), v.tolist()))
+        return graph
+
+class DomainMasks(Mapping):
+    def __init__(self, masks: array):
+        """ A {node: domain bitmask} view of the masks of a GraphStore, changing a domain changes the mask """
+
+        self._masks = masks
+
+    def __getitem__(self, node: int) -> int:
+        if 0 <= node < len(self._masks):
+            mask = self._masks[node]
+            if mask != MISSING:
+                return mask
+        raise KeyError(node)
+
+    def __setitem__(self, node: int, domain: int):
+        if self.get(node) is None:
+            raise KeyError(node)
+        self._masks[node] = domain
+
+    def __iter__(self):
+        return (node for node, mask in enumerate(self._masks) if mask != MISSING)
+
+    def __len__(self) -> int:
+        return len(self._masks) - self._masks.count(MISSING)
+
+# Test functions
+def test_graph_store():
+    """ Test that the store matches networkx, through freezing and thawing """
+    import random
+
+    rng = random.Random(0)
+    store, graph = GraphStore(), nx.Graph()
+    for node in [0, 1, 2] + list(range(4, 60)):
+        store.add_node(node, rng.randint(1, 7))
+        graph.add_node(node)
+    for _ in range(300):
+        u, v = rng.choice(list(graph.nodes())), rng.choice(list(graph.nodes()))
+        assert store.add_edge(u, v) == (not graph.has_edge(u, v))
+        graph.add_edge(u, v)
+
+        if rng.random() < 0.05:
+            store.freeze()
+
+    assert store.number_of_nodes() == len(graph) and store.number_of_edges() == len(graph.edges())
+    assert 3 not in store and 4 in store and store.nodes() == list(graph.nodes())
+    for node in graph.nodes():
+        assert list(store[node]) == list(graph[node]), "Neighbors should be in the order they were added"
+    store.freeze()
+    for node in graph.nodes():
+        assert list(store[node]) == list(graph[node]), "Freezing should keep the order of the neighbors"
+        assert store.has_edge(node, rng.choice(list(graph.nodes()))) in (True, False)
+
+    built = store.to_networkx()
+    assert list(built.nodes()) == list(graph.nodes()) and all(list(built[node]) == list(graph[node]) for node in graph.nodes())
+    subgraph = store.to_networkx(range(10, 40))
+    assert {frozenset(edge) for edge in subgraph.edges()} == {frozenset(edge) for edge in graph.subgraph(range(10, 40)).edges()}
+
+def test_domain_masks():
+    """ Test the mapping view of the masks """
+    store = GraphStore()
+    domains = DomainMasks(store.masks)
+    store.add_node(0, 0b001)
+    store.add_node(4, 0b011)
+    assert dict(domains) == {0: 0b001, 4: 0b011} and len(domains) == 2
+    domains[4] = 0b010
+    assert store.masks[4] == 0b010 and domains.get(3) is None and domains.get(4) == 0b010
+    try:
+        domains[3] = 0b001
+        assert False, "Node 3 is not a node"
+    except KeyError:
+        pass
+
+def test_graph_view():
+    """ Test that computer.graph is read-only and that a solve does not keep the networkx graph """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.binary_logic.AND import AND
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    AND(computer, a.bits[0], b.bits[0])
+    graph = computer.graph
+    assert len(graph) == computer.store.number_of_nodes() and len(graph.edges()) == computer.store.number_of_edges()
+    try:
+        graph.add_edge(0, 4)
+        assert False, "The networkx view should be read-only"
+    except nx.NetworkXError:
+        pass
+
+    assert computer.get_result_mapping()[0] is True
+    assert computer._graph is None, "The solve should not keep a networkx graph"
+
+def test_all():
+    """ Run all tests for the graph store """
+    test_graph_store()
+    test_domain_masks()
+    test_graph_view()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
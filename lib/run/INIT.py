@@ -1,25 +1,167 @@
 # This is used to initialize the NP computer, and will be used to add nodes and edges to the graph
+import time
 import networkx as nx
-from lib.run.IS_COLORABLE import is_colorable
-from lib.run.FINALS import TriBit, ALL_TRI_BITS, TRI_BIT_TO_NODE
+import numpy as np
+from lib.run.IS_COLORABLE import is_colorable, extend_coloring, propagate_domains
+from lib.run.TREEWIDTH import count_colorings
+from lib.run.COMPONENTS import solve_components
+from lib.run.PORTFOLIO import solve_portfolio
+from lib.run.LOCAL_SEARCH import local_search
+from lib.run.CONE import slice_cone, fill_gates
+from lib.run.CONTRACT import contract, expand_mapping
+from lib.run.GRAPH_STORE import GraphStore, DomainMasks
+from lib.run.FINALS import TriBit, ALL_TRI_BITS, TRI_BIT_TO_NODE, SAT, UNSAT, UNKNOWN
+
+# A warm start only gets this many decisions for each node it has to color, a change that needs more search than that
+#   is not local and the full solve is quicker on it (it slices, contracts and splits the graph first)
+WARM_START_DECISIONS = 4
+
+def _time_left(deadline: float):
+    """ The seconds until a deadline from time.perf_counter, or None if there is no deadline """
+    return None if deadline is None else max(deadline - time.perf_counter(), 0.0)
 
 class NPComputer:
-    def __init__(self, solve=True, export_file=None, graph_name=None):
+    def __init__(self, solve=True, export_file=None, graph_name=None, solver="default", local_search_steps=0, cache=None):
         """Initialize the NP Computer.
 
         Args:
             solve (bool): If True, solve the graph coloring problem. If False, export to DIMACS format.
             export_file (str): Path to export the graph in DIMACS format (only used if solve=False).
             graph_name (str): Name of the graph for DIMACS header comments.
+            solver (str): "default" solves each independent component with is_colorable, "portfolio" races several solvers in separate processes (see PORTFOLIO.py).
+            local_search_steps (int): If more than 0, a full solve first tries this many steps of local search (see LOCAL_SEARCH.py), which is quick on graphs that are colorable. It shares the timeout, decisions (one per step) and cancel of the solve.
+            cache (SolveCache): If given, the components of a full solve that were solved before (by any computer using it) are only looked up (see CACHE.py).
         """
-        self.graph = nx.Graph()
-        self.solve = solve
+        # The nodes, edges and domains are kept in flat arrays (see GRAPH_STORE.py), the networkx graph is only built when it is asked for
+        self.store = GraphStore()
+        self._graph = None
+        self.should_solve = solve
         self.export_file = export_file
         self.graph_name = graph_name or "graph"
+        assert solver in ("default", "portfolio"), f"Unknown solver {solver}"
+        self.solver = solver
+        self.local_search_steps = local_search_steps
+        self.cache = cache
+
+        # The winner of each portfolio solve as {"winner", "seconds", "result", "nodes"}, to tune the portfolio from
+        self.portfolio_log = []
+
+        # Cache of bit node -> NOT of that bit, so a value that is negated many times (like a subtrahend) shares one NOT layer
+        self.negated_bits = {}
+
+        # Cache of toggle node -> (branch1, branch2) of the IF layer, so every layer (and MUX) with the same toggle shares them
+        self.toggle_branches = {}
+
+        # The logic gates in the order they were built, as (gate, output node, input nodes), see SIMULATE.py
+        # Every gate is built after its inputs so this is already in topological order
+        self.netlist = []
+
+        # The first node each gate in the netlist made, by output node, a gate owns every node from there to its output (see CONE.py)
+        self.gate_starts = {}
+
+        # The shared constant 0 bit, it is only made the first time something asks for it
+        self._zero_node = None
 
         # Add in 3 nodes that are fully connected to each other to get 0, 1, and X
         tribit_zero, tribit_one, tribit_x = TRI_BIT_TO_NODE[TriBit.ZERO], TRI_BIT_TO_NODE[TriBit.ONE], TRI_BIT_TO_NODE[TriBit.X]
-        self.graph.add_edges_from([(tribit_zero, tribit_one), (tribit_one, tribit_x), (tribit_x, tribit_zero)])
+
+        # The colors each node can still be, as a bitmask (color c is bit 1 << c, and tri-bit node c is always color c)
+        # These are narrowed as the graph is built, whenever a node can only be one color that color is removed from its neighbors
+        # This is a {node: bitmask} view of the masks in the store
+        for node in sorted((tribit_zero, tribit_one, tribit_x)):
+            self.store.add_node(node, 1 << node)
+        for u, v in [(tribit_zero, tribit_one), (tribit_one, tribit_x), (tribit_x, tribit_zero)]:
+            self.store.add_edge(u, v)
+        self.domains = DomainMasks(self.store.masks)
+
+        # True once some node has no colors left, then the graph can never be 3 colorable
+        self.is_known_unsat = False
+
+        # The number of nodes that can still be more than one color
+        self._undecided = 0
+
+        # The last (result, mapping) that was solved, and the nodes that are new or have new edges or colors removed since then
+        # Nodes and edges are only ever added, so a graph that was not colorable stays that way and a coloring only has to be fixed around the dirty nodes
+        self._last_result = None
+        self._dirty = set()
+
+        # How the last result was found: "propagated", "cached", "extended", "local", "learned", "solved" or "stopped" (a limit ran out)
+        self.last_solve = None
+
+        # The stats of the last full solve (decisions, backtracks, seconds, ...), empty when it did not need a search
+        self.last_stats = {}
+
+        # Counts every node and edge added, so results saved for some assumptions are only reused on the same graph
+        self._version = 0
+
+        # Results of solve for each set of assumptions, as (version, result, mapping)
+        self._assumption_results = {}
+
+        # Sets of (bit, value) assumptions that were found to not be colorable
+        # Adding nodes and edges never makes a graph colorable again, so these stay true as the graph grows
+        self._nogoods = []
+
+        # The last coloring solve found under assumptions, the next solve starts from it
+        self._last_assumption_mapping = None
+
+    @property
+    def graph(self) -> nx.Graph:
+        """ A read-only networkx copy of the graph (nodes and edges are added with generate_node and add_edge)
+        It is built the first time it is asked for after something was added, the solves do not use it and drop it
+        """
+
+        if self._graph is None or self._graph[0] != self.store.version:
+            self._graph = (self.store.version, nx.freeze(self.store.to_networkx()))
+        return self._graph[1]
+
+    @property
+    def is_known_sat(self) -> bool:
+        """ True when every node has been narrowed down to one color without a conflict, so that is the coloring """
+        return not self.is_known_unsat and self._undecided == 0
+
+    def _narrow(self, node: int, remove: int, queue: list[int]):
+        """ Removes colors from the domain of a node, queueing it if that leaves only one color """
+
+        masks = self.store.masks
+        old = masks[node]
+        new = old & ~remove
+        if new == old:
+            return
+
+        masks[node] = new
+        self._dirty.add(node)
+        if new == 0:
+            self.is_known_unsat = True
+        elif new & (new - 1) == 0:
+            self._undecided -= 1
+            queue.append(node)
+
+    def _propagate(self, queue: list[int]):
+        """ Removes the color of every decided node in the queue from its neighbors until nothing changes """
+
+        while queue and not self.is_known_unsat:
+            node = queue.pop()
+            color = self.store.masks[node]
+            for neighbor in self.store[node]:
+                self._narrow(neighbor, color, queue)
+
+    @property
+    def zero_node(self) -> int:
+        """ A single bit node that is always 0, shared by everything that needs a constant 0 (like padding bits)
+
+        Returns:
+            int: The node id of the shared 0 bit
+        """
+
+        if self._zero_node is None:
+            self._zero_node = self.generate_node(allow={TriBit.ZERO})
+        return self._zero_node
+
+    @property
+    def next_node_id(self) -> int:
+        """ The id the next generated node will get """
+
+        return self.store.number_of_nodes() + 1
 
     def generate_node(self, allow={TriBit.ZERO, TriBit.ONE, TriBit.X}) -> int:
         """ Add a node to the graph, with optional constraints on what values it can take
@@ -28,17 +170,37 @@ class NPComputer:
             allow (dict, optional): Defines what TriBits this node can take, defaults to allow all values. Defaults to {TriBit.ZERO, TriBit.ONE, TriBit.X}.
         """
 
-        node_id = len(self.graph.nodes) + 1
-        self.graph.add_node(node_id)
+        # The new node only has edges to the tri-bit nodes, so its domain is exactly what it is allowed to be
+        node_id = self.next_node_id
+        domain = sum(1 << TRI_BIT_TO_NODE[tri_bit] for tri_bit in allow)
+        self.store.add_node(node_id, domain)
 
         # Connect this node to all TriBits that it is NOT allowed to be so the coloring algorithm can't assign it that value
         for tri_bit in ALL_TRI_BITS - allow:
-            self.graph.add_edge(node_id, TRI_BIT_TO_NODE[tri_bit])
+            self.store.add_edge(node_id, TRI_BIT_TO_NODE[tri_bit])
+
+        self._dirty.add(node_id)
+        self._version += 1
+        if domain == 0:
+            self.is_known_unsat = True
+        elif domain & (domain - 1):
+            self._undecided += 1
 
         return node_id
 
     def add_edge(self, u, v):
-        self.graph.add_edge(u, v)
+        assert u in self.store and v in self.store, f"Can not add the edge ({u}, {v}), both ends have to be nodes made by generate_node"
+        self.store.add_edge(u, v)
+        self._dirty.update((u, v))
+        self._version += 1
+
+        # A decided node removes its color from the other end, which may decide it and carry on from there
+        queue = []
+        if self.domains[u] & (self.domains[u] - 1) == 0:
+            self._narrow(v, self.domains[u], queue)
+        if self.domains[v] & (self.domains[v] - 1) == 0:
+            self._narrow(u, self.domains[v], queue)
+        self._propagate(queue)
 
     def export_to_dimacs(self, filename=None):
         """Export the graph to DIMACS format.
@@ -51,8 +213,8 @@ class NPComputer:
         """
         output_file = filename or self.export_file
 
-        num_vertices = len(self.graph.nodes())
-        num_edges = len(self.graph.edges())
+        num_vertices = self.store.number_of_nodes()
+        num_edges = self.store.number_of_edges()
 
         # Build DIMACS format
         lines = []
@@ -61,7 +223,7 @@ class NPComputer:
         lines.append(f"p edge {num_vertices} {num_edges}")
 
         # Add edges
-        for u, v in sorted(self.graph.edges()):
+        for u, v in sorted((min(u, v), max(u, v)) for u, v in self.store.edges()):
             lines.append(f"e {u} {v}")
 
         dimacs_content = "\n".join(lines) + "\n"
@@ -76,7 +238,7 @@ class NPComputer:
     def __call__(self):
 
         # If solve flag is False, export to DIMACS format instead of solving
-        if not self.solve:
+        if not self.should_solve:
             return self.export_to_dimacs()
 
         # Run the graph coloring algorithm to see if the graph if it is 3 colorable
@@ -91,14 +253,356 @@ class NPComputer:
         """
         return self.get_result_mapping()[1]
     
-    def get_result_mapping(self):
+    def get_result_mapping(self, timeout: float = None, max_decisions: int = None, cancel=None):
         """ Gets the result and mapping of the graph
 
+        Args:
+            timeout (float, optional): Stop a full solve after this many seconds. Defaults to None.
+            max_decisions (int, optional): Stop a full solve after trying this many colors. Defaults to None.
+            cancel (CancelToken, optional): Stop a full solve when this is cancelled (from another thread). Defaults to None.
+
+        Returns:
+            (bool, dict): (result, mapping), if a limit stopped the solve the result is UNKNOWN (None) and the mapping is
+                the best partial coloring, the stats of the solve are in last_stats
+        """
+
+        self.last_stats = {}
+
+        # The solve builds its own graph of only what it needs, so the networkx copy of the whole graph is not kept around
+        self._graph = None
+
+        # The timeout covers the whole solve, each stage gets what is left of it
+        deadline = None if timeout is None else time.perf_counter() + timeout
+
+        # Graphs that were already decided while building do not need to be solved
+        if self.is_known_unsat:
+            self.last_solve = "propagated"
+            return False, {}
+        if self.is_known_sat:
+            self.last_solve = "propagated"
+            return True, {node: domain.bit_length() - 1 for node, domain in self.domains.items()}
+
+        if self._last_result is not None:
+            result, mapping = self._last_result
+
+            # Nothing has changed, or more was added to a graph that already could not be colored
+            if not self._dirty or not result:
+                self._dirty.clear()
+                self.last_solve = "cached"
+                return result, dict(mapping)
+
+            # Keep the old colors that still work and only color the nodes around what changed
+            mapping, uncolored = self._uncolor_dirty(mapping)
+            result, warm_stats = self._warm_start(mapping, uncolored, self.domains, deadline, max_decisions, cancel)
+            if result:
+                self.last_stats = warm_stats
+                return self._store(True, mapping, "extended")
+            if warm_stats["stopped"] in ("timeout", "cancelled"):
+                self.last_stats = warm_stats
+                self.last_solve = "stopped"
+                return UNKNOWN, mapping
+            if max_decisions is not None:
+                max_decisions = max(max_decisions - warm_stats["decisions"], 0)
+
+        # A solve that was stopped is not remembered, so the next call tries again
+        result, mapping, how = self._solve_domains(self.domains, deadline, max_decisions, cancel)
+        if result is UNKNOWN:
+            self.last_solve = how
+            return result, mapping
+        return self._store(result, mapping, how)
+
+    def _solve_domains(self, domains: dict, deadline: float, max_decisions: int, cancel, keep=()):
+        """ The full solve of get_result_mapping and solve, from the given domains and inside the given limits
+        Only the cone of the constraints is solved (keep adds to it), after merging the nodes that always have the same color
+
+        Returns:
+            (bool, dict, str): (result, mapping, how), how is "solved", "local" or "stopped" (then the result is UNKNOWN), the stats are in last_stats
+        """
+
+        # Gates that nothing constrains can not change the answer, so only the rest is solved and they are filled in after
+        self.store.freeze()
+        nodes, dead_gates = slice_cone(self, keep=keep, domains=domains)
+        graph = self.store.to_networkx(nodes)
+
+        # Nodes that always have the same color are merged, so the solvers see one node for each (see CONTRACT.py)
+        graph, contracted, representative = contract(graph, domains)
+        sizes = {"cone": len(nodes), "sliced": self.store.number_of_nodes() - len(nodes), "contracted": len(nodes) - len(graph.nodes())}
+        if contracted is None:
+            # Two nodes that have to be the same color are connected, so nothing is searched
+            self.last_stats = dict(status="UNSAT", decisions=0, backtracks=0, depth=0, stopped=None, seconds=0.0, **sizes)
+            return False, {}, "solved"
+
+        # Local search can only find a coloring, so if it does not the complete solver still has to run with what is left of the limits
+        #   (each step counts as a decision)
+        local_stats = {}
+        if self.local_search_steps > 0:
+            steps = self.local_search_steps if max_decisions is None else min(self.local_search_steps, max_decisions)
+            result, mapping = local_search(graph, contracted, max_steps=steps, timeout=_time_left(deadline), cancel=cancel, stats=local_stats)
+            if result is not UNKNOWN:
+                self.last_stats = dict(local_stats, **sizes)
+                return (*self._fill_cone(result, expand_mapping(mapping, representative), dead_gates, domains), "local")
+            if max_decisions is not None:
+                max_decisions = max(max_decisions - local_stats["steps"], 0)
+
+        timeout = _time_left(deadline)
+        if self.solver == "portfolio":
+            result, mapping, winner, seconds = solve_portfolio(graph, contracted, timeout=timeout, max_decisions=max_decisions, cancel=cancel)
+            self.last_stats = {"status": {SAT: "SAT", UNSAT: "UNSAT", UNKNOWN: "UNKNOWN"}[result], "winner": winner, "seconds": seconds}
+            self.portfolio_log.append({"winner": winner, "seconds": seconds, "result": result, "nodes": len(graph.nodes())})
+        else:
+            # The palette and decided nodes are cut out, so independent parts of the computer are solved on their own
+            result, mapping = solve_components(graph, contracted, timeout=timeout, max_decisions=max_decisions, cancel=cancel, stats=self.last_stats, cache=self.cache)
+        mapping = expand_mapping(mapping, representative)
+        self.last_stats.update(sizes)
+        if local_stats:
+            self.last_stats.update(local_steps=local_stats["steps"], local_seconds=local_stats["seconds"])
+
+        if result is UNKNOWN:
+            return result, mapping, "stopped"
+        return (*self._fill_cone(result, mapping, dead_gates, domains), "solved")
+
+    def _fill_cone(self, result: bool, mapping: dict, dead_gates: list, domains: dict):
+        """ Colors the gates that were sliced off forward from the coloring of the cone """
+
+        if not result or not dead_gates or fill_gates(self, mapping, dead_gates, domains):
+            return result, mapping
+
+        # Every gate can be colored for any 0/1 inputs so this should not happen, but the whole graph is still right if it does
+        return solve_components(self.store.to_networkx(), domains)
+
+    def _uncolor_dirty(self, mapping: dict):
+        """ Copies the last coloring without the dirty nodes whose color no longer fits, returning it and those nodes """
+
+        mapping = dict(mapping)
+        uncolored = set()
+        for node in self._dirty:
+            color = mapping.get(node)
+            if color is None or not (self.domains[node] >> color) & 1 or any(mapping.get(neighbor) == color for neighbor in self.store[node]):
+                mapping.pop(node, None)
+                uncolored.add(node)
+        return mapping, uncolored
+
+    def _warm_start(self, mapping: dict, uncolored, domains: dict, deadline: float, max_decisions: int, cancel):
+        """ Tries to color the uncolored nodes around the rest of an earlier coloring (which is filled in if it works)
+        It shares the limits of the solve and only gets WARM_START_DECISIONS for each node, so a change that is not local
+        stops early (UNKNOWN) and is left to the full solve. Returns the result of extend_coloring and its stats
+        """
+
+        budget = WARM_START_DECISIONS * len(uncolored)
+        if max_decisions is not None:
+            budget = min(budget, max_decisions)
+        stats = {}
+        result = extend_coloring(self.store, mapping, uncolored, domains, timeout=_time_left(deadline), max_decisions=budget, cancel=cancel, stats=stats)
+        return result, stats
+
+    def _store(self, result: bool, mapping: dict, how: str):
+        """ Remembers a result so later calls can start from it """
+
+        self._last_result = (result, dict(mapping))
+        self._dirty.clear()
+        self.last_solve = how
+        return result, mapping
+
+    def _assumption_bits(self, assumptions: dict):
+        """ Turns {MEM or bit node: value} into a sorted tuple of (bit, 0 or 1), or None if a bit is given both values """
+
+        pairs = {}
+        for key, value in assumptions.items():
+            bits = [key] if isinstance(key, int) else list(key.bits)
+            assert 0 <= value < 2 ** len(bits), f"Value {value} is out of range for {len(bits)} bits"
+            for i, bit in enumerate(bits):
+                if pairs.setdefault(bit, (value >> i) & 1) != (value >> i) & 1:
+                    return None
+        return tuple(sorted(pairs.items()))
+
+    def solve(self, assumptions: dict = None, timeout: float = None, max_decisions: int = None, cancel=None):
+        """ Solves the graph with some bits temporarily fixed, without adding anything to the graph
+        This lets a circuit be built once on VARs and then run on many inputs, the assumptions are just removed from the
+        domains of a copy of the propagated domains, and what is learned (results, assumptions that can not be colored) is kept
+
+        Args:
+            assumptions (dict, optional): {VAR/MEM or bit node: value} to fix while solving. Defaults to None.
+            timeout, max_decisions, cancel: Stop the solve early, like get_result_mapping. Default to None.
+
+        Returns:
+            (bool, dict): (result, mapping), like get_result_mapping
+        """
+
+        if not assumptions:
+            return self.get_result_mapping(timeout=timeout, max_decisions=max_decisions, cancel=cancel)
+
+        self.last_stats = {}
+        self._graph = None
+        deadline = None if timeout is None else time.perf_counter() + timeout
+
+        pairs = self._assumption_bits(assumptions)
+        if pairs is None or self.is_known_unsat:
+            self.last_solve = "propagated"
+            return False, {}
+
+        # Reuse the result for the same assumptions on the same graph
+        saved = self._assumption_results.get(pairs)
+        if saved is not None and saved[0] == self._version:
+            self.last_solve = "cached"
+            return saved[1], dict(saved[2])
+
+        # Any assumptions that include ones that could not be colored can not be colored either
+        assumed = frozenset(pairs)
+        if any(nogood <= assumed for nogood in self._nogoods):
+            self.last_solve = "learned"
+            return self._store_assumption(pairs, False, {})
+
+        # Restrict a copy of the propagated domains and propagate the assumptions through it
+        domains = dict(self.domains)
+        one, zero = 1 << TRI_BIT_TO_NODE[TriBit.ONE], 1 << TRI_BIT_TO_NODE[TriBit.ZERO]
+        for bit, value in pairs:
+            domains[bit] &= one if value else zero
+        if any(domains[bit] == 0 for bit, _ in pairs) or not propagate_domains(self.store, domains, [bit for bit, _ in pairs]):
+            self.last_solve = "propagated"
+            self._nogoods.append(assumed)
+            return self._store_assumption(pairs, False, {})
+
+        undecided = [node for node, domain in domains.items() if domain & (domain - 1)]
+        if not undecided:
+            self.last_solve = "propagated"
+            return self._store_assumption(pairs, True, {node: domain.bit_length() - 1 for node, domain in domains.items()})
+
+        # Start from the last coloring, keeping the colors that still fit the new domains
+        if self._last_assumption_mapping is not None:
+            mapping = {node: color for node, color in self._last_assumption_mapping.items() if node in domains and (domains[node] >> color) & 1}
+            uncolored = [node for node in domains if node not in mapping]
+            for node in list(mapping):
+                if node in mapping and any(mapping.get(neighbor) == mapping[node] for neighbor in self.store[node]):
+                    del mapping[node]
+                    uncolored.append(node)
+            result, warm_stats = self._warm_start(mapping, uncolored, domains, deadline, max_decisions, cancel)
+            if result:
+                self.last_stats = warm_stats
+                self.last_solve = "extended"
+                return self._store_assumption(pairs, True, mapping)
+            if warm_stats["stopped"] in ("timeout", "cancelled"):
+                self.last_stats = warm_stats
+                self.last_solve = "stopped"
+                return UNKNOWN, mapping
+            if max_decisions is not None:
+                max_decisions = max(max_decisions - warm_stats["decisions"], 0)
+
+        # The same full solve as get_result_mapping, the assumed bits are kept in the cone even if nothing else constrains them
+        result, mapping, self.last_solve = self._solve_domains(domains, deadline, max_decisions, cancel, keep=[bit for bit, _ in pairs])
+        if result is UNKNOWN:
+            return result, mapping
+        if not result:
+            self._nogoods.append(assumed)
+        return self._store_assumption(pairs, result, mapping)
+
+    def _store_assumption(self, pairs: tuple, result: bool, mapping: dict):
+        """ Remembers the result of solve for these assumptions """
+
+        self._assumption_results[pairs] = (self._version, result, dict(mapping))
+        if result:
+            self._last_assumption_mapping = mapping
+        return result, mapping
+
+    def solve_batch(self, assumption_sets: list[dict]) -> list:
+        """ Solves the graph under each set of assumptions, see solve
+        Each set goes through solve rather than the lockstep batch solver (solve_assumptions_batch in BATCH_SOLVE.py):
+        assumptions on inputs are usually decided by propagation alone, and the rest only search the sliced and contracted
+        cone, which is quicker than propagating every instance over the whole graph (see test_speed_assumptions)
+
+        Args:
+            assumption_sets (list[dict]): The assumptions for each solve, like [{a: 0, b: 0}, {a: 0, b: 1}, ...]
+
+        Returns:
+            list: (result, mapping) for each set of assumptions
+        """
+
+        return [self.solve(assumptions) for assumptions in assumption_sets]
+
+    def count_solutions(self, heuristic: str = "min_fill") -> int:
+        """ Counts the colorings of the graph (with the tri-bit nodes fixed) by DP over a tree decomposition, see TREEWIDTH.py
+        For a circuit on VARs where every gate has one coloring per input, like ADD, this is the number of FIND solutions
+
+        Args:
+            heuristic (str, optional): How to order the nodes for the tree decomposition, "min_fill" or "min_degree". Defaults to "min_fill".
+
+        Returns:
+            int: The number of colorings, 0 if the graph is not 3 colorable
+        """
+
+        if self.is_known_unsat:
+            return 0
+        return count_colorings(self.store.to_networkx(), self.domains, heuristic=heuristic)
+
+    def read_values(self, mapping: dict, *mems) -> list[int]:
+        """ Reads the integer value of MEMs (VAR, CONST, ...) out of a coloring
+
+        Args:
+            mapping (dict): A coloring of the graph, like from get_result_mapping
+            *mems (MEM): The MEMs to read, least significant bit first
+
         Returns:
-            (bool, dict): (result, mapping)
+            list[int]: The value of each MEM
         """
-        
-        return is_colorable(self.graph)
+
+        # Put the colors in an array indexed by node so every bit of every MEM is read in one lookup
+        colors = np.zeros(max(mapping) + 1, dtype=np.int8)
+        colors[np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))] = np.fromiter(mapping.values(), dtype=np.int8, count=len(mapping))
+        one = colors[TRI_BIT_TO_NODE[TriBit.ONE]]
+
+        values = []
+        for mem in mems:
+            bits = colors[np.fromiter(mem.bits, dtype=np.int64, count=len(mem.bits))] == one
+            values.append(int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little"))
+        return values
+
+    def find(self, *mems):
+        """ Solves the graph once and reads the value of the MEMs, this is the answer to a FIND
+
+        Args:
+            *mems (MEM): The VARs (or any MEMs) to get the value of
+
+        Returns:
+            int | tuple[int] | None: The value of the MEM (a tuple if more than one is given), or None if the graph is not 3 colorable
+        """
+
+        result, mapping = self.get_result_mapping()
+        if not result:
+            return None
+
+        values = self.read_values(mapping, *mems)
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def find_all(self, *mems):
+        """ Yields every distinct value of the MEMs that keeps the graph 3 colorable
+        Nothing is added to the graph, earlier solutions are blocked with assumptions (see solve): after a solution,
+        the values left are the ones that agree with it on the first i - 1 bits and differ on bit i, for each i,
+        so each of those is solved with its bits assumed and split again by the solutions it gives
+        The solves start from the last coloring and reuse the assumptions that were learned to not be colorable
+
+        Args:
+            *mems (MEM): The VARs (or any MEMs) to get the values of
+
+        Yields:
+            int | tuple[int]: The value of the MEM (a tuple if more than one is given), for each solution
+        """
+
+        one = TRI_BIT_TO_NODE[TriBit.ONE]
+        bits = list(dict.fromkeys(bit for mem in mems for bit in mem.bits))
+
+        stack = [{}]
+        while stack:
+            assumptions = stack.pop()
+            result, mapping = self.solve(assumptions)
+            if not result:
+                continue
+
+            values = self.read_values(mapping, *mems)
+            yield values[0] if len(values) == 1 else tuple(values)
+
+            # Split the values that are left by the first bit that differs from this solution
+            free = [(bit, int(mapping[bit] == one)) for bit in bits if bit not in assumptions]
+            for i, (bit, value) in enumerate(free):
+                stack.append({**assumptions, **dict(free[:i]), bit: 1 - value})
 
 # Test code
 def test_np_computer():
@@ -153,7 +657,7 @@ def test_np_computer():
     node2 = np_comp.generate_node(allow={TriBit.ONE})
     node3 = np_comp.generate_node(allow={TriBit.X})
     print(f"Generated nodes: {node1}, {node2}, {node3}")
-    print(f"Total nodes: {len(np_comp.graph.nodes())}")
+    print(f"Total nodes: {np_comp.store.number_of_nodes()}")
     print(f"Graph is still 3-colorable: {np_comp()}")
     assert np_comp() == True, "Graph should still be 3-colorable"
     print("✓ PASSED\n")
@@ -238,20 +742,231 @@ def test_np_computer():
     node2 = np_comp.generate_node(allow={TriBit.ONE, TriBit.X})
     np_comp.add_edge(node1, node2)
     
-    print(f"Final graph has {len(np_comp.graph.nodes())} nodes and {len(np_comp.graph.edges())} edges")
+    print(f"Final graph has {np_comp.store.number_of_nodes()} nodes and {np_comp.store.number_of_edges()} edges")
     print(f"Nodes: {list(np_comp.graph.nodes())}")
     print(f"Edges: {list(np_comp.graph.edges())}")
     
     # Show degree of each node
     for node in np_comp.graph.nodes():
-        degree = np_comp.graph.degree(node)
+        degree = len(np_comp.store[node])
         neighbors = list(np_comp.graph.neighbors(node))
         print(f"Node {node}: degree={degree}, neighbors={neighbors}")
     
     print("✓ PASSED\n")
     
+def test_forced_value_propagation():
+    """ Test that forced values are propagated while building, so decided graphs are known without solving """
+
+    # A NOT of a constant is decided as soon as it is connected
+    np_comp = NPComputer()
+    zero = np_comp.generate_node(allow={TriBit.ZERO})
+    not_zero = np_comp.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    assert not np_comp.is_known_sat, "The NOT has not been connected yet"
+    np_comp.add_edge(zero, not_zero)
+    assert np_comp.domains[not_zero] == 1 << TRI_BIT_TO_NODE[TriBit.ONE], "The NOT of 0 can only be 1"
+    assert np_comp.is_known_sat and not np_comp.is_known_unsat
+
+    result, mapping = np_comp.get_result_mapping()
+    assert result is True
+    assert mapping == is_colorable(np_comp.graph)[1], "The decided coloring should match the solved coloring"
+
+    # Connecting a node that is forced to 1 to another node that must be 1 (like BREAK does) is known to fail right away
+    one = np_comp.generate_node(allow={TriBit.ONE})
+    np_comp.add_edge(not_zero, one)
+    assert np_comp.is_known_unsat and not np_comp.is_known_sat
+    assert np_comp() is False
+
+    # The conflict can be several edges away from where it is found
+    np_comp = NPComputer()
+    chain = [np_comp.generate_node(allow={TriBit.ZERO, TriBit.ONE}) for _ in range(4)]
+    for u, v in zip(chain, chain[1:]):
+        np_comp.add_edge(u, v)
+    np_comp.add_edge(chain[-1], np_comp.generate_node(allow={TriBit.ZERO}))
+    assert np_comp.domains[chain[0]] == 1 << TRI_BIT_TO_NODE[TriBit.ZERO], "The 0 should have been carried back along the chain"
+    np_comp.add_edge(chain[0], np_comp.generate_node(allow={TriBit.ZERO}))
+    assert np_comp.is_known_unsat, "An even chain can not have 0 on both ends"
+
+    # A node that can still be 2 colors is not decided
+    np_comp = NPComputer()
+    node = np_comp.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    assert not np_comp.is_known_sat and not np_comp.is_known_unsat
+
+    # Edges can only be added between nodes the computer made
+    for u, v in [(node, node + 1), (3, node)]:
+        try:
+            np_comp.add_edge(u, v)
+            assert False, f"Node {v if u == node else u} was never made"
+        except AssertionError as error:
+            assert "generate_node" in str(error)
+
+def test_warm_start():
+    """ Test that repeated solves reuse the last result, and extend it when only a little was added """
+    np_comp = NPComputer()
+    nodes = [np_comp.generate_node(allow={TriBit.ZERO, TriBit.ONE}) for _ in range(6)]
+    for u, v in zip(nodes, nodes[1:]):
+        np_comp.add_edge(u, v)
+
+    assert np_comp() is True and np_comp.last_solve == "solved"
+    assert np_comp() is True and np_comp.last_solve == "cached", "Nothing changed so the result should be reused"
+    first = np_comp.get_mapping()
+
+    # A new node on the end of the path only needs that node colored
+    extra = np_comp.generate_node()
+    np_comp.add_edge(nodes[-1], extra)
+    result, mapping = np_comp.get_result_mapping()
+    assert result is True and np_comp.last_solve == "extended"
+    assert all(mapping[node] == first[node] for node in first), "The old colors should be kept"
+    assert is_colorable(np_comp.graph)[0] and all(mapping[u] != mapping[v] for u, v in np_comp.graph.edges())
+
+    # Closing an odd cycle of 0/1 nodes can not be fixed locally, and a full solve finds it is not colorable
+    np_comp.add_edge(nodes[0], nodes[-2])
+    assert np_comp() is False and np_comp.last_solve == "solved"
+    np_comp.generate_node()
+    assert np_comp() is False and np_comp.last_solve == "cached", "Adding to a graph that can not be colored can not fix it"
+
+    # A big hard block added after a solve is not a local change, the warm start gives up on it early and the whole solve keeps to the limits
+    from lib.run.VAR import VAR
+    from lib.run.SEARCH import CancelToken
+    np_comp = NPComputer()
+    VAR(np_comp, n=1)
+    assert np_comp() is True
+    hard = nx.gnm_random_graph(104, 240, seed=0)
+    nodes = {node: np_comp.generate_node() for node in hard.nodes()}
+    for u, v in hard.edges():
+        np_comp.add_edge(nodes[u], nodes[v])
+    assert np_comp.get_result_mapping(timeout=1.0)[0] is UNKNOWN and np_comp.last_solve == "stopped"
+    assert np_comp.last_stats["stopped"] == "timeout"
+    assert np_comp.get_result_mapping(max_decisions=500)[0] is UNKNOWN and np_comp.last_stats["stopped"] == "max_decisions"
+    cancel = CancelToken()
+    cancel.cancel()
+    assert np_comp.get_result_mapping(cancel=cancel)[0] is UNKNOWN and np_comp.last_stats["stopped"] == "cancelled"
+
+def test_solve_assumptions():
+    """ Test running one circuit on many inputs with assumptions instead of rebuilding it with CONSTs """
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.ADD import ADD
+    from lib.execution_control.BREAK import BREAK
+    from lib.run.MEM import MEM
+
+    np_comp = NPComputer()
+    a, b = VAR(np_comp, n=2), VAR(np_comp, n=2)
+    total, carry = ADD(np_comp, a, b)
+    nodes, edges = np_comp.store.number_of_nodes(), np_comp.store.number_of_edges()
+
+    assumption_sets = [{a: a_val, b: b_val} for a_val in range(4) for b_val in range(4)]
+    for assumptions, (result, mapping) in zip(assumption_sets, np_comp.solve_batch(assumption_sets)):
+        assert result is True
+        value, high = np_comp.read_values(mapping, total, MEM(np_comp, bits=[carry], n=1))
+        assert value + 4 * high == assumptions[a] + assumptions[b], f"ADD({assumptions[a]}, {assumptions[b]}) is wrong"
+
+    assert (np_comp.store.number_of_nodes(), np_comp.store.number_of_edges()) == (nodes, edges), "Assumptions should not add to the graph"
+    np_comp.solve({a: 1, b: 2})
+    assert np_comp.last_solve == "cached"
+
+    # Assumptions that can not be colored are learned, so anything that includes them is known right away
+    BREAK(np_comp, carry)
+    assert np_comp.solve({a: 3, b: 3})[0] is False
+    assert np_comp.solve({a: 3, b: 3, carry: 0})[0] is False and np_comp.last_solve == "learned"
+    assert np_comp.solve({a: 1, b: 2})[0] is True, "Results from before the BREAK should not be reused"
+    assert np_comp.solve({a: 1, a.bits[0]: 0})[0] is False, "A bit can not be assumed to be both 0 and 1"
+
+    # Assumed outputs keep their gates in the cone, so the circuit is solved backwards and the gates after them are still filled in
+    from lib.calculator_logic.MUL import MUL
+    np_comp = NPComputer()
+    a, b = VAR(np_comp, n=2), VAR(np_comp, n=2)
+    product, _ = MUL(np_comp, a, b)
+    total, carry = ADD(np_comp, a, b)
+    result, mapping = np_comp.solve({product: 6})
+    a_value, b_value, total_value, carry_value = np_comp.read_values(mapping, a, b, total, MEM(np_comp, bits=[carry], n=1))
+    assert result is True and np_comp.last_solve == "solved" and np_comp.last_stats["sliced"] > 0
+    assert a_value * b_value == 6 and total_value + 4 * carry_value == a_value + b_value
+    assert set(mapping) == set(np_comp.graph.nodes()) and all(mapping[u] != mapping[v] for u, v in np_comp.graph.edges())
+
+    # The solves keep to their limits, the warm start from the last coloring included
+    hard = nx.gnm_random_graph(104, 240, seed=0)
+    nodes = {node: np_comp.generate_node() for node in hard.nodes()}
+    for u, v in hard.edges():
+        np_comp.add_edge(nodes[u], nodes[v])
+    assert np_comp.solve({product: 3}, timeout=1.0)[0] is UNKNOWN and np_comp.last_solve == "stopped"
+    assert np_comp.last_stats["stopped"] == "timeout"
+    assert np_comp.solve({product: 3}, max_decisions=500)[0] is UNKNOWN and np_comp.last_stats["stopped"] == "max_decisions"
+
+def test_find():
+    """ Test that find reads VAR values and find_all gives every distinct solution """
+    from lib.run.VAR import VAR
+    from lib.run.CONST import CONST
+    from lib.execution_control.ASSERT import ASSERT_EQ, ASSERT_LT
+    from lib.calculator_logic.ADD import ADD
+
+    np_comp = NPComputer()
+    a = VAR(np_comp, n=3)
+    b = VAR(np_comp, n=2)
+    ASSERT_EQ(np_comp, a, 5)
+    ASSERT_EQ(np_comp, b, 2)
+    assert np_comp.find(a) == 5
+    assert np_comp.find(a, b, CONST(np_comp, value=6, n=3)) == (5, 2, 6)
+
+    np_comp = NPComputer()
+    a = VAR(np_comp, n=3)
+    ASSERT_LT(np_comp, a, 3)
+    nodes = np_comp.store.number_of_nodes()
+    assert sorted(np_comp.find_all(a)) == [0, 1, 2], "Every value less than 3 should be found once"
+    assert np_comp.store.number_of_nodes() == nodes, "find_all should not change the computer"
+
+    # Solutions are distinct over all the MEMs together
+    np_comp = NPComputer()
+    a, b = VAR(np_comp, n=1), VAR(np_comp, n=1)
+    assert sorted(np_comp.find_all(a, b)) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+    # Every solution of an ADD is found by blocking with assumptions, without adding to the graph or reusing a solution
+    np_comp = NPComputer()
+    a, b = VAR(np_comp, n=3), VAR(np_comp, n=3)
+    total, _ = ADD(np_comp, a, b)
+    ASSERT_EQ(np_comp, total, 5)
+    nodes, edges = np_comp.store.number_of_nodes(), np_comp.store.number_of_edges()
+    solutions = list(np_comp.find_all(a, b))
+    assert sorted(solutions) == [(x, (5 - x) % 8) for x in range(8)] and len(set(solutions)) == 8
+    assert (np_comp.store.number_of_nodes(), np_comp.store.number_of_edges()) == (nodes, edges)
+
+    # A graph that can not be colored has no solutions
+    np_comp = NPComputer()
+    a = VAR(np_comp, n=2)
+    ASSERT_LT(np_comp, a, 0)
+    assert np_comp.find(a) is None
+    assert list(np_comp.find_all(a)) == []
+
+def test_solve_limits():
+    """ Test that a full solve stopped by a limit is UNKNOWN, is not remembered, and can be tried again """
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+    from lib.run.SEARCH import CancelToken
+
+    np_comp = NPComputer()
+    a, b = VAR(np_comp, n=2), VAR(np_comp, n=2)
+    product, _ = MUL(np_comp, a, b)
+    ASSERT_EQ(np_comp, product, 6)
+
+    result, partial = np_comp.get_result_mapping(max_decisions=1)
+    assert result is UNKNOWN and np_comp.last_solve == "stopped"
+    assert np_comp.last_stats["stopped"] == "max_decisions" and np_comp.last_stats["decisions"] == 1
+    assert all(partial[u] != partial[v] for u, v in np_comp.graph.edges() if u in partial and v in partial)
+
+    cancel = CancelToken()
+    cancel.cancel()
+    assert np_comp.get_result_mapping(cancel=cancel)[0] is UNKNOWN and np_comp.last_stats["stopped"] == "cancelled"
+
+    result, mapping = np_comp.get_result_mapping(timeout=60)
+    assert result is SAT and np_comp.last_solve == "solved" and np_comp.last_stats["status"] == "SAT"
+    assert sorted(np_comp.read_values(mapping, a, b)) == [2, 3]
+
 def test_all():
     test_np_computer()
+    test_forced_value_propagation()
+    test_warm_start()
+    test_solve_assumptions()
+    test_find()
+    test_solve_limits()
 
 if __name__ == "__main__":
     test_all()
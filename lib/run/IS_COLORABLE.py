@@ -3,6 +3,8 @@
 import networkx as nx
 import matplotlib.pyplot as plt
 
+from lib.run.SEARCH import search_coloring
+
 def is_colorable_greedy(graph, k=3, visualize=False):
     """Check if a graph is k-colorable and return the coloring if it is.
 
@@ -62,22 +64,17 @@ def has_clique_4_or_larger(graph):
     Returns:
         bool: True if graph has K4 or larger clique
     """
-    nodes = list(graph.nodes())
-    n = len(nodes)
-    
-    # Check all combinations of 4 nodes
-    for i in range(n):
-        for j in range(i + 1, n):
-            for k in range(j + 1, n):
-                for l in range(k + 1, n):
-                    # Check if these 4 nodes form a clique
-                    if (graph.has_edge(nodes[i], nodes[j]) and
-                        graph.has_edge(nodes[i], nodes[k]) and
-                        graph.has_edge(nodes[i], nodes[l]) and
-                        graph.has_edge(nodes[j], nodes[k]) and
-                        graph.has_edge(nodes[j], nodes[l]) and
-                        graph.has_edge(nodes[k], nodes[l])):
-                        return True
+    # Every K4 has a lowest node u (in this order), then a next lowest v next to it, and two more nodes next to both of them
+    # So only the common neighbors above v of each edge (u, v) have to be checked, instead of every set of 4 nodes
+    order = {node: i for i, node in enumerate(graph.nodes())}
+    higher = {node: {other for other in graph.neighbors(node) if order[other] > order[node]} for node in graph.nodes()}
+
+    for u in graph.nodes():
+        for v in higher[u]:
+            common = higher[u] & higher[v]
+            for w in common:
+                if higher[w] & common:
+                    return True
     return False
 
 def is_color_safe(graph, node, color, coloring):
@@ -98,77 +95,115 @@ def is_color_safe(graph, node, color, coloring):
             return False
     return True
     
-def is_colorable(graph, visualize=False):
+def propagate_domains(graph, domains, queue):
+    """
+    Removes the color of every node in the queue that can only be one color from its neighbors, until nothing changes.
+
+    Args:
+        graph: NetworkX graph
+        domains: Bitmask of the colors each node can be (bit c for color c), narrowed in place
+        queue: The nodes to start from
+
+    Returns:
+        bool: False if some node has no colors left
+    """
+    queue = list(queue)
+    while queue:
+        node = queue.pop()
+        color = domains[node]
+        if color & (color - 1):
+            continue
+        for neighbor in graph.neighbors(node):
+            if domains[neighbor] & color:
+                domains[neighbor] &= ~color
+                if domains[neighbor] == 0:
+                    return False
+                if domains[neighbor] & (domains[neighbor] - 1) == 0:
+                    queue.append(neighbor)
+    return True
+
+def _shortcut_stats(stats, status):
+    """ Fills in the stats for an answer that was found without searching """
+    if stats is not None:
+        stats.update(status=status, decisions=0, backtracks=0, depth=0, stopped=None, seconds=0.0)
+
+def is_colorable(graph, visualize=False, domains=None, timeout=None, max_decisions=None, cancel=None, stats=None):
     """
     Version with constraint propagation - eliminates impossible colors early.
+    Optionally domains gives a bitmask of the colors each node can start with (bit c for color c).
+    The search can be stopped by a timeout (seconds), a budget of decisions or a CancelToken, then the result is UNKNOWN (None)
+    and the mapping is the best partial coloring it reached. If stats is a dict it is filled in like search_coloring does.
     """
     if len(graph.nodes()) == 0:
+        _shortcut_stats(stats, "SAT")
         return True, {}
     
-    if len(graph.nodes()) <= 3:
+    if len(graph.nodes()) <= 3 and domains is None:
         nodes = list(graph.nodes())
         coloring = {node: i for i, node in enumerate(nodes)}
         if visualize:
             visualize_coloring(graph, coloring)
+        _shortcut_stats(stats, "SAT")
         return True, coloring
     
     if has_clique_4_or_larger(graph):
+        _shortcut_stats(stats, "UNSAT")
         return False, {}
     
-    # Initialize domains for each node (possible colors)
-    domains = {node: {0, 1, 2} for node in graph.nodes()}
-    
     # NOTE: This sort is the one that is typically used in greedy coloring
     # nodes = sorted(graph.nodes(), key=lambda x: graph.degree(x), reverse=True)
 
     # NOTE: This is a specialized version that uses the order of nodes in the computer to have faster time complexity (if done right it should be linear, we should know what to change with a correct backtracking algorithm)
-    nodes = sorted(graph.nodes())
-
-    coloring = {}
-    
-    if backtrack_with_propagation(graph, nodes, coloring, domains, 0):
-        if visualize:
-            visualize_coloring(graph, coloring)
-        return True, coloring
-    else:
-        return False, {}
+    # The search decides the nodes in sorted order with forward checking, without recursion so it works on graphs of any size
+    result, coloring = search_coloring(graph, domains, order="creation", propagation="forward",
+                                       timeout=timeout, max_decisions=max_decisions, cancel=cancel, stats=stats)
+    if result and visualize:
+        visualize_coloring(graph, coloring)
+    return result, coloring
 
 
-def backtrack_with_propagation(graph, nodes, coloring, domains, node_index):
+def extend_coloring(graph, coloring, nodes, domains=None, timeout=None, max_decisions=None, cancel=None, stats=None):
     """
-    Backtracking with constraint propagation.
+    Colors the given nodes without changing the colors that are already in the coloring.
+    This is used to warm start from an earlier coloring when only a few nodes are new or changed.
+
+    Args:
+        graph: NetworkX graph
+        coloring: Partial coloring, the nodes are added to it if it works
+        nodes: The nodes to color, they must not be in the coloring
+        domains: Optional bitmask of the colors each node can be (bit c for color c)
+        timeout, max_decisions, cancel: Stop the search early like is_colorable, then the coloring is not changed
+        stats: Optional dict that is filled in like search_coloring does
+
+    Returns:
+        bool: True if the nodes could be colored around the existing coloring, UNKNOWN (None) if a limit stopped it first
     """
-    if node_index == len(nodes):
-        return True
-    
-    current_node = nodes[node_index]
-    
-    # Try colors in order of the current domain
-    for color in list(domains[current_node]):
-        if is_color_safe(graph, current_node, color, coloring):
-            # Make assignment
-            coloring[current_node] = color
-            
-            # Save domains before propagation
-            old_domains = {node: domain.copy() for node, domain in domains.items()}
-            
-            # Propagate constraints (remove this color from neighbors' domains)
-            valid = True
-            for neighbor in graph.neighbors(current_node):
-                if neighbor not in coloring and color in domains[neighbor]:
-                    domains[neighbor].remove(color)
-                    if len(domains[neighbor]) == 0:
-                        valid = False
-                        break
-            
-            if valid and backtrack_with_propagation(graph, nodes, coloring, domains, node_index + 1):
-                return True
-            
-            # Backtrack: restore domains and remove assignment
-            domains.update(old_domains)
-            del coloring[current_node]
-    
-    return False
+    domains = domains or {}
+    nodes = sorted(nodes)
+    uncolored = set(nodes)
+
+    # Each node can only be the colors it is allowed that no colored neighbor already has,
+    #   so only the edges between the new nodes are left to search
+    node_domains = {}
+    local = nx.Graph()
+    local.add_nodes_from(nodes)
+    for node in nodes:
+        domain = domains.get(node, 0b111)
+        for neighbor in graph.neighbors(node):
+            if neighbor in coloring:
+                domain &= ~(1 << coloring[neighbor])
+            elif neighbor in uncolored:
+                local.add_edge(node, neighbor)
+        if not domain:
+            _shortcut_stats(stats, "UNSAT")
+            return False
+        node_domains[node] = domain
+
+    result, mapping = search_coloring(local, node_domains, order="creation", propagation="forward",
+                                      timeout=timeout, max_decisions=max_decisions, cancel=cancel, stats=stats)
+    if result:
+        coloring.update(mapping)
+    return result
 
 def test_is_colorable():
     # Test code
@@ -190,6 +225,39 @@ def test_is_colorable():
 
     print("All tests passed.")
 
+def test_has_clique_4_or_larger():
+    # A K4 hidden in a bigger graph that has lots of triangles
+    G = nx.triangular_lattice_graph(4, 4)
+    assert has_clique_4_or_larger(G) == False
+
+    nodes = list(G.nodes())[:4]
+    G.add_edges_from((u, v) for i, u in enumerate(nodes) for v in nodes[i + 1:])
+    assert has_clique_4_or_larger(G) == True
+
+def test_extend_coloring():
+    # Extending a path keeps the old colors and only colors the new node
+    G = nx.path_graph(4)
+    coloring = {0: 0, 1: 1, 2: 0}
+    assert extend_coloring(G, coloring, [3]) == True
+    assert coloring[3] != coloring[2]
+    assert {0: 0, 1: 1, 2: 0}.items() <= coloring.items()
+
+    # A new node next to all 3 colors can not be colored without changing the old colors
+    G.add_edges_from([(4, 0), (4, 1), (4, 3)])
+    coloring = {0: 0, 1: 1, 2: 0, 3: 2}
+    assert extend_coloring(G, coloring, [4]) == False
+
+    # Domains are respected
+    coloring = {0: 0}
+    assert extend_coloring(nx.path_graph(2), coloring, [1], domains={1: 0b100}) == True
+    assert coloring[1] == 2
+
+    # A search that runs out of decisions is UNKNOWN and leaves the coloring as it was
+    G = nx.wheel_graph(12)
+    coloring, stats = {0: 0}, {}
+    assert extend_coloring(G, coloring, range(1, 12), max_decisions=1, stats=stats) is None
+    assert coloring == {0: 0} and stats["stopped"] == "max_decisions"
+
 def test_is_colorable_default():
     print("\nPerformance comparison on larger graph:")
     G4 = nx.petersen_graph()
@@ -200,6 +268,8 @@ def test_is_colorable_default():
 
 def test_all():
     test_is_colorable()
+    test_has_clique_4_or_larger()
+    test_extend_coloring()
     test_is_colorable_default()
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+# This shrinks a graph to its kernel before it is solved
+# A node with fewer neighbors than colors it can be can always be colored last, whatever colors its neighbors get there is one left
+# Many nodes in a circuit are like this (outputs of gates that nothing uses, result bits without a BREAK), and removing one
+#   lowers the degree of its neighbors, so they can be removed too, and so on
+# The nodes are peeled off with a queue, the kernel that is left is solved, then the peeled nodes are colored greedily in reverse order
+#   (each one only has to avoid the neighbors that were still there when it was peeled, and there were fewer of those than its colors)
+
+import networkx as nx
+
+# The number of colors in a domain bitmask
+_SIZE = [0, 1, 1, 2, 1, 2, 2, 3]
+
+def peel(graph: nx.Graph, domains: dict, nodes) -> tuple[set, list]:
+    """ Peels off every node that has fewer neighbors left than colors in its domain, until there are none
+
+    Args:
+        graph (nx.Graph): The graph
+        domains (dict): Bitmask of the colors each node can be, the colors of the nodes that are not in nodes must already be taken out
+        nodes (iterable): The nodes that can be peeled, usually the ones that are not decided yet
+
+    Returns:
+        set, list: The kernel (the nodes that are left), and the peeled nodes in the order they were peeled
+    """
+
+    remaining = set(nodes)
+    degree = {node: sum(1 for neighbor in graph[node] if neighbor in remaining) for node in remaining}
+
+    # A node next to itself can never be colored, so it is never peeled
+    queue = [node for node in remaining if degree[node] < _SIZE[domains[node]] and not graph.has_edge(node, node)]
+    order = []
+    while queue:
+        node = queue.pop()
+        if node not in remaining:
+            continue
+        remaining.discard(node)
+        order.append(node)
+        for neighbor in graph[node]:
+            if neighbor in remaining:
+                degree[neighbor] -= 1
+                if degree[neighbor] < _SIZE[domains[neighbor]] and not graph.has_edge(neighbor, neighbor):
+                    queue.append(neighbor)
+    return remaining, order
+
+def color_peeled(graph: nx.Graph, domains: dict, mapping: dict, order: list):
+    """ Colors the peeled nodes in reverse order, each with the lowest color none of its colored neighbors have
+
+    Args:
+        graph (nx.Graph): The graph
+        domains (dict): Bitmask of the colors each node can be
+        mapping (dict): A coloring of every node that was not peeled, the peeled nodes are added to it
+        order (list): The peeled nodes in the order they were peeled
+    """
+
+    for node in reversed(order):
+        free = domains[node]
+        for neighbor in graph[node]:
+            if neighbor in mapping:
+                free &= ~(1 << mapping[neighbor])
+        assert free, f"Peeled node {node} has no color left, it should not have been peeled"
+        mapping[node] = (free & -free).bit_length() - 1
+
+def kernelize(graph: nx.Graph, domains: dict = None) -> dict:
+    """ Reports how much of a graph is left to search after the decided nodes are cut out and the low degree nodes are peeled
+
+    Args:
+        graph (nx.Graph): The graph
+        domains (dict, optional): Bitmask of the colors each node can be, like computer.domains. Defaults to None.
+
+    Returns:
+        dict: {"nodes", "decided", "peeled", "kernel"} counts, kernel is None if the domains alone can not be colored
+    """
+
+    # Imported here since COMPONENTS uses this module
+    from lib.run.COMPONENTS import find_components
+
+    peeled = []
+    components, narrowed = find_components(graph, domains or {}, peeled=peeled)
+    if narrowed is None:
+        return {"nodes": len(graph.nodes()), "decided": None, "peeled": None, "kernel": None}
+    kernel = sum(len(component) for component in components)
+    return {"nodes": len(graph.nodes()), "decided": len(graph.nodes()) - kernel - len(peeled), "peeled": len(peeled), "kernel": kernel}
+
+# Test functions
+def test_peel():
+    """ Test peeling a graph down to its kernel and coloring the peeled nodes back """
+    from lib.run.IS_COLORABLE import is_colorable
+
+    # A K4 minus an edge with a path hanging off it, the path and then the two degree 2 nodes of the diamond peel away
+    graph = nx.Graph([(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (3, 4), (4, 5)])
+    domains = {node: 0b111 for node in graph.nodes()}
+    kernel, order = peel(graph, domains, graph.nodes())
+    assert kernel == set() and set(order) == set(graph.nodes())
+
+    # The odd wheel is its own kernel, a leaf on it is not
+    graph = nx.wheel_graph(6)
+    graph.add_edge(5, 99)
+    domains = {node: 0b111 for node in graph.nodes()}
+    kernel, order = peel(graph, domains, graph.nodes())
+    assert kernel == set(range(6)) and order == [99]
+
+    # A node with one color left can only be peeled if it has no neighbors left
+    graph = nx.path_graph(3)
+    kernel, order = peel(graph, {0: 0b001, 1: 0b011, 2: 0b011}, graph.nodes())
+    assert kernel == set() and order == [2, 1, 0]
+    kernel, order = peel(graph, {0: 0b001, 1: 0b001, 2: 0b011}, graph.nodes())
+    assert kernel == {0, 1} and order == [2]
+
+    # Coloring back gives a proper coloring
+    graph = nx.convert_node_labels_to_integers(nx.grid_2d_graph(4, 4))
+    graph.add_edges_from([(15, 16), (16, 17), (17, 15), (17, 18)])
+    domains = {node: 0b111 for node in graph.nodes()}
+    kernel, order = peel(graph, domains, graph.nodes())
+    mapping = is_colorable(graph.subgraph(kernel))[1] if kernel else {}
+    color_peeled(graph, domains, mapping, order)
+    assert all(mapping[u] != mapping[v] for u, v in graph.edges())
+
+def test_kernel_circuit():
+    """ Test that outputs nothing uses are peeled, and that solving a computer reports the kernel it searched """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.binary_logic.NAND import NAND
+    from lib.calculator_logic.ADD import ADD
+    from lib.execution_control.BREAK import BREAK
+    from lib.run.CONE import slice_cone
+    from lib.run.CONTRACT import contract
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=4), VAR(computer, n=4)
+    for i in range(4):
+        NAND(computer, a.bits[i], b.bits[i])
+    report = kernelize(computer.graph, computer.domains)
+    assert report["peeled"] == 4, "The output of each NAND is only next to its AND and X, so it should peel off"
+    assert report["decided"] + report["peeled"] + report["kernel"] == report["nodes"]
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    total, carry = ADD(computer, a, b)
+    BREAK(computer, carry)
+    report = kernelize(computer.graph, computer.domains)
+    assert 0 < report["kernel"] < report["nodes"], "The carry that has to be 0 should keep part of the ADD in the kernel"
+
+    # The computer only solves the cone of the BREAK (see CONE.py), with the nodes that always have the same color merged (see CONTRACT.py)
+    report = kernelize(*contract(computer.graph.subgraph(slice_cone(computer)[0]), computer.domains)[:2])
+    result, mapping = computer.get_result_mapping()
+    assert result is True and computer.last_stats["kernel"] == report["kernel"] and computer.last_stats["peeled"] == report["peeled"]
+    assert all(mapping[u] != mapping[v] for u, v in computer.graph.edges())
+    assert sum(computer.read_values(mapping, a, b)) < 4
+
+def test_all():
+    """ Run all tests for the kernel """
+    test_peel()
+    test_kernel_circuit()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
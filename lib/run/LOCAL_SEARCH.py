@@ -0,0 +1,192 @@
+# This looks for a 3 coloring by moving nodes between colors instead of searching every choice
+# It can only ever prove a graph is colorable (by finding a coloring), never that it is not, so when it runs out of steps the result is UNKNOWN
+# For graphs that are expected to be colorable (like every valid addition in main.py) it is often much faster than the complete search
+# Tabu search over the conflicting nodes (Tabucol):
+#   Every node starts with a greedy color, then each step looks at every node that has a neighbor with the same color
+#   and makes the move (node to allowed color) that removes the most conflicts, even if it makes things worse
+#   Moving a node back to a color it just left is tabu for a few steps (unless it would be the best coloring so far), so it does not cycle
+# The count of neighbors of each color is kept for every node in an (n, 3) array and only the neighbors of the moved node are updated
+
+import time
+import random
+
+import numpy as np
+import networkx as nx
+
+from lib.run.IS_COLORABLE import propagate_domains
+from lib.run.SEARCH import CancelToken
+from lib.run.FINALS import SAT, UNSAT, UNKNOWN
+
+def local_search(graph: nx.Graph, domains: dict = None, max_steps: int = 10000, tenure: int = 7, seed: int = 0,
+                 timeout: float = None, cancel: CancelToken = None, stats: dict = None) -> tuple[bool, dict]:
+    """ Looks for a 3 coloring with min-conflicts and a tabu list
+
+    Args:
+        graph (nx.Graph): The graph to color
+        domains (dict, optional): Bitmask of the colors each node can be (bit c for color c), missing nodes can be any color. Defaults to None.
+        max_steps (int, optional): The most nodes to move. Defaults to 10000.
+        tenure (int, optional): How many steps a node can not move back to the color it left (plus 0.6 per conflicting node and a random 0 to tenure). Defaults to 7.
+        seed (int, optional): Seeds the random picks. Defaults to 0.
+        timeout (float, optional): Stop after this many seconds. Defaults to None.
+        cancel (CancelToken, optional): Stop when this is cancelled. Defaults to None.
+        stats (dict, optional): Filled in with "status", "steps", "conflicts" (edges with the same color in the best coloring),
+            "stopped" ("timeout" or "cancelled" if that stopped it before max_steps) and "seconds". Defaults to None.
+
+    Returns:
+        (bool, dict): (result, mapping), True with a coloring, UNSAT (False) only if the domains alone can not work,
+            otherwise UNKNOWN (None) and the coloring with the fewest conflicts that was found
+    """
+
+    start = time.perf_counter()
+    stats = stats if stats is not None else {}
+    stats.update(status=None, steps=0, conflicts=0, stopped=None, seconds=0.0)
+    rng = random.Random(seed)
+
+    def finish(result, mapping):
+        stats.update(status={SAT: "SAT", UNSAT: "UNSAT", UNKNOWN: "UNKNOWN"}[result], seconds=time.perf_counter() - start)
+        return result, mapping
+
+    # The decided nodes are taken out of their neighbors' domains first, then they never have to move
+    domains = {node: (domains or {}).get(node, 0b111) for node in graph.nodes()}
+    if 0 in domains.values() or not propagate_domains(graph, domains, [node for node, domain in domains.items() if domain & (domain - 1) == 0]):
+        return finish(UNSAT, {})
+    mapping = {node: domain.bit_length() - 1 for node, domain in domains.items() if domain & (domain - 1) == 0}
+
+    nodes = [node for node in graph.nodes() if node not in mapping]
+    index = {node: i for i, node in enumerate(nodes)}
+    n = len(nodes)
+    neighbors = [np.array([index[other] for other in graph[node] if other in index and other != node], dtype=np.int64) for node in nodes]
+    allowed = np.array([[(domains[node] >> color) & 1 for color in range(3)] for node in nodes], dtype=bool).reshape(n, 3)
+
+    # Greedy start, each node takes the allowed color that the fewest of its colored neighbors have
+    colors = np.full(n, -1, dtype=np.int64)
+    for i in range(n):
+        taken = np.bincount(colors[neighbors[i]][colors[neighbors[i]] >= 0], minlength=3)
+        options = [color for color in range(3) if allowed[i, color]]
+        colors[i] = min(options, key=lambda color: (taken[color], rng.random()))
+
+    # conflicts[i, c] is how many neighbors of node i have color c
+    conflicts = np.zeros((n, 3), dtype=np.int64)
+    for i in range(n):
+        if len(neighbors[i]):
+            conflicts[i] = np.bincount(colors[neighbors[i]], minlength=3)
+
+    tabu = np.zeros((n, 3), dtype=np.int64)
+    total = int(conflicts[np.arange(n), colors].sum()) // 2
+    best_total, best_colors = total, colors.copy()
+    not_current = np.ones((n, 3), dtype=bool)
+    not_current[np.arange(n), colors] = False
+
+    step = 0
+    while total > 0 and step < max_steps:
+        if step % 256 == 0:
+            if cancel is not None and cancel.cancelled:
+                stats["stopped"] = "cancelled"
+                break
+            if timeout is not None and time.perf_counter() - start > timeout:
+                stats["stopped"] = "timeout"
+                break
+        step += 1
+
+        # The nodes that have a neighbor with the same color, and how much moving each of them to each color changes the conflicts
+        moving = np.flatnonzero(conflicts[np.arange(n), colors] > 0)
+        delta = conflicts[moving] - conflicts[moving, colors[moving]][:, None]
+
+        # Only allowed colors that are not tabu, unless the move gives the fewest conflicts yet
+        valid = allowed[moving] & not_current[moving] & ((tabu[moving] <= step) | (total + delta < best_total))
+        if not valid.any():
+            continue
+        fewest = delta[valid].min()
+        picks = np.argwhere(valid & (delta == fewest))
+        row, new = picks[rng.randrange(len(picks))]
+        node, old = moving[row], colors[moving[row]]
+
+        total += int(fewest)
+        colors[node] = new
+        not_current[node, old], not_current[node, new] = True, False
+        tabu[node, old] = step + tenure + int(0.6 * len(moving)) + rng.randint(0, tenure)
+
+        around = neighbors[node]
+        conflicts[around, old] -= 1
+        conflicts[around, new] += 1
+
+        if total < best_total:
+            best_total, best_colors = total, colors.copy()
+
+    stats.update(steps=step, conflicts=int(best_total))
+    mapping.update((node, int(color)) for node, color in zip(nodes, best_colors))
+    return finish(SAT if best_total == 0 else UNKNOWN, mapping)
+
+# Test functions
+def test_local_search_small_graphs():
+    """ Test that colorable graphs are colored and graphs that are not colorable stay UNKNOWN """
+    from lib.run.SEARCH import _is_proper
+
+    for graph in [nx.petersen_graph(), nx.grid_2d_graph(5, 5), nx.cycle_graph(9), nx.wheel_graph(7)]:
+        graph = nx.convert_node_labels_to_integers(graph)
+        result, mapping = local_search(graph)
+        assert result is True and _is_proper(graph, mapping)
+
+    stats = {}
+    result, mapping = local_search(nx.wheel_graph(6), max_steps=200, stats=stats)
+    assert result is UNKNOWN and stats["steps"] == 200 and stats["conflicts"] >= 1, "An odd wheel can never be colored"
+    assert len(mapping) == 6, "The best coloring found should still be given"
+
+    # Domains are kept to, and domains that can not work are UNSAT
+    domains = {0: 0b001, 1: 0b010, 4: 0b011}
+    result, mapping = local_search(nx.cycle_graph(6), domains)
+    assert result is True and _is_proper(nx.cycle_graph(6), mapping, domains)
+    assert local_search(nx.path_graph(2), {0: 0b001, 1: 0b001})[0] is False
+
+    # A cancel stops it before it runs out of steps
+    cancel = CancelToken()
+    cancel.cancel()
+    assert local_search(nx.wheel_graph(6), max_steps=10000, cancel=cancel, stats=stats)[0] is UNKNOWN
+    assert stats["stopped"] == "cancelled" and stats["steps"] < 10000
+
+def test_local_search_circuit():
+    """ Test the local search on a circuit, standalone and as the first stage of get_result_mapping """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.ADD import ADD
+    from lib.run.SEARCH import _is_proper
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    ADD(computer, a, b)
+    result, mapping = local_search(computer.graph, computer.domains, max_steps=100000)
+    assert result is True and _is_proper(computer.graph, mapping, computer.domains)
+
+    computer = NPComputer(local_search_steps=100000)
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    total, _ = ADD(computer, a, b)
+    result, mapping = computer.get_result_mapping()
+    assert result is True and computer.last_solve == "local"
+    assert sum(computer.read_values(mapping, a, b)) % 4 == computer.read_values(mapping, total)[0]
+
+    # When it runs out of steps the complete solver still answers
+    computer = NPComputer(local_search_steps=1)
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    ADD(computer, a, b)
+    assert computer.get_result_mapping()[0] is True and computer.last_solve in ("local", "solved")
+
+    # The limits are shared with the complete solver, so a timeout is not used up twice
+    # A small random graph that can not be colored is quick to build and slice but slow to search
+    computer = NPComputer(local_search_steps=10 ** 9)
+    hard = nx.gnm_random_graph(104, 240, seed=0)
+    nodes = {node: computer.generate_node() for node in hard.nodes()}
+    for u, v in hard.edges():
+        computer.add_edge(nodes[u], nodes[v])
+    assert computer.get_result_mapping(timeout=1.0)[0] is UNKNOWN and computer.last_stats["stopped"] == "timeout"
+    assert computer.last_stats["local_steps"] < 10 ** 9 and computer.last_stats["decisions"] == 0, "Local search should use up the timeout and leave none for the complete solver"
+    assert computer.get_result_mapping(max_decisions=500)[0] is UNKNOWN and computer.last_stats["stopped"] == "max_decisions"
+    assert computer.last_stats["local_steps"] == 500 and computer.last_stats["decisions"] == 0, "Each step should count as a decision"
+
+def test_all():
+    """ Run all tests for the local search """
+    test_local_search_small_graphs()
+    test_local_search_circuit()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
@@ -1,7 +1,112 @@
 # This is the basic memory block, only used as a base
+# The bits of a MEM can be a normal list, or a BitView which remaps the indexes of other bit lists without copying them
+# This lets shifts, rotations, slices, concatenation and extension be done without adding nodes to the graph
 from lib.run.FINALS import DEFAULT_INT_BIT_LENGTH
 from lib.run.INIT import NPComputer
 
+class _Fill:
+    """ A read only sequence that is the same node id n times """
+
+    __slots__ = ("node", "n")
+
+    def __init__(self, node: int, n: int):
+        self.node = node
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return self.node
+
+class BitView:
+    """ A read only list of bit node ids made of segments, each segment is a range of indexes into another bit list
+    Nothing is copied, so making a view only allocates the view and its (few) segments
+    """
+
+    __slots__ = ("segments", "n")
+
+    def __init__(self, segments):
+        merged = []
+        for source, indexes in segments:
+            if len(indexes) == 0:
+                continue
+
+            # Join a segment onto the last one if it carries on from it, so views of views stay small
+            if merged:
+                last_source, last_indexes = merged[-1]
+                if isinstance(source, _Fill) and isinstance(last_source, _Fill) and source.node == last_source.node:
+                    n = len(last_indexes) + len(indexes)
+                    merged[-1] = (_Fill(source.node, n), range(n))
+                    continue
+                if source is last_source and last_indexes.step == indexes.step == 1 and last_indexes.stop == indexes.start:
+                    merged[-1] = (source, range(last_indexes.start, indexes.stop))
+                    continue
+            merged.append((source, indexes))
+
+        self.segments = tuple(merged)
+        self.n = sum(len(indexes) for _, indexes in self.segments)
+
+    @classmethod
+    def of(cls, bits) -> "BitView":
+        """ Makes a view of a list of bits (or returns it if it is already a view) """
+        if isinstance(bits, BitView):
+            return bits
+        return cls([(bits, range(len(bits)))])
+
+    @classmethod
+    def fill(cls, node: int, n: int) -> "BitView":
+        """ Makes a view that is the same node n times """
+        return cls([(_Fill(node, n), range(n))])
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for source, indexes in self.segments:
+            for i in indexes:
+                yield source[i]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.n)
+            if step != 1:
+                return BitView.of(list(self)[key])
+
+            # Cut the segments down to the part between start and stop
+            segments = []
+            offset = 0
+            for source, indexes in self.segments:
+                lo, hi = max(start - offset, 0), min(stop - offset, len(indexes))
+                if lo < hi:
+                    segments.append((source, indexes[lo:hi]))
+                offset += len(indexes)
+            return BitView(segments)
+
+        if key < 0:
+            key += self.n
+        if not 0 <= key < self.n:
+            raise IndexError("BitView index out of range")
+        for source, indexes in self.segments:
+            if key < len(indexes):
+                return source[indexes[key]]
+            key -= len(indexes)
+
+    def __add__(self, other):
+        return BitView(self.segments + BitView.of(other).segments)
+
+    def __radd__(self, other):
+        return BitView.of(other) + self
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"BitView({list(self)})"
+
 class MEM:
     def __init__(self, computer, bits: list[int] = [], n: int=DEFAULT_INT_BIT_LENGTH):
         self.computer = computer
@@ -11,34 +116,87 @@ class MEM:
     def __len__(self):
         """ Returns the number of bits in this MEM """
         return self.n
-    
+
+    def _view(self, bits):
+        """ Makes a MEM of the same type around the given bits """
+        return self.__class__(self.computer, bits=bits, n=len(bits))
+
+    def _zeros(self, n: int) -> BitView:
+        """ n bits that all point at the computer's shared 0 node, no bits do not make the 0 node """
+        if n == 0:
+            return BitView([])
+        return BitView.fill(self.computer.zero_node, n)
+
     def get_lower_half(self):
         """ Returns the lower half of the MEM """
-        bits = self.bits[:self.n // 2]
-        return self.__class__(self.computer, bits=bits, n=len(bits))
+        return self._view(BitView.of(self.bits)[:self.n // 2])
 
     def get_upper_half(self):
         """ Returns the upper half of the MEM """
-        bits = self.bits[self.n // 2:]
-        return self.__class__(self.computer, bits=bits, n=len(bits))
-    
+        return self._view(BitView.of(self.bits)[self.n // 2:])
+
+    def slice(self, start: int, stop: int = None):
+        """ Returns bits start up to (not including) stop, like a python slice """
+        return self._view(BitView.of(self.bits)[start:stop])
+
     def merge(self, other):
         """ Merges this MEM with another MEM """
-        new_bits = self.bits + other.bits
-        return self.__class__(self.computer, bits=new_bits, n=len(new_bits))
-    
+        return self.concat(other)
+
+    def concat(self, other):
+        """ Returns this MEM with another MEM as the more significant bits """
+        return self._view(BitView.of(self.bits) + other.bits)
+
+    def shift_left(self, k: int):
+        """ Shifts towards the most significant bit (multiplies by 2^k), keeping the same number of bits """
+        k = min(k, self.n)
+        bits = BitView.of(self.bits)
+        return self._view(self._zeros(k) + bits[:self.n - k])
+
+    def shift_right(self, k: int):
+        """ Shifts towards the least significant bit (divides by 2^k), filling the top with 0 """
+        k = min(k, self.n)
+        bits = BitView.of(self.bits)
+        return self._view(bits[k:self.n] + self._zeros(k))
+
+    def rotate_left(self, k: int):
+        """ Rotates towards the most significant bit, the top bits wrap around to the bottom """
+        if self.n == 0:
+            return self._view(BitView([]))
+        k %= self.n
+        bits = BitView.of(self.bits)
+        return self._view(bits[self.n - k:self.n] + bits[:self.n - k])
+
+    def rotate_right(self, k: int):
+        """ Rotates towards the least significant bit, the bottom bits wrap around to the top """
+        if self.n == 0:
+            return self._view(BitView([]))
+        return self.rotate_left(self.n - k % self.n)
+
+    def zero_extend(self, n: int):
+        """ Returns this MEM padded with 0 bits up to n bits """
+        assert n >= self.n, "Can not extend to fewer bits"
+        return self._view(BitView.of(self.bits)[:self.n] + self._zeros(n - self.n))
+
+    def sign_extend(self, n: int):
+        """ Returns this MEM padded up to n bits with copies of the top bit """
+        assert n >= self.n, "Can not extend to fewer bits"
+        assert self.n > 0, "Can not sign extend a 0 bit MEM"
+        bits = BitView.of(self.bits)
+        return self._view(bits[:self.n] + BitView.fill(bits[self.n - 1], n - self.n))
+
 # Test Functions
 def test_merge_basic():
     """Test basic merge functionality"""
     computer = NPComputer()
-    
+
     # Create two simple MEMs
     mem1 = MEM(computer, bits=[1, 2, 3], n=3)
     mem2 = MEM(computer, bits=[4, 5], n=2)
-    
+
     # Merge them
     merged = mem1.merge(mem2)
-    
+
     # Check results
     assert merged.bits == [1, 2, 3, 4, 5], "Merged bits should be concatenated"
     assert merged.n == 5, "Merged n should be sum of original n values"
@@ -46,10 +204,70 @@ def test_merge_basic():
     assert merged.computer is computer, "Computer should be preserved"
     assert isinstance(merged, MEM), "Result should be MEM instance"
 
+def test_views_add_no_nodes():
+    """Test that shifts, rotations, slices and extensions never add nodes (besides the one shared 0)"""
+    computer = NPComputer()
+    zero = computer.zero_node
+    mem = MEM(computer, bits=[10, 11, 12, 13], n=4)
+    nodes = computer.store.number_of_nodes()
+
+    assert mem.shift_left(1).bits == [zero, 10, 11, 12]
+    assert mem.shift_right(2).bits == [12, 13, zero, zero]
+    assert mem.shift_left(9).bits == [zero] * 4
+    assert mem.rotate_left(1).bits == [13, 10, 11, 12]
+    assert mem.rotate_right(1).bits == [11, 12, 13, 10]
+    assert mem.rotate_left(6).bits == mem.rotate_right(2).bits
+    assert mem.slice(1, 3).bits == [11, 12]
+    assert mem.slice(2).bits == [12, 13]
+    assert mem.zero_extend(6).bits == [10, 11, 12, 13, zero, zero]
+    assert mem.sign_extend(6).bits == [10, 11, 12, 13, 13, 13]
+    assert mem.concat(mem.slice(0, 1)).bits == [10, 11, 12, 13, 10]
+
+    assert computer.store.number_of_nodes() == nodes, "Views should not add nodes to the graph"
+
+    # Padding with no bits does not make the 0 node
+    computer = NPComputer()
+    mem = MEM(computer, bits=[10, 11], n=2)
+    nodes = computer.store.number_of_nodes()
+    assert mem.shift_left(0).bits == [10, 11] and mem.shift_right(0).bits == [10, 11] and mem.zero_extend(2).bits == [10, 11]
+    assert computer.store.number_of_nodes() == nodes, "Padding with no bits should not make the 0 node"
+
+def test_views_share_zero_node():
+    """Test that padding from different MEMs uses the same 0 node"""
+    computer = NPComputer()
+    a = MEM(computer, bits=[10, 11], n=2).zero_extend(4)
+    nodes = computer.store.number_of_nodes()
+    b = MEM(computer, bits=[20], n=1).shift_left(1).zero_extend(3)
+
+    assert computer.store.number_of_nodes() == nodes, "The 0 node should only be made once"
+    assert a.bits[3] == b.bits[0] == b.bits[2] == computer.zero_node
+
+def test_views_stay_small():
+    """Test that views of views do not copy bits or grow without limit"""
+    computer = NPComputer()
+    bits = list(range(100, 164))
+    mem = MEM(computer, bits=bits, n=64)
+
+    view = mem
+    for _ in range(100):
+        view = view.rotate_left(5).rotate_right(3)
+    assert view.bits == mem.rotate_left(200).bits
+    assert len(view.bits.segments) <= 2, "Rotations of rotations should merge back into at most 2 segments"
+
+    # The view points at the original list rather than a copy
+    assert all(source is mem.bits for source, _ in mem.slice(3, 40).bits.segments)
+
+    halves = mem.get_lower_half().merge(mem.get_upper_half())
+    assert halves.bits == bits
+    assert len(halves.bits.segments) == 1, "Halves put back together should be one segment again"
+
 def test_all():
     """Run all tests"""
     test_merge_basic()
+    test_views_add_no_nodes()
+    test_views_share_zero_node()
+    test_views_stay_small()
 
 if __name__ == "__main__":
     test_all()
-    print("All tests passed!")
\ No newline at end of file
+    print("All tests passed!")
@@ -0,0 +1,56 @@
+# This is the process pool that the parallel solvers share
+# The graph and domains are sent to each process once when the pool starts, as a read-only snapshot,
+#   so the jobs only need to send what is different about them (like the bits of a cube, or which solver to run)
+
+import multiprocessing
+import multiprocessing.pool
+
+import networkx as nx
+
+# The (graph, domains) snapshot of this process, only set in the processes of a pool
+_snapshot = None
+
+def _init_worker(nodes: list, edges: list, domains: dict):
+    """ Builds the read-only snapshot once in each process of the pool """
+
+    global _snapshot
+    graph = nx.Graph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(edges)
+    _snapshot = (graph, domains)
+
+def get_snapshot() -> tuple[nx.Graph, dict]:
+    """ Gets the (graph, domains) snapshot in a process of the pool, the domains should be copied before they are changed """
+
+    return _snapshot
+
+def snapshot_pool(graph: nx.Graph, domains: dict, processes: int) -> multiprocessing.pool.Pool:
+    """ Starts a pool where every process has a snapshot of the graph and domains
+
+    Args:
+        graph (nx.Graph): The graph to share
+        domains (dict): The domains to share, bitmask of the colors each node can be
+        processes (int): The number of processes
+
+    Returns:
+        multiprocessing.pool.Pool: The pool, leaving it in a with block terminates anything that is still running
+    """
+
+    initargs = (list(graph.nodes()), list(graph.edges()), dict(domains or {}))
+    return multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+
+def as_completed(jobs: list, stop=None):
+    """ Yields the results of async jobs (from apply_async) in the order they finish
+
+    Args:
+        jobs (list): The AsyncResults
+        stop (callable, optional): Checked while waiting, when it returns True no more results are yielded. Defaults to None.
+    """
+
+    pending = list(jobs)
+    while pending and not (stop and stop()):
+        for job in [job for job in pending if job.ready()]:
+            pending.remove(job)
+            yield job.get()
+        if pending:
+            pending[0].wait(0.001)
@@ -0,0 +1,186 @@
+# This races several solver configurations on the same graph in separate processes and takes the first answer
+# No one strategy wins on every graph, deciding in creation order is great when the inputs are CONSTs and bad on a FIND,
+#   dsatur is the other way around, so running them all at once costs CPUs but not time
+# Each configuration is a dict with a "name" and a "solver":
+#   search    - search_coloring with an "order", a "propagation" and optionally a "seed" (see SEARCH.py)
+#   restart   - restart_search with an "order", a "schedule" and a "seed" (see SEARCH.py)
+#   local     - local_search with a "max_steps" (see LOCAL_SEARCH.py), it can only win by finding a coloring
+#   treewidth - the DP over a tree decomposition (see TREEWIDTH.py), it gives no coloring so it can only win by proving there is none,
+#               and it gives up on graphs that are too wide
+# The winner is logged (and kept in computer.portfolio_log) so the configurations can be tuned from which ones win
+
+import os
+import time
+import logging
+import itertools
+
+import networkx as nx
+
+from lib.run.SEARCH import search_coloring, restart_search, CancelToken
+from lib.run.FINALS import UNKNOWN
+from lib.run.TREEWIDTH import is_colorable_treewidth
+from lib.run.LOCAL_SEARCH import local_search
+from lib.run.POOL import snapshot_pool, get_snapshot, as_completed
+
+logger = logging.getLogger(__name__)
+
+# How long past the timeout the race waits, so the searches that stop themselves at the timeout can still send their partial coloring
+LATE_SECONDS = 0.2
+
+PORTFOLIO_CONFIGS = [
+    {"name": "creation", "solver": "search", "order": "creation", "propagation": "full"},
+    {"name": "dsatur", "solver": "search", "order": "dsatur", "propagation": "full"},
+    {"name": "dsatur_forward", "solver": "search", "order": "dsatur", "propagation": "forward"},
+    {"name": "degree", "solver": "search", "order": "degree", "propagation": "full"},
+    {"name": "random_1", "solver": "search", "order": "random", "propagation": "full", "seed": 1},
+    {"name": "random_luby", "solver": "restart", "order": "random", "schedule": "luby", "seed": 0},
+    {"name": "tabu", "solver": "local", "max_steps": 10 ** 6, "seed": 0},
+    {"name": "treewidth", "solver": "treewidth"},
+]
+
+def run_config(graph: nx.Graph, domains: dict, config: dict, timeout: float = None, max_decisions: int = None) -> tuple[bool, dict]:
+    """ Runs one configuration of the portfolio
+
+    Args:
+        graph (nx.Graph): The graph to solve
+        domains (dict): Bitmask of the colors each node can be
+        config (dict): The configuration, see the top of the file
+        timeout (float, optional): Stop a search after this many seconds. Defaults to None.
+        max_decisions (int, optional): Stop a search after this many decisions. Defaults to None.
+
+    Returns:
+        (bool, dict): (result, mapping), the result is None when this configuration has no answer
+    """
+
+    if config["solver"] == "search":
+        return search_coloring(graph, domains, order=config["order"], propagation=config["propagation"], seed=config.get("seed"),
+                               timeout=timeout, max_decisions=max_decisions)
+
+    if config["solver"] == "restart":
+        return restart_search(graph, domains, order=config["order"], schedule=config["schedule"], seed=config.get("seed", 0),
+                              timeout=timeout, max_decisions=max_decisions)
+
+    if config["solver"] == "local":
+        return local_search(graph, domains, max_steps=config["max_steps"], seed=config.get("seed", 0), timeout=timeout)
+
+    if config["solver"] == "treewidth":
+        try:
+            result = is_colorable_treewidth(graph, domains)
+        except ValueError:
+            # Too wide to build the tables
+            return None, {}
+        return (False, {}) if not result else (None, {})
+
+    raise ValueError(f"Unknown solver {config['solver']}")
+
+def _run_config(config: dict, timeout: float, max_decisions: int) -> tuple[str, bool, dict, float]:
+    """ Runs a configuration on the snapshot of the pool, returning its name, result, mapping and how many seconds it took """
+
+    start = time.perf_counter()
+    graph, domains = get_snapshot()
+    result, mapping = run_config(graph, dict(domains), config, timeout=timeout, max_decisions=max_decisions)
+    return config["name"], result, mapping, time.perf_counter() - start
+
+def solve_portfolio(graph: nx.Graph, domains: dict = None, configs: list[dict] = None, workers: int = None,
+                    timeout: float = None, max_decisions: int = None, cancel: CancelToken = None) -> tuple[bool, dict, str, float]:
+    """ Races the configurations and returns the first definitive answer, the rest are terminated
+
+    Args:
+        graph (nx.Graph): The graph to solve
+        domains (dict, optional): Bitmask of the colors each node can be, like computer.domains. Defaults to None.
+        configs (list[dict], optional): The configurations to race. Defaults to PORTFOLIO_CONFIGS.
+        workers (int, optional): The most processes to use, configurations past this wait for a free one. Defaults to the number of CPUs.
+        timeout (float, optional): Stop the race after this many seconds. Defaults to None.
+        max_decisions (int, optional): Stop each search after this many decisions. Defaults to None.
+        cancel (CancelToken, optional): Stop the race when this is cancelled. Defaults to None.
+
+    Returns:
+        (bool, dict, str, float): (result, mapping, the name of the winning configuration, how many seconds it took)
+            UNKNOWN (None) with no winner if no configuration gave an answer before the limits ran out,
+            the mapping is then the largest partial coloring a search sent back
+    """
+
+    start = time.perf_counter()
+    configs = configs or PORTFOLIO_CONFIGS
+    workers = min(workers or os.cpu_count() or 1, len(configs))
+
+    def stop():
+        return (cancel is not None and cancel.cancelled) or (timeout is not None and time.perf_counter() - start > timeout + LATE_SECONDS)
+
+    # Only a search stops with a partial coloring that has no conflicts, local search gives a full one with conflicts
+    partial = {config["name"] for config in configs if config["solver"] in ("search", "restart")}
+    best = {}
+
+    with snapshot_pool(graph, domains, workers) as pool:
+        jobs = [pool.apply_async(_run_config, (config, timeout, max_decisions)) for config in configs]
+
+        # After the race is stopped, the configurations that finished in the meantime are still looked at
+        late = (job.get() for job in jobs if job.ready())
+        for name, result, mapping, seconds in itertools.chain(as_completed(jobs, stop=stop), late):
+            if result is not None:
+                # Leaving the pool terminates the configurations that are still running
+                logger.info("Portfolio won by %s in %.4f seconds (%s, %d nodes)", name, seconds, "colorable" if result else "not colorable", len(graph.nodes()))
+                return result, mapping, name, seconds
+            if name in partial and len(mapping) > len(best):
+                best = mapping
+
+    seconds = time.perf_counter() - start
+    logger.info("Portfolio gave no answer in %.4f seconds (%d nodes)", seconds, len(graph.nodes()))
+    return UNKNOWN, best, None, seconds
+
+# Test functions
+def test_run_config():
+    """ Test that every configuration agrees on small graphs, the DP only answers when there is no coloring and local search only when there is one """
+    for graph, expected in [(nx.petersen_graph(), True), (nx.wheel_graph(6), False)]:
+        for config in PORTFOLIO_CONFIGS:
+            if config["solver"] == "local":
+                config = dict(config, max_steps=1000)
+            result, _ = run_config(graph, {}, config)
+            if config["solver"] == "treewidth":
+                assert result is (None if expected else False), "The DP can only prove there is no coloring"
+            elif config["solver"] == "local" and not expected:
+                assert result is None, "Local search can only find a coloring"
+            else:
+                assert result == expected, f"{config['name']} is wrong"
+
+def test_solve_portfolio():
+    """ Test racing the configurations on a computer, and that the computer logs the winner """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+
+    computer = NPComputer(solver="portfolio")
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 6)
+
+    result, mapping = computer.get_result_mapping()
+    assert result is True and sorted(computer.read_values(mapping, a, b)) == [2, 3]
+    assert all(mapping[u] != mapping[v] for u, v in computer.graph.edges())
+    assert len(computer.portfolio_log) == 1
+    assert computer.portfolio_log[0]["winner"] in [config["name"] for config in PORTFOLIO_CONFIGS]
+
+    result, _, winner, _ = solve_portfolio(nx.wheel_graph(6), workers=2)
+    assert result is False and winner in [config["name"] for config in PORTFOLIO_CONFIGS]
+
+    # When only the DP runs and there is a coloring, nothing can give an answer
+    assert solve_portfolio(nx.petersen_graph(), configs=[PORTFOLIO_CONFIGS[-1]])[:3] == (None, {}, None), "The DP alone can not give a coloring"
+
+    # Every search runs out of decisions, and the largest partial coloring they found is given back
+    result, mapping, winner, _ = solve_portfolio(nx.wheel_graph(8), configs=PORTFOLIO_CONFIGS[:2], max_decisions=1)
+    assert result is None and winner is None and mapping
+    assert all(mapping[u] != mapping[v] for u, v in nx.wheel_graph(8).edges() if u in mapping and v in mapping)
+
+    # The searches stop themselves at the timeout and still send what they found
+    result, mapping, _, _ = solve_portfolio(nx.gnm_random_graph(104, 240, seed=0), configs=PORTFOLIO_CONFIGS[:1], timeout=0.5)
+    assert result is None and len(mapping) > 0
+
+def test_all():
+    """ Run all tests for the portfolio """
+    test_run_config()
+    test_solve_portfolio()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
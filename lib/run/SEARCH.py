@@ -0,0 +1,427 @@
+# This is a backtracking search for a 3 coloring where the order nodes are decided in and how much is propagated can be picked
+# is_colorable always decides the nodes in the order they were made, which is great when the inputs are CONSTs
+#   (each gate is decided right after its inputs) but bad for FIND, where the free VAR bits should be decided first
+# The search is a loop with an explicit stack instead of recursion, so the number of nodes is not limited by the recursion limit,
+#   and every domain change is written to a trail so backtracking only undoes what changed instead of copying every domain
+# Orders:
+#   creation - the order the nodes were made (the same order as is_colorable)
+#   degree   - the nodes with the most neighbors first
+#   dsatur   - the node with the fewest colors left first, ties go to the one with the most neighbors
+#   random   - a shuffled order
+# Propagation:
+#   forward - deciding a node removes its color from its neighbors (the same as is_colorable)
+#   full    - any node that is left with one color also removes it from its neighbors, until nothing changes
+# restart_search runs the search again with a new seed each time a run uses up its budget (a Luby or geometric schedule),
+#   keeping how many conflicts each node was in so later runs decide those nodes first
+# A timeout, a budget of decisions and a CancelToken can stop the search early, then the result is UNKNOWN (None) instead of True or False
+
+import heapq
+import random
+import threading
+import time
+
+import networkx as nx
+
+from lib.run.FINALS import SAT, UNSAT, UNKNOWN
+
+SEARCH_ORDERS = ["creation", "degree", "dsatur", "random"]
+SEARCH_PROPAGATIONS = ["forward", "full"]
+
+# The number of colors in a domain bitmask
+_SIZE = [0, 1, 1, 2, 1, 2, 2, 3]
+
+# The clock and the cancel token are only checked once every this many decisions
+_CHECK_EVERY = 256
+
+class CancelToken:
+    def __init__(self):
+        """ Lets another thread stop a solve, the solver checks it every few hundred decisions and stops with UNKNOWN """
+
+        self._event = threading.Event()
+
+    def cancel(self):
+        """ Asks every solve using this token to stop """
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+def search_coloring(graph: nx.Graph, domains: dict = None, order: str = "creation", propagation: str = "forward", seed: int = None,
+                    timeout: float = None, max_decisions: int = None, cancel: CancelToken = None, stats: dict = None,
+                    weights: dict = None) -> tuple[bool, dict]:
+    """ Searches for a 3 coloring, deciding the nodes in the given order
+
+    Args:
+        graph (nx.Graph): The graph to color
+        domains (dict, optional): Bitmask of the colors each node can start with (bit c for color c), missing nodes can be any color. Defaults to None.
+        order (str, optional): How to pick the next node to decide, one of SEARCH_ORDERS. Defaults to "creation".
+        propagation (str, optional): How much to propagate after each decision, one of SEARCH_PROPAGATIONS. Defaults to "forward".
+        seed (int, optional): Seeds the shuffle of "random", the ties of "dsatur" and the order colors are tried in
+            (without a seed the lowest color is tried first). Defaults to None.
+        timeout (float, optional): Stop after this many seconds. Defaults to None.
+        max_decisions (int, optional): Stop after trying this many colors on nodes that had a choice of colors. Defaults to None.
+        cancel (CancelToken, optional): Stop when this is cancelled. Defaults to None.
+        stats (dict, optional): Filled in with "status", "decisions", "backtracks", "depth", "stopped" and "seconds". Defaults to None.
+        weights (dict, optional): How many conflicts each node was in, "dsatur" decides the nodes with the most first (after the fewest colors left),
+            the static orders do not use it.
+            It is added to as the search goes, so passing the same dict to the next search keeps what was learned. Defaults to None.
+
+    Returns:
+        (bool, dict): (result, mapping) like is_colorable, when a limit stops the search the result is UNKNOWN (None)
+            and the mapping is the most nodes that were colored at once without a conflict
+    """
+
+    assert order in SEARCH_ORDERS, f"Unknown order {order}, use one of {SEARCH_ORDERS}"
+    assert propagation in SEARCH_PROPAGATIONS, f"Unknown propagation {propagation}, use one of {SEARCH_PROPAGATIONS}"
+
+    start = time.perf_counter()
+    deadline = start + timeout if timeout is not None else None
+    stats = stats if stats is not None else {}
+    stats.update(status=None, decisions=0, backtracks=0, depth=0, stopped=None, seconds=0.0)
+
+    nodes = sorted(graph.nodes())
+    domains = {node: (domains or {}).get(node, 0b111) for node in nodes}
+    adjacency = {node: [neighbor for neighbor in graph[node] if neighbor != node] for node in nodes}
+    full = propagation == "full"
+    rng = random.Random(seed)
+    weights = weights if weights is not None else {}
+
+    # Every change to a domain is saved as (node, old domain) so it can be undone
+    trail = []
+    assigned = set()
+    heap = []
+
+    # Each frame is [node, colors not tried yet, length of the trail before the node was decided]
+    stack = []
+
+    # The colors of the most nodes that were decided at once without a conflict
+    best = {}
+
+    def finish(result, mapping):
+        stats.update(status={SAT: "SAT", UNSAT: "UNSAT", UNKNOWN: "UNKNOWN"}[result], seconds=time.perf_counter() - start)
+        return result, mapping
+
+    def keep_best(depth):
+        if depth > stats["depth"]:
+            stats["depth"] = depth
+            best.clear()
+            best.update((frame[0], domains[frame[0]].bit_length() - 1) for frame in stack[:depth])
+
+    def push(node):
+        heapq.heappush(heap, (_SIZE[domains[node]], -weights.get(node, 0), -len(adjacency[node]), priority[node], node))
+
+    def narrow(node, new):
+        trail.append((node, domains[node]))
+        domains[node] = new
+        if heap_order and node not in assigned:
+            push(node)
+
+    def undo(mark):
+        while len(trail) > mark:
+            node, old = trail.pop()
+            domains[node] = old
+            if heap_order and node not in assigned:
+                push(node)
+
+    def remove_from_neighbors(queue):
+        """ Removes the color of each node in the queue from its neighbors, returning the node left with no colors (None if there is not one) """
+        while queue:
+            node = queue.pop()
+            color = domains[node]
+            for neighbor in adjacency[node]:
+                if domains[neighbor] & color:
+                    new = domains[neighbor] & ~color
+                    if new == 0:
+                        return neighbor
+                    narrow(neighbor, new)
+                    if full and new & (new - 1) == 0:
+                        queue.append(neighbor)
+        return None
+
+    def limit_reached():
+        decisions = stats["decisions"]
+        if max_decisions is not None and decisions >= max_decisions:
+            stats["stopped"] = "max_decisions"
+        elif decisions % _CHECK_EVERY == 0:
+            if deadline is not None and time.perf_counter() > deadline:
+                stats["stopped"] = "timeout"
+            elif cancel is not None and cancel.cancelled:
+                stats["stopped"] = "cancelled"
+        return stats["stopped"] is not None
+
+    if any(domain == 0 for domain in domains.values()):
+        return finish(UNSAT, {})
+
+    # Static orders are worked out once, dsatur keeps a heap of (colors left, -neighbors, tie break, node) that is pushed to on every change
+    heap_order = order == "dsatur"
+    if order == "creation":
+        static = nodes
+    elif order == "degree":
+        static = sorted(nodes, key=lambda node: -len(adjacency[node]))
+    elif order == "random":
+        static = list(nodes)
+        rng.shuffle(static)
+    else:
+        priority = {node: rng.random() if seed is not None else 0 for node in nodes}
+        for node in nodes:
+            push(node)
+
+    def pick():
+        if not heap_order:
+            return static[len(stack)] if len(stack) < len(static) else None
+        while heap:
+            size, _, _, _, node = heap[0]
+            if node in assigned or _SIZE[domains[node]] != size:
+                heapq.heappop(heap)
+                continue
+            return node
+        return None
+
+    if full and remove_from_neighbors([node for node in nodes if _SIZE[domains[node]] == 1]) is not None:
+        return finish(UNSAT, {})
+
+    while True:
+        node = pick()
+        if node is None:
+            stats["depth"] = len(stack)
+            return finish(SAT, {node: domains[node].bit_length() - 1 for node in nodes})
+
+        stack.append([node, domains[node], len(trail)])
+        assigned.add(node)
+
+        # Try the next color of the deepest node, going back up the stack when a node has no colors left to try
+        while stack:
+            if limit_reached():
+                keep_best(len(stack) - 1)
+                return finish(UNKNOWN, dict(best))
+
+            frame = stack[-1]
+            node, left, mark = frame
+            undo(mark)
+            if not left:
+                stack.pop()
+                assigned.discard(node)
+                if heap_order:
+                    push(node)
+                continue
+
+            # Without a seed the lowest color is tried first, with one any of the colors left
+            if seed is None or _SIZE[left] == 1:
+                color = left & -left
+            else:
+                color = rng.choice([bit for bit in (1, 2, 4) if left & bit])
+            frame[1] = left & ~color
+            # Only a real choice is a decision, a node with one color left is just colored
+            if _SIZE[domains[node]] > 1:
+                stats["decisions"] += 1
+            if domains[node] != color:
+                narrow(node, color)
+            wiped = remove_from_neighbors([node])
+            if wiped is None:
+                break
+
+            # The nodes above this one were all colored before the conflict
+            stats["backtracks"] += 1
+            keep_best(len(stack) - 1)
+            weights[node] = weights.get(node, 0) + 1
+            weights[wiped] = weights.get(wiped, 0) + 1
+        else:
+            return finish(UNSAT, {})
+
+def luby(i: int) -> int:
+    """ The i-th (from 1) term of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ... """
+
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+def restart_search(graph: nx.Graph, domains: dict = None, order: str = "dsatur", propagation: str = "full", seed: int = 0,
+                   schedule: str = "luby", base: int = 64, factor: float = 1.5,
+                   timeout: float = None, max_decisions: int = None, cancel: CancelToken = None, stats: dict = None) -> tuple[bool, dict]:
+    """ Runs search_coloring again and again with a new seed each time, each run only gets a budget of decisions
+    An unlucky early choice only costs one run instead of the whole search, and the budgets grow so a graph is always finished
+    The conflict weights are kept between runs, so each run decides the nodes that caused the most conflicts earlier
+
+    Args:
+        graph (nx.Graph): The graph to color
+        domains (dict, optional): Bitmask of the colors each node can start with, like search_coloring. Defaults to None.
+        order (str, optional): The order of each run, one of SEARCH_ORDERS. Defaults to "dsatur".
+        propagation (str, optional): The propagation of each run, one of SEARCH_PROPAGATIONS. Defaults to "full".
+        seed (int, optional): Picks the seeds of the runs. Defaults to 0.
+        schedule (str, optional): "luby" gives run i base * luby(i) decisions, "geometric" gives it base * factor^(i - 1). Defaults to "luby".
+        base (int, optional): The decisions of the first run. Defaults to 64.
+        factor (float, optional): How much each "geometric" run grows by. Defaults to 1.5.
+        timeout (float, optional): Stop after this many seconds over all the runs. Defaults to None.
+        max_decisions (int, optional): Stop after this many decisions over all the runs. Defaults to None.
+        cancel (CancelToken, optional): Stop when this is cancelled. Defaults to None.
+        stats (dict, optional): Filled in like search_coloring, with "restarts" and the decisions and backtracks of every run. Defaults to None.
+
+    Returns:
+        (bool, dict): (result, mapping), like search_coloring
+    """
+
+    assert schedule in ("luby", "geometric"), f"Unknown schedule {schedule}"
+
+    start = time.perf_counter()
+    stats = stats if stats is not None else {}
+    stats.update(status=None, decisions=0, backtracks=0, depth=0, stopped=None, seconds=0.0, restarts=0)
+
+    rng = random.Random(seed)
+    weights = {}
+    best = {}
+    run = 0
+    while True:
+        run += 1
+        budget = base * luby(run) if schedule == "luby" else int(base * factor ** (run - 1))
+        left_timeout = None if timeout is None else max(timeout - (time.perf_counter() - start), 0)
+        if max_decisions is not None:
+            budget = min(budget, max_decisions - stats["decisions"])
+
+        run_stats = {}
+        result, mapping = search_coloring(graph, domains, order=order, propagation=propagation, seed=rng.getrandbits(32),
+                                          timeout=left_timeout, max_decisions=budget, cancel=cancel, stats=run_stats, weights=weights)
+        stats["decisions"] += run_stats["decisions"]
+        stats["backtracks"] += run_stats["backtracks"]
+        if run_stats["depth"] > stats["depth"] or result is not UNKNOWN:
+            stats["depth"] = run_stats["depth"]
+            best = mapping
+
+        # Only a run that used up its own budget is restarted, anything else is the answer or a limit of the whole search
+        out_of_total = max_decisions is not None and stats["decisions"] >= max_decisions
+        if result is not UNKNOWN or run_stats["stopped"] != "max_decisions" or out_of_total:
+            stats.update(status=run_stats["status"], stopped=run_stats["stopped"], seconds=time.perf_counter() - start)
+            return result, (mapping if result is not UNKNOWN else dict(best))
+        stats["restarts"] += 1
+
+# Test functions
+def _is_proper(graph: nx.Graph, mapping: dict, domains: dict = None) -> bool:
+    return all(mapping[u] != mapping[v] for u, v in graph.edges()) and all(((domains or {}).get(node, 0b111) >> mapping[node]) & 1 for node in graph.nodes())
+
+def _brute_force(graph: nx.Graph, domains: dict = None) -> bool:
+    """ Tries every coloring, only for tiny graphs, so the search is checked against something that shares none of its code """
+    import itertools
+
+    nodes = list(graph.nodes())
+    for colors in itertools.product(range(3), repeat=len(nodes)):
+        mapping = dict(zip(nodes, colors))
+        if _is_proper(graph, mapping, domains):
+            return True
+    return False
+
+def test_search_small_graphs():
+    """ Test every order and propagation against trying every coloring on small graphs """
+    graphs = [nx.cycle_graph(5), nx.wheel_graph(6), nx.wheel_graph(7), nx.petersen_graph(), nx.complete_graph(4), nx.grid_2d_graph(3, 3)]
+    for graph in graphs:
+        graph = nx.convert_node_labels_to_integers(graph)
+        expected = _brute_force(graph)
+        for order in SEARCH_ORDERS:
+            for propagation in SEARCH_PROPAGATIONS:
+                result, mapping = search_coloring(graph, order=order, propagation=propagation, seed=1)
+                assert result == expected, f"{order} with {propagation} propagation is wrong"
+                assert not result or _is_proper(graph, mapping)
+
+    # Domains are kept to
+    domains = {0: 0b001, 1: 0b010}
+    for order in SEARCH_ORDERS:
+        result, mapping = search_coloring(nx.cycle_graph(5), domains, order=order, propagation="full")
+        assert result and _is_proper(nx.cycle_graph(5), mapping, domains)
+    assert search_coloring(nx.path_graph(2), {0: 0b001, 1: 0b001})[0] is False
+
+def test_search_matches_brute_force():
+    """ Test every order and propagation against trying every coloring on random small graphs with random domains """
+    import random
+
+    rng = random.Random(0)
+    for seed in range(40):
+        graph = nx.gnp_random_graph(rng.randint(4, 8), rng.choice([0.3, 0.5, 0.7]), seed=seed)
+        domains = {node: rng.choice([0b111, 0b111, 0b011, 0b101, 0b110, 0b001]) for node in graph.nodes()}
+        expected = _brute_force(graph, domains)
+        for order in SEARCH_ORDERS:
+            for propagation in SEARCH_PROPAGATIONS:
+                result, mapping = search_coloring(graph, domains, order=order, propagation=propagation, seed=seed)
+                assert result == expected, f"{order} with {propagation} propagation is wrong on graph {seed}"
+                assert not result or _is_proper(graph, mapping, domains)
+
+def test_search_deep_graph():
+    """ Test a FIND that is too deep for the recursion of is_colorable """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=3), VAR(computer, n=3)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 35)
+    assert computer.store.number_of_nodes() > 1000
+
+    result, mapping = search_coloring(computer.graph, computer.domains, order="dsatur", propagation="full")
+    assert result is True and _is_proper(computer.graph, mapping, computer.domains)
+    assert sorted(computer.read_values(mapping, a, b)) == [5, 7]
+
+def test_search_limits():
+    """ Test that a timeout, a budget of decisions and a cancel token stop the search with UNKNOWN and a partial coloring """
+    graph = nx.wheel_graph(12)
+
+    stats = {}
+    assert search_coloring(graph, stats=stats)[0] is False
+    assert stats["status"] == "UNSAT" and stats["stopped"] is None and stats["backtracks"] > 0
+    full_decisions = stats["decisions"]
+
+    stats = {}
+    result, partial = search_coloring(graph, max_decisions=full_decisions // 2, stats=stats)
+    assert result is UNKNOWN and stats["status"] == "UNKNOWN" and stats["stopped"] == "max_decisions"
+    assert stats["decisions"] == full_decisions // 2
+    assert len(partial) == stats["depth"] > 0, "The partial coloring should be the deepest one reached"
+    assert all(partial[u] != partial[v] for u, v in graph.edges() if u in partial and v in partial), "The partial coloring should have no conflicts"
+
+    stats = {}
+    assert search_coloring(graph, timeout=0, stats=stats)[0] is UNKNOWN and stats["stopped"] == "timeout"
+
+    cancel = CancelToken()
+    cancel.cancel()
+    stats = {}
+    assert search_coloring(graph, order="dsatur", cancel=cancel, stats=stats)[0] is UNKNOWN and stats["stopped"] == "cancelled"
+
+    # A limit that is not reached changes nothing
+    assert search_coloring(nx.petersen_graph(), timeout=60, max_decisions=10 ** 6, cancel=CancelToken())[0] is True
+
+def test_restart_search():
+    """ Test the Luby sequence, and that restarts give the same answers and keep to the limits """
+    assert [luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+    for graph, expected in [(nx.petersen_graph(), True), (nx.wheel_graph(12), False), (nx.grid_2d_graph(4, 4), True)]:
+        graph = nx.convert_node_labels_to_integers(graph)
+        for schedule in ("luby", "geometric"):
+            stats = {}
+            result, mapping = restart_search(graph, seed=3, schedule=schedule, base=2, stats=stats)
+            assert result == expected, f"Restarts with a {schedule} schedule are wrong"
+            assert not result or _is_proper(graph, mapping)
+
+    # The odd wheel needs more than one run with a tiny budget
+    stats = {}
+    assert restart_search(nx.wheel_graph(12), order="creation", base=1, stats=stats)[0] is False and stats["restarts"] > 0
+
+    stats = {}
+    result, partial = restart_search(nx.wheel_graph(12), order="creation", base=1, max_decisions=20, stats=stats)
+    assert result is UNKNOWN and stats["decisions"] == 20 and stats["stopped"] == "max_decisions"
+    assert len(partial) == stats["depth"]
+
+    # Each seed gives the same result every time
+    graph = nx.convert_node_labels_to_integers(nx.grid_2d_graph(4, 4))
+    assert restart_search(graph, seed=7) == restart_search(graph, seed=7)
+
+def test_all():
+    """ Run all tests for the search """
+    test_search_small_graphs()
+    test_search_matches_brute_force()
+    test_search_deep_graph()
+    test_search_limits()
+    test_restart_search()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
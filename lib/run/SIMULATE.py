@@ -0,0 +1,194 @@
+# This runs the logic gates of a computer directly instead of solving the coloring
+# When every input is known the outputs just follow from what the gates do, so there is nothing to search for
+# Each bit is a NumPy array of uint64 words, one bit of a word per input vector, so one pass over the gates runs
+#   64 input vectors per word (and as many words as needed for the batch)
+# It only uses computer.netlist and computer.domains, never the networkx graph, so it is fast enough to label datasets
+#   and to cross-check the graph solvers
+# Only the gates the outputs depend on are run (see fan_in in CONE.py), so the rest of the computer can have other free VARs
+# NOTE: Only gates that are in the netlist can be simulated (NOT, AND and everything built from them, and MUX)
+#   nodes from the IF layer can be X so they are not logic and can not be simulated
+
+import numpy as np
+
+from lib.run.INIT import NPComputer
+from lib.run.CONE import fan_in
+from lib.run.FINALS import TriBit, TRI_BIT_TO_NODE
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """ Packs an array of 0/1 (one per input vector) into uint64 words """
+
+    words = (len(bits) + 63) // 64
+    padded = np.zeros(words * 64, dtype=np.uint8)
+    padded[:len(bits)] = bits
+    return np.packbits(padded, bitorder="little").view(np.uint64)
+
+def _unpack(words: np.ndarray, batch: int) -> np.ndarray:
+    """ Unpacks uint64 words back into an array of 0/1 with one entry per input vector """
+
+    return np.unpackbits(words.view(np.uint8), bitorder="little")[:batch]
+
+def simulate(computer: NPComputer, inputs: dict, outputs: list) -> list[np.ndarray]:
+    """ Evaluates the gates of the computer for a batch of input vectors
+
+    Args:
+        computer (NPComputer): The computer to simulate
+        inputs (dict): {VAR/MEM or bit node: array of values}, one value per input vector (all the same length)
+            Bits the outputs depend on that are not inputs or gate outputs must be constants (like the bits of a CONST)
+        outputs (list): The MEMs (or bit nodes) to read
+
+    Returns:
+        list[np.ndarray]: The values of each output for every input vector (dtype object if an output has more than 63 bits)
+    """
+
+    batch = len(next(iter(inputs.values()))) if inputs else 1
+    words = (batch + 63) // 64
+    zeros = np.zeros(words, dtype=np.uint64)
+    ones = ~zeros
+    one, zero = 1 << TRI_BIT_TO_NODE[TriBit.ONE], 1 << TRI_BIT_TO_NODE[TriBit.ZERO]
+
+    values = {}
+    for key, key_values in inputs.items():
+        key_values = np.asarray(key_values, dtype=object)
+        assert len(key_values) == batch, "Every input needs one value per input vector"
+        bits = [key] if isinstance(key, int) else list(key.bits)
+        for i, bit in enumerate(bits):
+            values[bit] = _pack(np.array([(value >> i) & 1 for value in key_values], dtype=np.uint8))
+
+    def value_of(node: int) -> np.ndarray:
+        if node not in values:
+            # A node that is not driven by anything has to be a constant
+            domain = computer.domains[node]
+            assert domain in (one, zero), f"Node {node} is not an input, a gate output or a constant so it can not be simulated"
+            values[node] = ones if domain == one else zeros
+        return values[node]
+
+    output_bits = [bit for output in outputs for bit in ([output] if isinstance(output, int) else output.bits)]
+    for index in fan_in(computer, output_bits, stop=values):
+        gate, out, ins = computer.netlist[index]
+        if gate == "NOT":
+            values[out] = ~value_of(ins[0])
+        elif gate == "AND":
+            values[out] = value_of(ins[0]) & value_of(ins[1])
+        elif gate == "MUX":
+            sel = value_of(ins[0])
+            values[out] = (sel & value_of(ins[1])) | (~sel & value_of(ins[2]))
+        else:
+            raise ValueError(f"Unknown gate {gate}")
+
+    results = []
+    for output in outputs:
+        bits = [output] if isinstance(output, int) else list(output.bits)
+        if len(bits) < 64:
+            result = np.zeros(batch, dtype=np.uint64)
+            for i, bit in enumerate(bits):
+                result |= _unpack(value_of(bit), batch).astype(np.uint64) << np.uint64(i)
+        else:
+            # Too many bits for a uint64, so use python ints
+            result = np.zeros(batch, dtype=object)
+            for i, bit in enumerate(bits):
+                result += _unpack(value_of(bit), batch).astype(object) * (1 << i)
+        results.append(result)
+    return results
+
+def cross_check(computer: NPComputer, inputs: dict, outputs: list) -> bool:
+    """ Checks that solving with the inputs as assumptions gives the same outputs as simulating the gates
+
+    Args:
+        computer (NPComputer): The computer to check
+        inputs (dict): {VAR/MEM or bit node: array of values}, like simulate
+        outputs (list): The MEMs to compare (not bit nodes)
+
+    Returns:
+        bool: True if the solver agrees with the simulator for every input vector
+    """
+
+    expected = simulate(computer, inputs, outputs)
+    batch = len(expected[0]) if expected else 0
+    for i in range(batch):
+        result, mapping = computer.solve({key: int(key_values[i]) for key, key_values in inputs.items()})
+        if not result:
+            return False
+        solved = computer.read_values(mapping, *outputs)
+        if any(solved[j] != int(expected[j][i]) for j in range(len(outputs))):
+            return False
+    return True
+
+# Test functions
+def test_simulate_gates():
+    """ Test every gate against python for every input """
+    from lib.run.VAR import VAR
+    from lib.binary_logic.AND import AND
+    from lib.binary_logic.OR import OR
+    from lib.binary_logic.XOR import XOR
+    from lib.binary_logic.NAND import NAND
+    from lib.binary_logic.NOR import NOR
+    from lib.binary_logic.XNOR import XNOR
+    from lib.binary_logic.NOT import NOT
+
+    computer = NPComputer()
+    x, y = VAR(computer, n=1).bits[0], VAR(computer, n=1).bits[0]
+    gates = {
+        "AND": (AND(computer, x, y), lambda a, b: a & b),
+        "OR": (OR(computer, x, y), lambda a, b: a | b),
+        "XOR": (XOR(computer, x, y), lambda a, b: a ^ b),
+        "NAND": (NAND(computer, x, y), lambda a, b: 1 - (a & b)),
+        "NOR": (NOR(computer, x, y), lambda a, b: 1 - (a | b)),
+        "XNOR": (XNOR(computer, x, y), lambda a, b: 1 - (a ^ b)),
+        "NOT": (NOT(computer, x), lambda a, b: 1 - a),
+    }
+    x_values, y_values = [0, 0, 1, 1], [0, 1, 0, 1]
+    results = simulate(computer, {x: x_values, y: y_values}, [out for out, _ in gates.values()])
+    for (name, (_, expected)), result in zip(gates.items(), results):
+        assert list(result) == [expected(a, b) for a, b in zip(x_values, y_values)], f"{name} was simulated wrong"
+
+def test_simulate_ADD_batch():
+    """ Test simulating every pair of 4 bit operands of an ADD in one pass, with more than 64 vectors """
+    from lib.run.VAR import VAR
+    from lib.run.CONST import CONST
+    from lib.calculator_logic.ADD import ADD
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=4), VAR(computer, n=4)
+    total, carry = ADD(computer, a, b)
+    a_values = np.repeat(np.arange(16), 16)
+    b_values = np.tile(np.arange(16), 16)
+    total_values, carry_values = simulate(computer, {a: a_values, b: b_values}, [total, carry])
+
+    assert list(total_values + 16 * carry_values) == list(a_values + b_values), "Simulated ADD is wrong"
+
+    # Constants do not need to be given as inputs
+    computer = NPComputer()
+    total, carry = ADD(computer, CONST(computer, value=9, n=4), CONST(computer, value=12, n=4))
+    assert [int(v[0]) for v in simulate(computer, {}, [total, carry])] == [5, 1]
+
+    # Only the gates the outputs depend on are run, so a free VAR somewhere else does not need an input
+    computer = NPComputer()
+    a, b = VAR(computer, n=3), VAR(computer, n=3)
+    total, _ = ADD(computer, a, b)
+    ADD(computer, VAR(computer, n=3), b)
+    assert [int(v) for v in simulate(computer, {a: [1, 7], b: [2, 3]}, [total])[0]] == [3, 2]
+
+def test_cross_check():
+    """ Test that the solver and the simulator agree on a MUL and a MUX """
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.MUX import MUX
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    sel = VAR(computer, n=1)
+    picked = MUX(computer, sel.bits[0], a, b)
+
+    inputs = {a: [0, 1, 2, 3, 3, 2], b: [3, 3, 1, 2, 3, 0], sel: [0, 1, 0, 1, 1, 0]}
+    assert cross_check(computer, inputs, [product, picked])
+
+def test_all():
+    """ Run all tests for the simulator """
+    test_simulate_gates()
+    test_simulate_ADD_batch()
+    test_cross_check()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
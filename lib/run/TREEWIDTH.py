@@ -0,0 +1,287 @@
+# This solves the graph by dynamic programming over a tree decomposition instead of backtracking
+# Circuits (like a ripple carry ADD or a chain of gates) have a small treewidth even when they have a lot of nodes,
+#   so this is linear in the size of the graph for them, and it can count every coloring instead of finding just one
+# The tree decomposition comes from an elimination order (min-fill or min-degree), each node's bag is itself and the
+#   neighbors it has when it is eliminated, and the DP table of a bag is a NumPy array with one axis of 3 colors per node
+# Nodes that can only be one color (like the tri-bit nodes, or anything propagated from them) are not part of the DP,
+#   their color is just removed from their neighbors first, so the tri-bit nodes do not connect the whole graph together
+
+import heapq
+import itertools
+import networkx as nx
+import numpy as np
+
+ELIMINATION_HEURISTICS = ["min_fill", "min_degree"]
+
+# This is the largest bag that a table will be made for, a table has 3^(width + 1) entries
+DEFAULT_MAX_WIDTH = 12
+
+# The table for an edge, the two ends can not be the same color
+NOT_EQUAL = 1 - np.eye(3, dtype=np.int64)
+
+def _fill_in(adjacency: dict, node) -> int:
+    """ The number of edges that eliminating a node would add between its neighbors """
+
+    neighbors = list(adjacency[node])
+    return sum(1 for i, u in enumerate(neighbors) for v in neighbors[i + 1:] if v not in adjacency[u])
+
+def elimination_order(graph: nx.Graph, heuristic: str = "min_fill") -> tuple[list, int]:
+    """ Finds an order to eliminate the nodes in, which gives a tree decomposition
+
+    Args:
+        graph (nx.Graph): The graph to order
+        heuristic (str, optional): One of ELIMINATION_HEURISTICS, min_fill usually gives smaller bags. Defaults to "min_fill".
+
+    Returns:
+        list, int: The nodes in elimination order and the width of the tree decomposition (largest bag size - 1)
+    """
+
+    assert heuristic in ELIMINATION_HEURISTICS, f"Unknown heuristic {heuristic}, must be one of {ELIMINATION_HEURISTICS}"
+    score = _fill_in if heuristic == "min_fill" else (lambda adjacency, node: len(adjacency[node]))
+
+    adjacency = {node: set(graph.neighbors(node)) - {node} for node in graph.nodes()}
+    tiebreak = {node: i for i, node in enumerate(graph.nodes())}
+    scores = {node: score(adjacency, node) for node in adjacency}
+    heap = [(scores[node], tiebreak[node], node) for node in adjacency]
+    heapq.heapify(heap)
+
+    order = []
+    width = 0
+    while heap:
+        node_score, _, node = heapq.heappop(heap)
+        # Skip entries that are out of date
+        if node not in adjacency or node_score != scores[node]:
+            continue
+
+        neighbors = adjacency.pop(node)
+        order.append(node)
+        width = max(width, len(neighbors))
+
+        # The neighbors become a clique, which is the bag of this node
+        for u in neighbors:
+            adjacency[u].discard(node)
+            adjacency[u] |= neighbors - {u}
+
+        # Only the scores near the eliminated node can change
+        changed = set(neighbors)
+        if heuristic == "min_fill":
+            for u in neighbors:
+                changed |= adjacency[u]
+        for u in changed:
+            new_score = score(adjacency, u)
+            if new_score != scores[u]:
+                scores[u] = new_score
+                heapq.heappush(heap, (new_score, tiebreak[u], u))
+
+    return order, width
+
+def tree_decomposition(graph: nx.Graph, heuristic: str = "min_fill") -> tuple[list, list, int]:
+    """ Makes a tree decomposition of the graph from an elimination order
+
+    Args:
+        graph (nx.Graph): The graph to decompose
+        heuristic (str, optional): One of ELIMINATION_HEURISTICS. Defaults to "min_fill".
+
+    Returns:
+        list, list, int: The bags (sets of nodes), the index of each bag's parent (None for roots) and the width
+    """
+
+    order, width = elimination_order(graph, heuristic)
+    position = {node: i for i, node in enumerate(order)}
+
+    adjacency = {node: set(graph.neighbors(node)) - {node} for node in graph.nodes()}
+    bags, parents = [], []
+    for node in order:
+        later = {u for u in adjacency[node] if position[u] > position[node]}
+        bags.append({node} | later)
+        # The parent is the bag of the first of the later neighbors to be eliminated
+        parents.append(min((position[u] for u in later), default=None))
+        for u in later:
+            adjacency[u] |= later - {u}
+
+    return bags, parents, width
+
+def _align(table: np.ndarray, scope: tuple, full_scope: tuple) -> np.ndarray:
+    """ Reorders the axes of a table to follow full_scope, with size 1 axes for nodes it does not have """
+
+    table = np.transpose(table, sorted(range(len(scope)), key=lambda i: full_scope.index(scope[i])))
+    shape = [3 if node in scope else 1 for node in full_scope]
+    return table.reshape(shape)
+
+def _reduce_domains(graph: nx.Graph, domains: dict) -> tuple[nx.Graph, dict]:
+    """ Removes the nodes that can only be one color, taking their color out of their neighbors' domains
+
+    Returns:
+        nx.Graph, dict: The graph of the nodes that are left and their domains (None if some node has no colors left)
+    """
+
+    domains = {node: domains.get(node, 0b111) for node in graph.nodes()}
+    if 0 in domains.values():
+        return graph, None
+    decided = [node for node, domain in domains.items() if domain & (domain - 1) == 0]
+    while decided:
+        node = decided.pop()
+        for neighbor in graph.neighbors(node):
+            if domains[neighbor] & domains[node]:
+                domains[neighbor] &= ~domains[node]
+                if domains[neighbor] == 0:
+                    return graph, None
+                if domains[neighbor] & (domains[neighbor] - 1) == 0:
+                    decided.append(neighbor)
+
+    undecided = [node for node, domain in domains.items() if domain & (domain - 1)]
+    return graph.subgraph(undecided), {node: domains[node] for node in undecided}
+
+def _eliminate(graph: nx.Graph, domains: dict, heuristic: str, max_width: int, count: bool):
+    """ Runs the DP over the bags of the elimination order, the table made when a node is eliminated is its bag's table
+
+    Returns:
+        int | bool: The number of colorings if count is True, otherwise whether there is one
+    """
+
+    order, width = elimination_order(graph, heuristic)
+    if width > max_width:
+        raise ValueError(f"The tree decomposition has width {width}, which is more than the max width {max_width}")
+
+    dtype = object if count else bool
+
+    # Every node starts with a table of its colors, and every edge has a table that its ends are not equal
+    tables = [((node,), np.array([(domains[node] >> color) & 1 for color in range(3)], dtype=dtype)) for node in order]
+    tables += [((u, v), NOT_EQUAL.astype(dtype)) for u, v in graph.edges() if u != v]
+
+    # Each table waits at the first of its nodes to be eliminated
+    position = {node: i for i, node in enumerate(order)}
+    buckets = [[] for _ in order]
+    for scope, table in tables:
+        buckets[min(position[node] for node in scope)].append((scope, table))
+
+    result = 1 if count else True
+    for i, node in enumerate(order):
+        bucket = buckets[i]
+        full_scope = (node,) + tuple(sorted({u for scope, _ in bucket for u in scope} - {node}, key=position.get))
+
+        table = None
+        for scope, other in bucket:
+            other = _align(other, scope, full_scope)
+            table = other if table is None else table * other
+
+        # Sum over the colors of the eliminated node (or any for deciding)
+        table = table.sum(axis=0) if count else table.any(axis=0)
+        scope = full_scope[1:]
+        if not scope:
+            result = result * table if count else (result and bool(table))
+            if not count and not result:
+                return False
+            continue
+        buckets[position[scope[0]]].append((scope, table))
+
+    return int(result) if count else bool(result)
+
+def count_colorings(graph: nx.Graph, domains: dict = None, heuristic: str = "min_fill", max_width: int = DEFAULT_MAX_WIDTH) -> int:
+    """ Counts the 3 colorings of a graph
+
+    Args:
+        graph (nx.Graph): The graph to count the colorings of
+        domains (dict, optional): A bitmask of the colors each node can be (bit c for color c), missing nodes can be any color. Defaults to None.
+        heuristic (str, optional): One of ELIMINATION_HEURISTICS. Defaults to "min_fill".
+        max_width (int, optional): Raise a ValueError instead of making tables for bags bigger than this. Defaults to DEFAULT_MAX_WIDTH.
+
+    Returns:
+        int: The number of colorings
+    """
+
+    graph, domains = _reduce_domains(graph, domains or {})
+    if domains is None:
+        return 0
+    return _eliminate(graph, domains, heuristic, max_width, count=True)
+
+def is_colorable_treewidth(graph: nx.Graph, domains: dict = None, heuristic: str = "min_fill", max_width: int = DEFAULT_MAX_WIDTH) -> bool:
+    """ Checks if a graph is 3 colorable, see count_colorings for the arguments """
+
+    graph, domains = _reduce_domains(graph, domains or {})
+    if domains is None:
+        return False
+    return _eliminate(graph, domains, heuristic, max_width, count=False)
+
+# Test functions
+def _brute_force_count(graph: nx.Graph) -> int:
+    nodes = list(graph.nodes())
+    count = 0
+    for colors in itertools.product(range(3), repeat=len(nodes)):
+        coloring = dict(zip(nodes, colors))
+        count += all(coloring[u] != coloring[v] for u, v in graph.edges())
+    return count
+
+def test_count_small_graphs():
+    """ Test the counts against brute force and known chromatic polynomials """
+    assert count_colorings(nx.cycle_graph(5)) == 2 ** 5 - 2, "C5 has (k-1)^n - (k-1) colorings"
+    assert count_colorings(nx.complete_graph(4)) == 0, "K4 can not be 3 colored"
+    assert count_colorings(nx.petersen_graph()) == 120, "The Petersen graph has 120 3 colorings"
+    assert count_colorings(nx.empty_graph(3)) == 27
+
+    for seed in range(10):
+        graph = nx.gnp_random_graph(7, 0.4, seed=seed)
+        for heuristic in ELIMINATION_HEURISTICS:
+            assert count_colorings(graph, heuristic=heuristic) == _brute_force_count(graph), f"Wrong count for random graph {seed}"
+            assert is_colorable_treewidth(graph, heuristic=heuristic) == (_brute_force_count(graph) > 0)
+
+def test_count_with_domains():
+    """ Test that domains restrict the colors and decided nodes are taken out first """
+    graph = nx.path_graph(3)
+    assert count_colorings(graph, domains={0: 0b001}) == 4
+    assert count_colorings(graph, domains={0: 0b001, 2: 0b001}) == 2
+    assert count_colorings(graph, domains={0: 0b001, 1: 0b001}) == 0
+    assert is_colorable_treewidth(graph, domains={0: 0b001, 1: 0b001}) is False
+
+def test_tree_decomposition():
+    """ Test that the bags cover every edge and a path has width 1 """
+    graph = nx.petersen_graph()
+    bags, parents, width = tree_decomposition(graph)
+    assert all(any({u, v} <= bag for bag in bags) for u, v in graph.edges()), "Every edge should be in some bag"
+    assert width == max(len(bag) for bag in bags) - 1
+    assert all(parent is None or parent > i for i, parent in enumerate(parents)), "Parents come later in the order"
+
+    assert tree_decomposition(nx.path_graph(50))[2] == 1, "A path has width 1"
+    assert elimination_order(nx.grid_2d_graph(4, 4), heuristic="min_degree")[1] >= 4, "A 4x4 grid has width 4"
+
+def test_too_wide():
+    """ Test that a graph that is too wide raises instead of making huge tables """
+    try:
+        count_colorings(nx.complete_graph(6), max_width=3)
+    except ValueError:
+        return
+    assert False, "K6 has width 5 so it should be too wide"
+
+def test_count_circuit():
+    """ Test counting the FIND solutions of a ripple carry ADD, which has a small width however many bits it has """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.ADD import ADD
+    from lib.execution_control.BREAK import BREAK
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    total, carry = ADD(computer, a, b)
+    assert computer.count_solutions() == 16, "There should be exactly one coloring for each of the 16 inputs"
+
+    # Only the inputs with a + b < 4 are left
+    BREAK(computer, carry)
+    assert computer.count_solutions() == 10
+    assert is_colorable_treewidth(computer.graph, computer.domains) is True
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=16), VAR(computer, n=16)
+    ADD(computer, a, b)
+    assert computer.count_solutions(heuristic="min_degree") == 2 ** 32, "A 16 bit ADD should be counted without a big table"
+
+def test_all():
+    """ Run all tests for the tree decomposition solver """
+    test_count_small_graphs()
+    test_count_with_domains()
+    test_tree_decomposition()
+    test_too_wide()
+    test_count_circuit()
+
+if __name__ == "__main__":
+    test_all()
+    print("All tests passed!")
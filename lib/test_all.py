@@ -1,9 +1,42 @@
 # This is a script to test all the components of the library
 def test_all():
 
+    from lib.run import GRAPH_STORE
+    GRAPH_STORE.test_all()
+
     from lib.run import IS_COLORABLE
     IS_COLORABLE.test_all()
 
+    from lib.run import TREEWIDTH
+    TREEWIDTH.test_all()
+
+    from lib.run import SEARCH
+    SEARCH.test_all()
+
+    from lib.run import LOCAL_SEARCH
+    LOCAL_SEARCH.test_all()
+
+    from lib.run import KERNEL
+    KERNEL.test_all()
+
+    from lib.run import CONE
+    CONE.test_all()
+
+    from lib.run import CONTRACT
+    CONTRACT.test_all()
+
+    from lib.run import CACHE
+    CACHE.test_all()
+
+    from lib.run import COMPONENTS
+    COMPONENTS.test_all()
+
+    from lib.run import CUBE
+    CUBE.test_all()
+
+    from lib.run import PORTFOLIO
+    PORTFOLIO.test_all()
+
     from lib.run import INIT
     INIT.test_all()
 
@@ -40,15 +73,39 @@ def test_all():
     from lib.run.MEM import test_all
     test_all()
 
+    from lib.run.SIMULATE import test_all
+    test_all()
+
+    from lib.run.BATCH_SOLVE import test_all
+    test_all()
+
     from lib.calculator_logic.ADD import test_all
     test_all()
 
+    from lib.calculator_logic.MUL import test_all
+    test_all()
+
+    from lib.calculator_logic.SUB import test_all
+    test_all()
+
+    from lib.calculator_logic.DIV import test_all
+    test_all()
+
+    from lib.calculator_logic.COMPARE import test_all
+    test_all()
+
     from lib.execution_control.IF import test_all
     test_all()
 
+    from lib.execution_control.MUX import test_all
+    test_all()
+
     from lib.execution_control.BREAK import test_all
     test_all()
 
+    from lib.execution_control.ASSERT import test_all
+    test_all()
+
     from lib.test_dimacs_export import test_all
     test_all()
 
@@ -52,8 +52,8 @@ def test_dimacs_export():
 
     dimacs_output = computer3()
     print(f"Complex graph stats:")
-    print(f"  Nodes: {len(computer3.graph.nodes())}")
-    print(f"  Edges: {len(computer3.graph.edges())}")
+    print(f"  Nodes: {computer3.store.number_of_nodes()}")
+    print(f"  Edges: {computer3.store.number_of_edges()}")
     print("✓ Exported to complex_graph.col\n")
 
     # Test 4: Solve the same complex graph
@@ -38,6 +38,251 @@ def test_speed():
     print(f"Memory increase: {memory_used:.2f} MB")
     print(f"Average time per operation: {elapsed_time:.6f} seconds")
 
+def _build_MUX(n):
+    """ Builds a true n bit if/else with the native MUX """
+    from lib.run.INIT import NPComputer
+    from lib.run.FINALS import TriBit
+    from lib.run.VAR import VAR
+    from lib.execution_control.MUX import MUX
+
+    computer = NPComputer()
+    sel = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    a, b = VAR(computer, n=n), VAR(computer, n=n)
+    MUX(computer, sel, a, b)
+    return computer
+
+def _build_IF_layers(n):
+    """ Builds the two IF layers an n bit if/else needs (a gated by sel and b gated by NOT sel), not counting the glue to join them """
+    from lib.run.INIT import NPComputer
+    from lib.run.FINALS import TriBit
+    from lib.run.VAR import VAR
+    from lib.binary_logic.NOT import NOT
+    from lib.execution_control.IF import generate_IF_layer
+
+    computer = NPComputer()
+    sel = computer.generate_node(allow={TriBit.ZERO, TriBit.ONE})
+    a, b = VAR(computer, n=n), VAR(computer, n=n)
+    generate_IF_layer(computer, a.bits, sel)
+    generate_IF_layer(computer, b.bits, NOT(computer, sel))
+    return computer
+
+def test_speed_MUX(bit_lengths=(8, 16, 32, 64)):
+    """ Compares the size and solve time of the native MUX with the IF layer approach """
+    print("MUX vs IF layers (nodes / edges / solve time)")
+    print("-" * 50)
+
+    for n in bit_lengths:
+        for name, build in [("MUX", _build_MUX), ("IF layers", _build_IF_layers)]:
+            computer = build(n)
+            start_time = time.time()
+            is_solvable, _ = computer.get_result_mapping()
+            elapsed_time = time.time() - start_time
+
+            assert is_solvable is True, f"{name} on {n} bits should be colorable"
+            print(f"{n:>3} bits {name:<10}: {computer.store.number_of_nodes():>5} nodes, {computer.store.number_of_edges():>5} edges, {elapsed_time:.4f} seconds")
+
+def test_speed_assumptions(n=4):
+    """ Compares rebuilding an n bit ADD with CONST inputs for every pair of operands to building it once and using solve_batch """
+    from lib.run.INIT import NPComputer
+    from lib.run.CONST import CONST
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.ADD import ADD
+
+    pairs = [(a_val, b_val) for a_val in range(2 ** n) for b_val in range(2 ** n)]
+
+    start_time = time.time()
+    for a_val, b_val in pairs:
+        computer = NPComputer()
+        total, _ = ADD(computer, CONST(computer, value=a_val, n=n), CONST(computer, value=b_val, n=n))
+        assert computer.find(total) == (a_val + b_val) % 2 ** n
+    rebuild_time = time.time() - start_time
+
+    start_time = time.time()
+    computer = NPComputer()
+    a, b = VAR(computer, n=n), VAR(computer, n=n)
+    total, _ = ADD(computer, a, b)
+    results = computer.solve_batch([{a: a_val, b: b_val} for a_val, b_val in pairs])
+    for (a_val, b_val), (result, mapping) in zip(pairs, results):
+        assert result and computer.read_values(mapping, total)[0] == (a_val + b_val) % 2 ** n
+    batch_time = time.time() - start_time
+
+    # The same sets all at once with the lockstep batch solver, which propagates every instance over the whole graph
+    from lib.run.BATCH_SOLVE import solve_assumptions_batch
+    computer = NPComputer()
+    a, b = VAR(computer, n=n), VAR(computer, n=n)
+    total, _ = ADD(computer, a, b)
+    start_time = time.time()
+    results = solve_assumptions_batch(computer, [{a: a_val, b: b_val} for a_val, b_val in pairs])
+    assert all(result and computer.read_values(mapping, total)[0] == (a_val + b_val) % 2 ** n for (a_val, b_val), (result, mapping) in zip(pairs, results))
+    lockstep_time = time.time() - start_time
+
+    print(f"{len(pairs)} {n} bit ADDs: rebuilt with CONSTs {rebuild_time:.4f} seconds, solve_batch {batch_time:.4f} seconds, solve_assumptions_batch {lockstep_time:.4f} seconds")
+
+def test_speed_batch(n=4):
+    """ Compares looping is_colorable over every n bit adder graph to solving them all at once with the batch solver """
+    from lib.run.INIT import NPComputer
+    from lib.run.CONST import CONST
+    from lib.run.VAR import VAR
+    from lib.run.IS_COLORABLE import is_colorable
+    from lib.run.BATCH_SOLVE import solve_assumptions_batch
+    from lib.calculator_logic.ADD import ADD
+
+    pairs = [(a_val, b_val) for a_val in range(2 ** n) for b_val in range(2 ** n)]
+
+    graphs = []
+    for a_val, b_val in pairs:
+        computer = NPComputer()
+        ADD(computer, CONST(computer, value=a_val, n=n), CONST(computer, value=b_val, n=n))
+        graphs.append(computer.graph)
+    start_time = time.time()
+    assert all(is_colorable(graph)[0] for graph in graphs)
+    loop_time = time.time() - start_time
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=n), VAR(computer, n=n)
+    total, _ = ADD(computer, a, b)
+    start_time = time.time()
+    results = solve_assumptions_batch(computer, [{a: a_val, b: b_val} for a_val, b_val in pairs])
+    batch_time = time.time() - start_time
+    assert all(result and computer.read_values(mapping, total)[0] == (a_val + b_val) % 2 ** n for (a_val, b_val), (result, mapping) in zip(pairs, results))
+
+    print(f"{len(pairs)} {n} bit adders: is_colorable loop {len(pairs) / loop_time:.1f} instances/second, batch {len(pairs) / batch_time:.1f} instances/second")
+
+def test_speed_cubes(ks=(0, 1, 2, 3), workers=None):
+    """ Times cube-and-conquer on a 2x2 bit factoring FIND for each number of branching bits, to tune k for the number of CPUs """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.run.CUBE import find_parallel
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=2), VAR(computer, n=2)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 6)
+
+    for k in ks:
+        start_time = time.time()
+        values, timings = find_parallel(computer, a, b, k=k, workers=workers)
+        elapsed_time = time.time() - start_time
+        assert values in [(2, 3), (3, 2)]
+        cube_times = [timing["seconds"] for timing in timings]
+        print(f"k={k}: {elapsed_time:.4f} seconds, {len(timings)} of {2 ** k} cubes finished, slowest cube {max(cube_times):.4f} seconds")
+
+def test_speed_restarts(seeds=range(20)):
+    """ Compares the spread of decisions and time across seeds with and without restarts, on a FIND for the factors of 899 """
+    import statistics
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.run.SEARCH import search_coloring, restart_search
+    from lib.calculator_logic.MUL import MUL
+    from lib.execution_control.ASSERT import ASSERT_EQ
+
+    computer = NPComputer()
+    a, b = VAR(computer, n=5), VAR(computer, n=5)
+    product, _ = MUL(computer, a, b)
+    ASSERT_EQ(computer, product, 899)
+
+    runs = {
+        "random order, one run": lambda seed, stats: search_coloring(computer.graph, computer.domains, order="random", propagation="full", seed=seed, stats=stats),
+        "random order, luby": lambda seed, stats: restart_search(computer.graph, computer.domains, order="random", seed=seed, stats=stats),
+        "random order, geometric": lambda seed, stats: restart_search(computer.graph, computer.domains, order="random", schedule="geometric", seed=seed, stats=stats),
+        "dsatur, one run": lambda seed, stats: search_coloring(computer.graph, computer.domains, order="dsatur", propagation="full", seed=seed, stats=stats),
+        "dsatur, luby": lambda seed, stats: restart_search(computer.graph, computer.domains, order="dsatur", seed=seed, stats=stats),
+    }
+    for name, run in runs.items():
+        decisions, times = [], []
+        for seed in seeds:
+            stats = {}
+            start_time = time.time()
+            result, mapping = run(seed, stats)
+            times.append(time.time() - start_time)
+            decisions.append(stats["decisions"])
+            assert result is True and sorted(computer.read_values(mapping, a, b)) == [29, 31]
+        print(f"{name:<24}: decisions mean {statistics.mean(decisions):>8.1f} std {statistics.pstdev(decisions):>8.1f} max {max(decisions):>6}, "
+              f"seconds mean {statistics.mean(times):.4f} std {statistics.pstdev(times):.4f} max {max(times):.4f}")
+
+def test_speed_local_search(bit_lengths=(2, 3, 4)):
+    """ Compares local search to the complete solver on ADDs of VARs, which are always colorable, and on a random graph with a hidden coloring """
+    import random
+    import networkx as nx
+    from lib.run.SEARCH import search_coloring
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.run.COMPONENTS import solve_components
+    from lib.run.LOCAL_SEARCH import local_search
+    from lib.calculator_logic.ADD import ADD
+
+    for n in bit_lengths:
+        computer = NPComputer()
+        a, b = VAR(computer, n=n), VAR(computer, n=n)
+        ADD(computer, a, b)
+
+        start_time = time.time()
+        stats = {}
+        assert local_search(computer.graph, computer.domains, max_steps=10 ** 6, stats=stats)[0] is True
+        local_time = time.time() - start_time
+
+        start_time = time.time()
+        assert solve_components(computer.graph, computer.domains, workers=1)[0] is True
+        complete_time = time.time() - start_time
+        print(f"{n} bit ADD ({computer.store.number_of_nodes()} nodes): local search {local_time:.4f} seconds ({stats['steps']} steps), complete {complete_time:.4f} seconds")
+
+    # A random graph with a hidden 3 coloring has no structure for propagation to follow, which is where local search is best
+    rng = random.Random(1)
+    hidden = [rng.randrange(3) for _ in range(400)]
+    graph = nx.Graph()
+    graph.add_nodes_from(range(400))
+    graph.add_edges_from((u, v) for u in range(400) for v in range(u + 1, 400) if hidden[u] != hidden[v] and rng.random() < 0.045)
+
+    start_time = time.time()
+    assert local_search(graph, max_steps=10 ** 6)[0] is True
+    local_time = time.time() - start_time
+
+    start_time = time.time()
+    stats = {}
+    result, _ = search_coloring(graph, max_decisions=10 ** 5, stats=stats)
+    complete_time = time.time() - start_time
+    print(f"Random graph with a hidden coloring ({len(graph.edges())} edges): local search {local_time:.4f} seconds, complete {complete_time:.4f} seconds ({stats['status']} after {stats['decisions']} decisions)")
+
+def test_speed_MUL_sizes(shapes=((2, 2), (4, 4), (6, 6), (8, 4), (8, 8))):
+    """ Prints the size of the graph every MUL method adds and the one auto picks, with the time to build it """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.MUL import MUL, MUL_METHODS, estimate_MUL_size
+
+    for n, m in shapes:
+        computer = NPComputer()
+        a, b = VAR(computer, n=n), VAR(computer, n=m)
+        start_time = time.time()
+        product, report = MUL(computer, a, b)
+        elapsed_time = time.time() - start_time
+        sizes = {method: estimate_MUL_size(n, m, method) for method in MUL_METHODS}
+        print(f"MUL {n}x{m}: {report} built in {elapsed_time:.4f} seconds (all methods: {sizes})")
+
+def test_speed_DIV_sizes(bit_lengths=(2, 4, 6, 8)):
+    """ Prints the size of the graph every DIV method adds and the one auto picks, with the time to build it """
+    from lib.run.INIT import NPComputer
+    from lib.run.VAR import VAR
+    from lib.calculator_logic.DIV import DIV, DIV_METHODS, estimate_DIV_size
+
+    for n in bit_lengths:
+        computer = NPComputer()
+        a, b = VAR(computer, n=n), VAR(computer, n=n)
+        start_time = time.time()
+        quotient, remainder, report = DIV(computer, a, b)
+        elapsed_time = time.time() - start_time
+        sizes = {method: estimate_DIV_size(n, method) for method in DIV_METHODS}
+        print(f"DIV {n} bits: {report} built in {elapsed_time:.4f} seconds (all methods: {sizes})")
+
 if __name__ == "__main__":
     test_speed()
+    test_speed_MUX()
+    test_speed_assumptions()
+    test_speed_batch()
+    test_speed_cubes()
+    test_speed_restarts()
+    test_speed_local_search()
+    test_speed_MUL_sizes()
+    test_speed_DIV_sizes()
     print("All tests passed!")
\ No newline at end of file
@@ -7,6 +7,8 @@ Generates DIMACS format graphs for 1-bit, 2-bit, 3-bit, and 4-bit additions.
 import os
 from lib.run.INIT import NPComputer
 from lib.run.CONST import CONST
+from lib.run.VAR import VAR
+from lib.run.SIMULATE import simulate
 from lib.calculator_logic.ADD import ADD
 
 def ensure_output_dir(directory="training_graphs"):
@@ -40,7 +42,7 @@ def generate_1bit_additions(output_dir):
         # Export the graph
         computer()
 
-        print(f"  Generated: {filename} ({len(computer.graph.nodes())} nodes, {len(computer.graph.edges())} edges)")
+        print(f"  Generated: {filename} ({computer.store.number_of_nodes()} nodes, {computer.store.number_of_edges()} edges)")
 
     print()
 
@@ -64,7 +66,7 @@ def generate_2bit_additions(output_dir, num_samples=16):
             # Export the graph
             computer()
 
-            print(f"  Generated: {filename} ({len(computer.graph.nodes())} nodes, {len(computer.graph.edges())} edges)")
+            print(f"  Generated: {filename} ({computer.store.number_of_nodes()} nodes, {computer.store.number_of_edges()} edges)")
 
     print()
 
@@ -88,7 +90,7 @@ def generate_3bit_additions(output_dir):
             # Export the graph
             computer()
 
-            print(f"  Generated: {filename} ({len(computer.graph.nodes())} nodes, {len(computer.graph.edges())} edges)")
+            print(f"  Generated: {filename} ({computer.store.number_of_nodes()} nodes, {computer.store.number_of_edges()} edges)")
 
     print()
 
@@ -112,10 +114,30 @@ def generate_4bit_additions(output_dir):
             # Export the graph
             computer()
 
-            print(f"  Generated: {filename} ({len(computer.graph.nodes())} nodes, {len(computer.graph.edges())} edges)")
+            print(f"  Generated: {filename} ({computer.store.number_of_nodes()} nodes, {computer.store.number_of_edges()} edges)")
 
     print()
 
+def generate_labels(output_dir, n):
+    """Write the expected sum and carry of every n-bit addition graph, found by simulating the gates (no coloring is solved)."""
+    computer = NPComputer()
+    a, b = VAR(computer, n=n), VAR(computer, n=n)
+    result, carry = ADD(computer, a, b)
+
+    # Every pair of operands is simulated in one pass
+    a_values = [a_val for a_val in range(2 ** n) for _ in range(2 ** n)]
+    b_values = [b_val for _ in range(2 ** n) for b_val in range(2 ** n)]
+    sums, carries = simulate(computer, {a: a_values, b: b_values}, [result, carry])
+
+    filename = f"{output_dir}/add_{n}bit_labels.csv"
+    with open(filename, 'w') as f:
+        f.write("graph,a,b,sum,carry\n")
+        for a_val, b_val, sum_val, carry_val in zip(a_values, b_values, sums, carries):
+            f.write(f"add_{n}bit_{a_val}_{b_val},{a_val},{b_val},{sum_val},{carry_val}\n")
+
+    print(f"  Labels: {filename} ({len(a_values)} graphs)")
+    print()
+
 def main():
     """Main function to generate all training graphs."""
     print("=" * 60)
@@ -133,6 +155,10 @@ def main():
     generate_3bit_additions(output_dir)
     generate_4bit_additions(output_dir)
 
+    # Label every graph with the result of its addition
+    for n in range(1, 5):
+        generate_labels(output_dir, n)
+
     print("=" * 60)
     print("All training graphs generated successfully!")
     print("=" * 60)
@@ -144,6 +170,7 @@ def main():
     print(f"  - 2-bit additions: 16 graphs")
     print(f"  - 3-bit additions: 64 graphs")
     print(f"  - 4-bit additions: 256 graphs")
+    print(f"  - Labels: add_<n>bit_labels.csv for each bit size")
     print(f"\nAll files saved to: {output_dir}/")
 
 if __name__ == "__main__":